@@ -7,16 +7,18 @@ Orchestrates the flow for a *single* prompt:
     1. Collect user prompt from TinyLlamaView            (UI thread)
     2. Validate / enrich payload if needed               (UI thread)
     3. Call the selected backend **off** the UI thread   (ThreadService)
+    3a. Streaming backends hand each chunk to the UI     (ThreadService.call_soon)
     4. When the backend returns, update AppState + UI    (back on UI thread)
 
 The controller remains testable and UI-toolkit agnostic.
 """
 from __future__ import annotations
+import json
 import os
 import time
 import uuid
 import requests
-from typing import Protocol, Dict, Any
+from typing import Protocol, Dict, Any, Iterable, Iterator, Optional, Tuple
 from typing import Callable
 
 # ------------------------ minimal BackendClient interface --------------------
@@ -27,11 +29,31 @@ class BackendClient(Protocol):
 
 # ------------------------ real backend implementations -----------------------
 
+def parse_sse(lines: Iterable[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(event, data) pairs from Server-Sent Events lines; comments are skipped."""
+    event, data = "message", []
+    for line in lines:
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith(":"):
+            continue
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+
 class AwsTinyLlamaClient:
     """
     Calls the AWS TinyLlama API Gateway `/infer` endpoint,
-    using a provided JWT token for authentication.
+    using a provided JWT token for authentication, then waits for the answer
+    on `/jobs/{requestId}` (server-side long-poll: one request per ~20 s).
+    stream_prompt() instead relays tokens from the SSE route
+    `/infer/{requestId}/stream` on STREAM_BASE_URL (default API_BASE_URL).
     """
+    RESULT_TIMEOUT_S = float(os.environ.get("TL_RESULT_TIMEOUT", "300"))
+
     def __init__(self, token: str) -> None:
         self._token = token
 
@@ -45,15 +67,92 @@ class AwsTinyLlamaClient:
         if not self._token:
             raise Exception("AUTH_TOKEN is not set (login required)")
         headers = {"Authorization": f"Bearer {self._token}"}
+        if metadata.get("id"):
+            # Same key on every retry of this prompt -> router replays instead of re-enqueueing
+            headers["Idempotency-Key"] = metadata["id"]
         payload = {"prompt": prompt, "idle": metadata.get("idle", 5)}
         print("DEBUG Authorization header:", headers)
         print("DEBUG JSON payload:", payload)
         print("RAW Authorization header being sent:", headers["Authorization"])
 
+        data = self._enqueue(api_url, payload, headers)
+        if data.get("requestId"):
+            return self._wait_for_result(api_base, data["requestId"], headers, data.get("status", "queued"))
+        return data.get("output", data.get("reply", data.get("status", "")))   # output: cache hit
+
+    def stream_prompt(self, prompt: str, metadata: Dict[str, Any],
+                      on_chunk: Callable[[str], None]) -> str:
+        """Like send_prompt, but calls on_chunk(text) as tokens arrive; returns the full text."""
+        api_base = os.environ.get("API_BASE_URL")
+        if not api_base:
+            raise Exception("API_BASE_URL environment variable is not set")
+        if not self._token:
+            raise Exception("AUTH_TOKEN is not set (login required)")
+        headers = {"Authorization": f"Bearer {self._token}"}
+        if metadata.get("id"):
+            headers["Idempotency-Key"] = metadata["id"]
+        data = self._enqueue(api_base.rstrip('/') + "/infer",
+                             {"prompt": prompt, "idle": metadata.get("idle", 5)}, headers)
+        request_id = data.get("requestId")
+        if data.get("cached"):                  # answered from the response cache
+            on_chunk(data["output"])
+            return data["output"]
+        if not request_id:
+            return data.get("reply", data.get("status", ""))
+        queued = data.get("status", "queued")
+        if data.get("coalesced"):               # shares another caller's job (and its stream)
+            return self._wait_for_result(api_base, request_id, headers, queued)
+
+        stream_base = os.environ.get("STREAM_BASE_URL", api_base).rstrip('/')
+        with requests.get(f"{stream_base}/infer/{request_id}/stream", stream=True,
+                          headers={"Authorization": headers["Authorization"],
+                                   "Accept": "text/event-stream"},
+                          timeout=(10, 60)) as resp:
+            if resp.status_code == 404:         # no SSE route deployed: fall back
+                return self._wait_for_result(api_base, request_id, headers, queued)
+            resp.raise_for_status()
+            return read_stream(resp.iter_lines(decode_unicode=True), on_chunk)
+
+    @staticmethod
+    def _enqueue(api_url: str, payload: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
         resp = requests.post(api_url, json=payload, headers=headers)
         resp.raise_for_status()
-        data = resp.json()
-        return data.get("reply", data.get("status", ""))
+        return resp.json()
+
+    def _wait_for_result(self, api_base: str, request_id: str, headers: Dict[str, str],
+                         queued: str = "queued") -> str:
+        """
+        Long-poll /jobs until the result is there. Without a result store
+        behind the route (404, or 5xx e.g. result_store_not_configured) the
+        job is still queued, so the 202 status is shown instead of an error.
+        """
+        url = f"{api_base.rstrip('/')}/jobs/{request_id}"
+        deadline = time.monotonic() + self.RESULT_TIMEOUT_S
+        while time.monotonic() < deadline:
+            resp = requests.get(url, headers={"Authorization": headers["Authorization"]},
+                                params={"wait": 20}, timeout=30)
+            if resp.status_code == 404 or resp.status_code >= 500:
+                return queued
+            resp.raise_for_status()
+            if resp.status_code == 200:
+                result = resp.json()
+                if result.get("status") == "failed":
+                    raise Exception(result.get("error", "job failed"))
+                return result.get("output", "")
+        return queued                        # still running; the job itself is not lost
+
+def read_stream(lines: Iterable[str], on_chunk: Callable[[str], None]) -> str:
+    """Feed token events to on_chunk until done; return the full text."""
+    chunks = []
+    for event, data in parse_sse(lines):
+        if event == "token":
+            chunks.append(data.get("text", ""))
+            on_chunk(data.get("text", ""))
+        elif event == "done":
+            return data.get("output", "".join(chunks))
+        elif event == "error":
+            raise Exception(data.get("error", "stream failed"))
+    raise Exception("stream ended before the answer was complete")
 
 class OpenAiApiClient:
     """
@@ -124,11 +223,16 @@ class PromptController:
             client = client_factory()
 
         meta = {"id": str(uuid.uuid4()), "timestamp": time.time(), "idle": self._state.idle_minutes}
+        on_chunk = None
+        if hasattr(client, "stream_prompt") and hasattr(self._service, "call_soon"):
+            # chunks are rendered on the UI thread as they arrive
+            on_chunk = lambda text: self._service.call_soon(self._view.append_output, text, newline=False)
         self._service.run_async(
             self._call_backend,
             client,
             prompt,
             meta,
+            on_chunk,
             ui_callback=self._on_backend_reply,
         )
 
@@ -137,8 +241,12 @@ class PromptController:
         client: BackendClient,
         prompt: str,
         meta: Dict[str, Any],
+        on_chunk: Optional[Callable[[str], None]] = None,
     ) -> Dict[str, Any]:
         try:
+            if on_chunk is not None:
+                reply = client.stream_prompt(prompt, meta, on_chunk)
+                return {"ok": True, "reply": reply, "streamed": True}
             reply = client.send_prompt(prompt, meta)
             return {"ok": True, "reply": reply}
         except Exception as exc:
@@ -146,7 +254,9 @@ class PromptController:
 
     def _on_backend_reply(self, result: Dict[str, Any]) -> None:
         self._view.set_busy(False)
-        if result.get("ok"):
+        if result.get("ok") and result.get("streamed"):
+            self._view.append_output("")            # end the streamed line
+        elif result.get("ok"):
             self._view.append_output(result["reply"])
         else:
             self._view.append_output("❌ BACKEND ERROR: " + result.get("error", ""))
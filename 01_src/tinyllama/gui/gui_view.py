@@ -141,15 +141,16 @@ class TinyLlamaView:
             color = "#212529"
         self.cost_label.config(fg=color)
 
-    def append_output(self, text: str) -> None:
+    def append_output(self, text: str, newline: bool = True) -> None:
         """
         Appends output text to the output pane (creating it the first time).
+        Streamed chunks pass newline=False and continue the current line.
         """
         if not hasattr(self, "_out_pane"):
             self._out_pane = tk.Text(self.root, width=80, height=15, state="disabled")
             self._out_pane.pack(padx=10, pady=(10, 0), fill="both", expand=True)
         self._out_pane.config(state="normal")
-        self._out_pane.insert(tk.END, text + "\n")
+        self._out_pane.insert(tk.END, text + ("\n" if newline else ""))
         self._out_pane.yview_moveto(1.0)
         self._out_pane.config(state="disabled")
 
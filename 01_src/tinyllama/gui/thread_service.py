@@ -4,6 +4,7 @@ thread_service.py
 Background thread + Tk-safe result return for TinyLlama GUI.
 - run_async(fn, ...) runs blocking code off the UI thread, result/exception sent to UI callback.
 - schedule(interval_s, fn, ...) ticks on the UI thread (Tk after).
+- call_soon(fn, ...) hands a call from a background thread to the UI thread.
 """
 
 from __future__ import annotations
@@ -43,6 +44,10 @@ class ThreadService:
         }
         self._job_q.put(job)
 
+    def call_soon(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        # Thread-safe: fn(*args, **kwargs) runs on the UI thread at the next pump
+        self._result_q.put((fn, args, kwargs))
+
     def schedule(
         self,
         interval_s: int,
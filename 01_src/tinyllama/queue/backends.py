@@ -0,0 +1,447 @@
+# tinyllama/queue/backends.py
+# ---------------------------------------------------------------------------
+# Job queue between the router (producer) and the workers (consumers).
+#
+#   queue = queue_from_env()                        # QUEUE_BACKEND
+#   queue.enqueue(body, group_id=..., dedup_id=...)  -> message id
+#   queue.enqueue_batch([{"id", "body", "group_id", "dedup_id"}, ...])
+#       -> [{"id", "message_id"} | {"id", "error"}, ...]   one per entry
+#   queue.receive(max_messages, wait_seconds, visibility) -> [QueueMessage]
+#   queue.ack(receipts)                 -> receipts that could not be acked
+#   queue.extend(receipts, visibility)  -> receipts that could not be extended
+#   queue.depth()                       -> messages waiting for a worker
+#
+# A received message stays invisible to other consumers for *visibility*
+# seconds; ack removes it, extend(receipts, 0) hands it back at once, and one
+# that is neither acked nor extended in time is delivered again.
+#
+# Backends:
+#   SqsQueue           – job-queue.fifo (JOB_QUEUE_URL). Per-MessageGroupId
+#                        ordering, 5-minute deduplication. Also wraps
+#                        worker.local_sqs.InMemorySQS for local runs
+#   RedisStreamQueue   – one Redis stream read through a consumer group
+#                        (QUEUE_REDIS_URL, else REDIS_URL; needs redis-py).
+#                        Entries older than QUEUE_TTL_SECONDS are trimmed,
+#                        delivered or not, as the queue epic's job TTL asks.
+#                        No per-group ordering: group_id is carried only
+#   InProcessQueue     – router and worker in one process; tests, local
+#                        runs, benchmarks
+#
+# QUEUE_BACKEND selects one: "sqs" (default), "redis" or "memory".
+# ---------------------------------------------------------------------------
+
+from __future__ import annotations
+import itertools
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Mapping, Optional, Sequence
+
+QUEUE_BACKEND = os.getenv("QUEUE_BACKEND", "sqs").strip().lower()
+QUEUE_NAME = os.getenv("QUEUE_NAME", "jobs")
+QUEUE_TTL_SECONDS = int(os.getenv("QUEUE_TTL_SECONDS", "300"))
+QUEUE_DEDUP_SECONDS = 300
+BACKENDS = ("sqs", "redis", "memory")
+
+# SendMessageBatch / DeleteMessageBatch limits
+SQS_BATCH_SIZE = 10
+SQS_BATCH_BYTES = 256 * 1024
+
+
+class QueueMessage:
+    """One received message; *receipt* is what ack / extend take."""
+
+    __slots__ = ("message_id", "receipt", "body", "group_id", "receive_count")
+
+    def __init__(self, message_id: str, receipt: str, body: str, group_id: str = "",
+                 receive_count: int = 1) -> None:
+        self.message_id = message_id
+        self.receipt = receipt
+        self.body = body
+        self.group_id = group_id
+        self.receive_count = receive_count
+
+# ---------------------------------------------------------------------------
+#  SQS
+# ---------------------------------------------------------------------------
+class SqsQueue:
+    def __init__(self, queue_url: str, client: Any = None) -> None:
+        self.queue_url = queue_url
+        self._client = client
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("sqs")
+        return self._client
+
+    def enqueue(self, body: str, group_id: Optional[str] = None, dedup_id: Optional[str] = None) -> str:
+        extra: Dict[str, str] = {}
+        if group_id is not None:
+            extra["MessageGroupId"] = group_id
+        if dedup_id is not None:
+            extra["MessageDeduplicationId"] = dedup_id
+        resp = self.client.send_message(QueueUrl=self.queue_url, MessageBody=body, **extra)
+        return resp.get("MessageId")
+
+    def enqueue_batch(self, entries: Sequence[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = []
+        for chunk in _batch_chunks([_sqs_entry(e) for e in entries]):
+            try:
+                resp = self.client.send_message_batch(QueueUrl=self.queue_url, Entries=chunk)
+            except Exception as exc:
+                results.extend({"id": e["Id"], "error": str(exc)} for e in chunk)
+                continue
+            for ok in resp.get("Successful", []):
+                results.append({"id": ok["Id"], "message_id": ok.get("MessageId")})
+            for bad in resp.get("Failed", []):
+                results.append({"id": bad["Id"], "error": bad.get("Message") or bad.get("Code", "")})
+        return results
+
+    def receive(self, max_messages: int = 1, wait_seconds: float = 0,
+                visibility: Optional[float] = None) -> List[QueueMessage]:
+        extra = {} if visibility is None else {"VisibilityTimeout": visibility}
+        resp = self.client.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=min(max_messages, SQS_BATCH_SIZE),
+            WaitTimeSeconds=wait_seconds,
+            AttributeNames=["MessageGroupId", "ApproximateReceiveCount"],
+            **extra,
+        )
+        out = []
+        for m in resp.get("Messages", []):
+            attrs = m.get("Attributes", {})
+            out.append(QueueMessage(m["MessageId"], m["ReceiptHandle"], m["Body"],
+                                    attrs.get("MessageGroupId", ""),
+                                    int(attrs.get("ApproximateReceiveCount", "1"))))
+        return out
+
+    def ack(self, receipts: Sequence[str]) -> List[str]:
+        return self._each_chunk(receipts, lambda entries: self.client.delete_message_batch(
+            QueueUrl=self.queue_url, Entries=entries), {})
+
+    def extend(self, receipts: Sequence[str], visibility: float) -> List[str]:
+        return self._each_chunk(receipts, lambda entries: self.client.change_message_visibility_batch(
+            QueueUrl=self.queue_url, Entries=entries), {"VisibilityTimeout": visibility})
+
+    def _each_chunk(self, receipts: Sequence[str], call: Callable[[List[Dict[str, Any]]], Any],
+                    extra: Dict[str, Any]) -> List[str]:
+        """Run a *Batch call per 10 receipts; the receipts SQS reported as failed."""
+        failed: List[str] = []
+        for start in range(0, len(receipts), SQS_BATCH_SIZE):
+            chunk = list(receipts[start:start + SQS_BATCH_SIZE])
+            resp = call([{"Id": str(i), "ReceiptHandle": r, **extra} for i, r in enumerate(chunk)])
+            failed.extend(chunk[int(f["Id"])] for f in resp.get("Failed", []))
+        return failed
+
+    def depth(self) -> int:
+        attrs = self.client.get_queue_attributes(
+            QueueUrl=self.queue_url,
+            AttributeNames=["ApproximateNumberOfMessages"],
+        )["Attributes"]
+        return int(attrs["ApproximateNumberOfMessages"])
+
+
+def _sqs_entry(entry: Mapping[str, Any]) -> Dict[str, Any]:
+    out = {"Id": str(entry["id"]), "MessageBody": entry["body"]}
+    if entry.get("group_id") is not None:
+        out["MessageGroupId"] = entry["group_id"]
+    if entry.get("dedup_id") is not None:
+        out["MessageDeduplicationId"] = entry["dedup_id"]
+    return out
+
+
+def _batch_chunks(entries: List[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+    """Split entries into SendMessageBatch calls: <= 10 entries and <= 256 KiB each."""
+    chunk: List[Dict[str, Any]] = []
+    size = 0
+    for entry in entries:
+        entry_size = len(entry["MessageBody"].encode("utf-8"))
+        if chunk and (len(chunk) == SQS_BATCH_SIZE or size + entry_size > SQS_BATCH_BYTES):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(entry)
+        size += entry_size
+    if chunk:
+        yield chunk
+
+# ---------------------------------------------------------------------------
+#  Redis streams
+# ---------------------------------------------------------------------------
+class RedisStreamQueue:
+    """
+    XADD to ``tl:queue:{<name>}``; workers XREADGROUP as one consumer group.
+    The receipt is the stream entry id. A message's visibility is its idle
+    time in the group's pending list: receive first XAUTOCLAIMs entries idle
+    longer than *visibility*, extend resets the idle time with XCLAIM IDLE,
+    ack is XACK + XDEL. Deduplication ids are held in ``...:dedup:<id>``
+    keys for QUEUE_DEDUP_SECONDS, like the FIFO queue's window; the check,
+    the XADD and the key write run as one Lua script, so a failed XADD
+    leaves no key behind and a duplicate always gets the first message's id.
+    The hash tag keeps stream and dedup keys in one cluster slot.
+    """
+
+    _DEDUP_XADD = """
+local id = redis.call('GET', KEYS[2])
+if id then return id end
+id = redis.call('XADD', KEYS[1], 'MINID', '~', ARGV[1], '*', 'body', ARGV[2], 'group', ARGV[3])
+redis.call('SET', KEYS[2], id, 'EX', ARGV[4])
+return id
+"""
+
+    def __init__(
+        self,
+        client: Any,
+        name: str = QUEUE_NAME,
+        group: str = "workers",
+        consumer: Optional[str] = None,
+        ttl: int = QUEUE_TTL_SECONDS,
+        visibility: float = 60.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.client = client
+        self.key = f"tl:queue:{{{name}}}"
+        self.group = group
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.ttl = ttl
+        self.visibility = visibility
+        self._clock = clock
+        self._group_ready = False
+        self._dedup_xadd: Any = None
+
+    def _ensure_group(self) -> None:
+        if self._group_ready:
+            return
+        try:
+            self.client.xgroup_create(self.key, self.group, id="0", mkstream=True)
+        except Exception as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+        self._group_ready = True
+
+    def _min_id(self) -> str:
+        return f"{int((self._clock() - self.ttl) * 1000)}-0"
+
+    def enqueue(self, body: str, group_id: Optional[str] = None, dedup_id: Optional[str] = None) -> str:
+        if dedup_id is None:
+            return _text(self.client.xadd(self.key, {"body": body, "group": group_id or ""},
+                                          minid=self._min_id(), approximate=True))
+        if self._dedup_xadd is None:
+            self._dedup_xadd = self.client.register_script(self._DEDUP_XADD)
+        return _text(self._dedup_xadd(keys=[self.key, f"{self.key}:dedup:{dedup_id}"],
+                                      args=[self._min_id(), body, group_id or "", QUEUE_DEDUP_SECONDS]))
+
+    def enqueue_batch(self, entries: Sequence[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = []
+        for e in entries:
+            try:
+                results.append({"id": str(e["id"]), "message_id": self.enqueue(
+                    e["body"], e.get("group_id"), e.get("dedup_id"))})
+            except Exception as exc:
+                results.append({"id": str(e["id"]), "error": str(exc)})
+        return results
+
+    def receive(self, max_messages: int = 1, wait_seconds: float = 0,
+                visibility: Optional[float] = None) -> List[QueueMessage]:
+        self._ensure_group()
+        if visibility is not None:
+            self.visibility = visibility
+        out: List[QueueMessage] = []
+
+        # expired visibility: take over entries idle in someone's pending list
+        claimed = self.client.xautoclaim(self.key, self.group, self.consumer,
+                                         min_idle_time=int(self.visibility * 1000),
+                                         start_id="0-0", count=max_messages)
+        for entry_id, fields in claimed[1]:
+            if fields:
+                out.append(self._message(entry_id, fields, self._delivered(entry_id)))
+
+        room = max_messages - len(out)
+        if room > 0:
+            block = int(wait_seconds * 1000) if wait_seconds > 0 and not out else None
+            for _, entries in self.client.xreadgroup(self.group, self.consumer, {self.key: ">"},
+                                                     count=room, block=block) or []:
+                for entry_id, fields in entries:
+                    out.append(self._message(entry_id, fields, 1))
+        return out
+
+    def _delivered(self, entry_id: Any) -> int:
+        pending = self.client.xpending_range(self.key, self.group, min=entry_id, max=entry_id, count=1)
+        return int(pending[0]["times_delivered"]) if pending else 1
+
+    @staticmethod
+    def _message(entry_id: Any, fields: Mapping[Any, Any], receives: int) -> QueueMessage:
+        entry_id = _text(entry_id)
+        body = fields.get("body", fields.get(b"body"))
+        group = fields.get("group", fields.get(b"group")) or ""
+        return QueueMessage(entry_id, entry_id, _text(body), _text(group), receives)
+
+    def ack(self, receipts: Sequence[str]) -> List[str]:
+        # XACK of an entry no longer pending is a no-op, so nothing reports failed
+        if receipts:
+            self.client.xack(self.key, self.group, *receipts)
+            self.client.xdel(self.key, *receipts)
+        return []
+
+    def extend(self, receipts: Sequence[str], visibility: float) -> List[str]:
+        if not receipts:
+            return []
+        idle = int(max(self.visibility - visibility, 0) * 1000)
+        kept = self.client.xclaim(self.key, self.group, self.consumer, min_idle_time=0,
+                                  message_ids=list(receipts), idle=idle, justid=True)
+        kept = {_text(r) for r in kept}
+        return [r for r in receipts if r not in kept]
+
+    def depth(self) -> int:
+        self._ensure_group()
+        for info in self.client.xinfo_groups(self.key):
+            if _text(info.get("name")) == self.group:
+                lag = info.get("lag")
+                if lag is None:                        # Redis < 7: approximate
+                    lag = self.client.xlen(self.key) - int(info.get("pending", 0))
+                return max(int(lag), 0)
+        return 0
+
+
+def _text(value: Any) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+# ---------------------------------------------------------------------------
+#  In-process
+# ---------------------------------------------------------------------------
+class _Entry:
+    __slots__ = ("message_id", "body", "group_id", "receives", "receipt", "visible_at")
+
+    def __init__(self, body: str, group_id: Optional[str]) -> None:
+        self.message_id = str(uuid.uuid4())
+        self.body = body
+        self.group_id = group_id or ""
+        self.receives = 0
+        self.receipt = ""
+        self.visible_at = 0.0
+
+
+class InProcessQueue:
+    """FIFO deque plus a receipt -> entry map of messages in flight; no group ordering."""
+
+    def __init__(self, visibility: float = 60.0, clock: Callable[[], float] = time.monotonic) -> None:
+        self.visibility = visibility
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._ready: Deque[_Entry] = deque()
+        self._inflight: Dict[str, _Entry] = {}
+        self._ids = itertools.count()
+
+    def enqueue(self, body: str, group_id: Optional[str] = None, dedup_id: Optional[str] = None) -> str:
+        entry = _Entry(body, group_id)
+        with self._cond:
+            self._ready.append(entry)
+            self._cond.notify()
+        return entry.message_id
+
+    def enqueue_batch(self, entries: Sequence[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+        made = [(str(e["id"]), _Entry(e["body"], e.get("group_id"))) for e in entries]
+        with self._cond:
+            self._ready.extend(entry for _, entry in made)
+            self._cond.notify_all()
+        return [{"id": i, "message_id": entry.message_id} for i, entry in made]
+
+    def _requeue_expired(self) -> float:
+        """Hand expired in-flight messages back (oldest first); seconds to the next expiry."""
+        now = self._clock()
+        expired = [e for e in self._inflight.values() if e.visible_at <= now]
+        for entry in sorted(expired, key=lambda e: e.visible_at, reverse=True):
+            del self._inflight[entry.receipt]
+            self._ready.appendleft(entry)
+        return min((e.visible_at - now for e in self._inflight.values()), default=float("inf"))
+
+    def receive(self, max_messages: int = 1, wait_seconds: float = 0,
+                visibility: Optional[float] = None) -> List[QueueMessage]:
+        visibility = self.visibility if visibility is None else visibility
+        deadline = time.monotonic() + wait_seconds
+        with self._cond:
+            while True:
+                next_expiry = self._requeue_expired()
+                remaining = deadline - time.monotonic()
+                if self._ready or remaining <= 0:
+                    break
+                self._cond.wait(min(remaining, next_expiry))
+            out = []
+            now = self._clock()
+            while self._ready and len(out) < max_messages:
+                entry = self._ready.popleft()
+                entry.receives += 1
+                entry.receipt = f"rh-{next(self._ids)}"
+                entry.visible_at = now + visibility
+                self._inflight[entry.receipt] = entry
+                out.append(QueueMessage(entry.message_id, entry.receipt, entry.body,
+                                        entry.group_id, entry.receives))
+            return out
+
+    def ack(self, receipts: Sequence[str]) -> List[str]:
+        with self._cond:
+            return [r for r in receipts if self._inflight.pop(r, None) is None]
+
+    def extend(self, receipts: Sequence[str], visibility: float) -> List[str]:
+        failed = []
+        with self._cond:
+            now = self._clock()
+            for r in receipts:
+                entry = self._inflight.get(r)
+                if entry is None:
+                    failed.append(r)
+                else:
+                    entry.visible_at = now + visibility
+            if visibility <= 0:
+                self._cond.notify_all()
+        return failed
+
+    def depth(self) -> int:
+        with self._cond:
+            self._requeue_expired()
+            return len(self._ready)
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._ready) + len(self._inflight)
+
+# ---------------------------------------------------------------------------
+#  Selection
+# ---------------------------------------------------------------------------
+def as_queue(queue_or_client: Any, queue_url: str = "") -> Any:
+    """A queue as is; an SQS client (boto3, InMemorySQS) wrapped in SqsQueue."""
+    if hasattr(queue_or_client, "enqueue"):
+        return queue_or_client
+    return SqsQueue(queue_url, client=queue_or_client)
+
+
+_default_queue: Optional[InProcessQueue] = None
+
+
+def queue_from_env(backend: Optional[str] = None, queue_url: Optional[str] = None) -> Any:
+    """The QUEUE_BACKEND queue; "memory" is one process-wide InProcessQueue."""
+    global _default_queue
+    backend = (backend or QUEUE_BACKEND).strip().lower()
+    if backend == "sqs":
+        return SqsQueue(queue_url if queue_url is not None else os.getenv("JOB_QUEUE_URL", ""))
+    if backend == "redis":
+        url = os.getenv("QUEUE_REDIS_URL", "").strip() or os.getenv("REDIS_URL", "").strip()
+        if not url:
+            raise ValueError("QUEUE_BACKEND=redis needs QUEUE_REDIS_URL or REDIS_URL")
+        import redis
+        return RedisStreamQueue(redis.Redis.from_url(url))
+    if backend == "memory":
+        if _default_queue is None:
+            _default_queue = InProcessQueue()
+        return _default_queue
+    raise ValueError(f"unsupported QUEUE_BACKEND {backend!r}; expected one of {', '.join(BACKENDS)}")
+
+
+__all__ = [
+    "QueueMessage", "SqsQueue", "RedisStreamQueue", "InProcessQueue",
+    "as_queue", "queue_from_env", "QUEUE_BACKEND", "BACKENDS",
+]
@@ -0,0 +1,234 @@
+# tinyllama/router/admission.py
+# ---------------------------------------------------------------------------
+# Queue-depth admission control for the router.
+#
+#   depth < soft            → admit
+#   soft <= depth < hard    → admit single prompts, shed batches with 429
+#   depth >= hard           → reject everything with 503
+#
+# Retry-After is the time the GPU worker needs to drain the queue back below
+# the threshold that was crossed: (depth - threshold + 1) / drain_per_sec,
+# clamped to [1, max_retry_after].
+#
+# ApproximateNumberOfMessages comes from QueueDepthProbe, which caches the
+# last reading for PROBE_TTL seconds, so at most one GetQueueAttributes call
+# per container per TTL. Probe failures fail open (admit).
+#
+# Thresholds live in SSM (/tinyllama/<env>/admission_*) and are re-read every
+# CONFIG_TTL seconds on a background thread, so /infer never waits on SSM
+# after the first load. Missing parameters fall back to the env defaults
+# below and are not looked up again for MISSING_TTL seconds.
+# A limit of 0 disables that tier.
+# ---------------------------------------------------------------------------
+
+from __future__ import annotations
+import math
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from tinyllama.utils import ssm
+
+ADMISSION_PROBE_TTL_SECONDS = float(os.getenv("ADMISSION_PROBE_TTL_SECONDS", "5"))
+ADMISSION_CONFIG_TTL_SECONDS = float(os.getenv("ADMISSION_CONFIG_TTL_SECONDS", "60"))
+ADMISSION_MISSING_TTL_SECONDS = float(os.getenv("ADMISSION_MISSING_TTL_SECONDS", "600"))
+
+# SSM parameter name -> (attribute, env default)
+SSM_PARAMS = {
+    "admission_soft_limit":    ("soft_limit", os.getenv("ADMISSION_SOFT_LIMIT", "100")),
+    "admission_hard_limit":    ("hard_limit", os.getenv("ADMISSION_HARD_LIMIT", "500")),
+    "admission_drain_per_sec": ("drain_per_sec", os.getenv("ADMISSION_DRAIN_PER_SEC", "1.0")),
+    "admission_max_retry_after": ("max_retry_after", os.getenv("ADMISSION_MAX_RETRY_AFTER", "300")),
+}
+
+ADMIT = "admit"
+SHED = "shed"           # 429
+REJECT = "reject"       # 503
+
+# ---------------------------------------------------------------------------
+#  Thresholds
+# ---------------------------------------------------------------------------
+class AdmissionConfig:
+    def __init__(
+        self,
+        soft_limit: int = 100,
+        hard_limit: int = 500,
+        drain_per_sec: float = 1.0,
+        max_retry_after: int = 300,
+    ) -> None:
+        self.soft_limit = int(soft_limit)
+        self.hard_limit = int(hard_limit)
+        self.drain_per_sec = max(float(drain_per_sec), 1e-3)
+        self.max_retry_after = max(int(max_retry_after), 1)
+
+    @property
+    def enabled(self) -> bool:
+        return self.soft_limit > 0 or self.hard_limit > 0
+
+
+def load_config(get: Callable[[str], str] = None) -> AdmissionConfig:
+    """Read thresholds through *get* (default ssm.get_id); absent names use env defaults."""
+    get = get or ssm.get_id
+    values = {}
+    for name, (attr, default) in SSM_PARAMS.items():
+        try:
+            values[attr] = float(get(name))
+        except Exception:
+            values[attr] = float(default)
+    return AdmissionConfig(**values)
+
+
+class _MissingAware:
+    """
+    Wraps a parameter getter so names that do not exist raise KeyError
+    locally for *ttl* seconds instead of costing an SSM call per reload.
+    Other errors (throttling, network) are not remembered.
+    """
+
+    def __init__(self, get: Callable[[str], str], ttl: float = ADMISSION_MISSING_TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self._get = get
+        self.ttl = ttl
+        self._clock = clock
+        self._missing: dict = {}                # name -> retry-after time
+
+    def __call__(self, name: str) -> str:
+        if self._clock() < self._missing.get(name, 0.0):
+            raise KeyError(name)
+        try:
+            value = self._get(name)
+        except Exception as exc:
+            if isinstance(exc, KeyError) or _error_code(exc) == "ParameterNotFound":
+                self._missing[name] = self._clock() + self.ttl
+            raise
+        self._missing.pop(name, None)
+        return value
+
+
+def _error_code(exc: Exception) -> Optional[str]:
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict):
+        return response.get("Error", {}).get("Code")
+    return None
+
+
+class _CachedConfig:
+    """
+    Memoises load_config(). Only the first call loads inline; once the value
+    is older than *ttl* callers keep getting it while a single background
+    thread reloads.
+    """
+
+    def __init__(self, loader: Callable[[], AdmissionConfig], ttl: float,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self._loader = loader
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()           # held while a reload runs
+        self._value: Optional[AdmissionConfig] = None
+        self._loaded_at = 0.0
+
+    def get(self) -> AdmissionConfig:
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    self._value, self._loaded_at = self._loader(), self._clock()
+            return self._value
+        if self._clock() - self._loaded_at >= self.ttl and self._lock.acquire(blocking=False):
+            threading.Thread(target=self._reload, name="AdmissionConfig", daemon=True).start()
+        return self._value
+
+    def _reload(self) -> None:
+        try:
+            self._value = self._loader()
+        except Exception:                       # keep serving the previous thresholds
+            pass
+        finally:
+            self._loaded_at = self._clock()
+            self._lock.release()
+
+# ---------------------------------------------------------------------------
+#  Depth probe
+# ---------------------------------------------------------------------------
+class QueueDepthProbe:
+    """
+    Cached ApproximateNumberOfMessages reader.
+    *fetch* returns the current depth; it runs at most once per *ttl*, and
+    concurrent callers reuse the last reading while a probe is in flight.
+    """
+
+    def __init__(self, fetch: Callable[[], int], ttl: float = ADMISSION_PROBE_TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self._fetch = fetch
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._depth: Optional[int] = None
+        self._probed_at: Optional[float] = None
+        self.probes = 0
+        self.errors = 0
+
+    def depth(self) -> Optional[int]:
+        """Last known depth, refreshed when older than ttl; None if never read."""
+        now = self._clock()
+        if self._probed_at is not None and now - self._probed_at < self.ttl:
+            return self._depth
+        if not self._lock.acquire(blocking=False):
+            return self._depth
+        try:
+            self.probes += 1
+            try:
+                self._depth = int(self._fetch())
+            except Exception:
+                self.errors += 1
+            self._probed_at = self._clock()           # failures are rate-limited too
+        finally:
+            self._lock.release()
+        return self._depth
+
+# ---------------------------------------------------------------------------
+#  Decision
+# ---------------------------------------------------------------------------
+def retry_after(depth: int, threshold: int, cfg: AdmissionConfig) -> int:
+    seconds = math.ceil((depth - threshold + 1) / cfg.drain_per_sec)
+    return min(max(seconds, 1), cfg.max_retry_after)
+
+
+def decide(depth: Optional[int], cfg: AdmissionConfig, batch: bool = False) -> tuple:
+    """Return (decision, retry_after_seconds) for a request at queue *depth*."""
+    if depth is None or not cfg.enabled:
+        return ADMIT, 0
+    if cfg.hard_limit > 0 and depth >= cfg.hard_limit:
+        return REJECT, retry_after(depth, cfg.hard_limit, cfg)
+    if batch and cfg.soft_limit > 0 and depth >= cfg.soft_limit:
+        return SHED, retry_after(depth, cfg.soft_limit, cfg)
+    return ADMIT, 0
+
+
+class AdmissionController:
+    """Probe + thresholds; one instance per warm container."""
+
+    def __init__(self, probe: QueueDepthProbe,
+                 config: Callable[[], AdmissionConfig] = None) -> None:
+        self.probe = probe
+        if config is None:
+            lookup = _MissingAware(ssm.get_id)
+            config = _CachedConfig(lambda: load_config(lookup), ADMISSION_CONFIG_TTL_SECONDS).get
+        self._config = config
+
+    def check(self, batch: bool = False) -> tuple:
+        """Return (decision, retry_after_seconds, depth)."""
+        cfg = self._config()
+        if not cfg.enabled:
+            return ADMIT, 0, None
+        depth = self.probe.depth()
+        decision, wait = decide(depth, cfg, batch=batch)
+        return decision, wait, depth
+
+
+__all__ = [
+    "AdmissionConfig", "AdmissionController", "QueueDepthProbe",
+    "load_config", "decide", "retry_after",
+    "ADMIT", "SHED", "REJECT",
+]
@@ -0,0 +1,199 @@
+# tinyllama/router/coalesce.py
+# ---------------------------------------------------------------------------
+# Identical-prompt coalescing for the router.
+#
+# When the same prompt (tinyllama.utils.promptkey.request_key) arrives again
+# within COALESCE_WINDOW_SECONDS of the first one, the router does not
+# enqueue a second job: it answers 202 with the first job's requestId and
+# the caller reads the shared result from GET /jobs/{request_id}.
+#
+#   store.join(key, request_id, sub)  -> None       (caller leads; enqueue)
+#                                     -> leader_id  (attach to that job)
+#   store.release(key, request_id)    -> forget a leader whose enqueue failed
+#   store.is_reader(request_id, sub)  -> may *sub* read that job's result
+#
+# Results carry the leader's sub; every follower is recorded as a reader of
+# the leader's job for COALESCE_READER_TTL_SECONDS (default: the result TTL)
+# so GET /jobs serves them too.
+#
+# Stores:
+#   InMemoryCoalescer   – per warm container (default)
+#   DynamoDbCoalescer   – shared across containers; COALESCE_TABLE (string
+#                         hash key ``pk``, TTL on ``expires_at``)
+#
+# Off by default (COALESCE_WINDOW_SECONDS=0): a window of a few seconds,
+# e.g. 10, catches double-clicks, retries and canned test prompts.
+# ---------------------------------------------------------------------------
+
+from __future__ import annotations
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Set, Tuple
+
+COALESCE_WINDOW_SECONDS = float(os.getenv("COALESCE_WINDOW_SECONDS", "0"))
+COALESCE_READER_TTL_SECONDS = int(os.getenv("COALESCE_READER_TTL_SECONDS",
+                                            os.getenv("RESULT_TTL_SECONDS", "86400")))
+COALESCE_CACHE_SIZE = int(os.getenv("COALESCE_CACHE_SIZE", "10000"))
+
+# ---------------------------------------------------------------------------
+#  In-memory store
+# ---------------------------------------------------------------------------
+class InMemoryCoalescer:
+    """Bounded LRUs of open windows and readers; only sees one container's traffic."""
+
+    def __init__(
+        self,
+        window: float = COALESCE_WINDOW_SECONDS,
+        reader_ttl: int = COALESCE_READER_TTL_SECONDS,
+        maxsize: int = COALESCE_CACHE_SIZE,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.window = window
+        self.reader_ttl = reader_ttl
+        self.maxsize = maxsize
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._leaders: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()       # key -> (request_id, until)
+        self._readers: "OrderedDict[str, Tuple[Set[str], float]]" = OrderedDict()  # request_id -> (subs, until)
+
+    def join(self, key: str, request_id: str, sub: str) -> Optional[str]:
+        now = self._clock()
+        with self._lock:
+            entry = self._leaders.get(key)
+            if entry is None or entry[1] <= now:
+                self._leaders[key] = (request_id, now + self.window)
+                self._leaders.move_to_end(key)
+                while len(self._leaders) > self.maxsize:
+                    self._leaders.popitem(last=False)
+                return None
+            leader = entry[0]
+            subs = self._readers.get(leader, (set(), 0))[0]
+            subs.add(sub)
+            self._readers[leader] = (subs, now + self.reader_ttl)
+            self._readers.move_to_end(leader)
+            while len(self._readers) > self.maxsize:
+                self._readers.popitem(last=False)
+            return leader
+
+    def release(self, key: str, request_id: str) -> None:
+        with self._lock:
+            entry = self._leaders.get(key)
+            if entry is not None and entry[0] == request_id:
+                del self._leaders[key]
+
+    def is_reader(self, request_id: str, sub: str) -> bool:
+        with self._lock:
+            entry = self._readers.get(request_id)
+            return entry is not None and entry[1] > self._clock() and sub in entry[0]
+
+# ---------------------------------------------------------------------------
+#  DynamoDB store
+# ---------------------------------------------------------------------------
+class DynamoDbCoalescer:
+    """
+    Shared store: ``coalesce#<key>`` items hold the leader of an open window,
+    ``readers#<request_id>`` items a string set of follower subs. Expiry is
+    also checked in the conditional write because DynamoDB deletes expired
+    items lazily.
+    """
+
+    def __init__(
+        self,
+        table: str,
+        client: Any = None,
+        window: float = COALESCE_WINDOW_SECONDS,
+        reader_ttl: int = COALESCE_READER_TTL_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.table = table
+        self.window = window
+        self.reader_ttl = reader_ttl
+        self._client = client
+        self._clock = clock
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("dynamodb")
+        return self._client
+
+    def join(self, key: str, request_id: str, sub: str, *, retry: bool = True) -> Optional[str]:
+        now = self._clock()
+        try:
+            self.client.put_item(
+                TableName=self.table,
+                Item={
+                    "pk": {"S": f"coalesce#{key}"},
+                    "leader": {"S": request_id},
+                    "expires_at": {"N": repr(now + self.window)},
+                },
+                ConditionExpression="attribute_not_exists(pk) OR expires_at <= :now",
+                ExpressionAttributeValues={":now": {"N": repr(now)}},
+            )
+            return None
+        except Exception as exc:
+            if _error_code(exc) != "ConditionalCheckFailedException":
+                raise
+
+        item = self.client.get_item(
+            TableName=self.table,
+            Key={"pk": {"S": f"coalesce#{key}"}},
+            ConsistentRead=True,
+        ).get("Item")
+        if item is None:                            # expired and deleted in between: retry once
+            if not retry:
+                raise RuntimeError(f"coalesce window {key!r} kept changing under join")
+            return self.join(key, request_id, sub, retry=False)
+        leader = item["leader"]["S"]
+        self.client.update_item(
+            TableName=self.table,
+            Key={"pk": {"S": f"readers#{leader}"}},
+            UpdateExpression="ADD subs :sub SET expires_at = :exp",
+            ExpressionAttributeValues={
+                ":sub": {"SS": [sub]},
+                ":exp": {"N": str(int(now) + self.reader_ttl)},
+            },
+        )
+        return leader
+
+    def release(self, key: str, request_id: str) -> None:
+        try:
+            self.client.delete_item(
+                TableName=self.table,
+                Key={"pk": {"S": f"coalesce#{key}"}},
+                ConditionExpression="leader = :rid",
+                ExpressionAttributeValues={":rid": {"S": request_id}},
+            )
+        except Exception as exc:
+            if _error_code(exc) != "ConditionalCheckFailedException":
+                raise
+
+    def is_reader(self, request_id: str, sub: str) -> bool:
+        item = self.client.get_item(
+            TableName=self.table,
+            Key={"pk": {"S": f"readers#{request_id}"}},
+        ).get("Item")
+        if item is None or int(item["expires_at"]["N"]) < self._clock():
+            return False
+        return sub in item.get("subs", {}).get("SS", [])
+
+
+def _error_code(exc: Exception) -> Optional[str]:
+    """botocore ClientError code without importing botocore."""
+    return (getattr(exc, "response", None) or {}).get("Error", {}).get("Code")
+
+
+def store_from_env() -> Any:
+    """None while COALESCE_WINDOW_SECONDS is 0; DynamoDB when COALESCE_TABLE is set; else in-memory."""
+    if COALESCE_WINDOW_SECONDS <= 0:
+        return None
+    table = os.getenv("COALESCE_TABLE", "").strip()
+    if table:
+        return DynamoDbCoalescer(table)
+    return InMemoryCoalescer()
+
+
+__all__ = ["InMemoryCoalescer", "DynamoDbCoalescer", "store_from_env"]
@@ -0,0 +1,44 @@
+# tinyllama/router/grouping.py
+# ---------------------------------------------------------------------------
+# MessageGroupId strategies for job-queue.fifo.
+#
+# SQS FIFO hands out one in-flight message per group, so the group id decides
+# how many of a user's prompts the worker can process at once:
+#
+#   user     – group = sub                 1 at a time, strict per-user order
+#   shard    – group = sub#<hash % N>      up to N at a time, order per shard
+#   request  – group = request_id          no per-user limit, no ordering
+#
+# MESSAGE_GROUP_STRATEGY selects one (default "user", today's behaviour);
+# MESSAGE_GROUP_SHARDS sets N for "shard" (default 4). The router writes the
+# strategy into every message as "group_strategy".
+# ---------------------------------------------------------------------------
+
+from __future__ import annotations
+import hashlib
+import os
+
+USER = "user"
+SHARD = "shard"
+REQUEST = "request"
+STRATEGIES = (USER, SHARD, REQUEST)
+
+MESSAGE_GROUP_STRATEGY = os.getenv("MESSAGE_GROUP_STRATEGY", USER).strip().lower()
+MESSAGE_GROUP_SHARDS = int(os.getenv("MESSAGE_GROUP_SHARDS", "4"))
+
+MAX_GROUP_ID_LENGTH = 128           # SQS limit
+
+
+def group_id(strategy: str, sub: str, request_id: str, shards: int = MESSAGE_GROUP_SHARDS) -> str:
+    """MessageGroupId for one message of *sub*; unknown strategies raise ValueError."""
+    if strategy == USER:
+        return sub
+    if strategy == SHARD:
+        digest = hashlib.sha256(request_id.encode("utf-8")).digest()
+        return f"{sub}#{int.from_bytes(digest[:8], 'big') % max(shards, 1)}"
+    if strategy == REQUEST:
+        return request_id[:MAX_GROUP_ID_LENGTH]
+    raise ValueError(f"unknown message group strategy {strategy!r}; expected one of {STRATEGIES}")
+
+
+__all__ = ["group_id", "STRATEGIES", "USER", "SHARD", "REQUEST"]
@@ -1,91 +1,762 @@
 # tinyllama/router/handler.py
 
+import time
+_INIT_START = time.perf_counter()
+
+import base64
+import hashlib
 import json
 import os
-import boto3
 
 from jose.exceptions import ExpiredSignatureError, JWTError
 from tinyllama.utils.auth import verify_jwt
+from tinyllama.utils import envelope, promptkey, ssm
+from tinyllama.utils.log import get_logger, set_context, clear_context
+from tinyllama.utils.metrics import StageTimer, activate, count, emit, timed
+from tinyllama.router import admission, coalesce, grouping, idempotency, ratelimit
+from tinyllama.queue.backends import QUEUE_BACKEND, SqsQueue, queue_from_env
+
+log = get_logger(__name__)
 
-# Initialize SQS client once
-_sqs = boto3.client('sqs')
+# SQS client is created on first use, so boto3 stays off the import path
+_sqs = None
 QUEUE_URL = os.environ.get('JOB_QUEUE_URL')  # must be set in Lambda environment
 
+# Job queue backend (tinyllama.queue): QUEUE_BACKEND=sqs (default) goes
+# through _get_sqs() and QUEUE_URL; "redis" / "memory" are built on first use
+_queue = None
+
+# Batch route: up to MAX_BATCH_PROMPTS per request, SendMessageBatch takes 10
+BATCH_ROUTE = 'POST /infer/batch'
+MAX_BATCH_PROMPTS = int(os.environ.get('MAX_BATCH_PROMPTS', '50'))
+
+# Message bodies: compressed / S3 claim-check via utils.codec. The bearer token
+# never enters the queue: MESSAGE_TOKEN_MODE=envelope (default) sends an
+# HMAC-signed job envelope (utils.envelope); "digest" sends the unsigned claims
+# (sub, exp, token digest) and is only accepted by workers run with --no-verify
+MESSAGE_TOKEN_MODE = os.environ.get('MESSAGE_TOKEN_MODE', 'envelope').strip().lower()
+_codec = None
+
+# Per-stage latency (parse / verify / jwks_fetch / enqueue) goes out as one
+# EMF line per invocation; see tinyllama.utils.metrics for local sinks
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'TLFIF/LAM')
+
+# Idempotency-Key store, built on first use (DynamoDB when IDEMPOTENCY_TABLE is set)
+IDEMPOTENCY_HEADER = 'idempotency-key'
+_idem_store = None
+
+# Queue-depth admission control (thresholds from SSM, see router.admission)
+_admission = None
+
+# Per-user token bucket keyed by sub; False once built-and-disabled
+_rate_limiter = None
+
+# Prompt -> completion cache the workers fill (tinyllama.utils.cache,
+# RESPONSE_CACHE_URL): a hit is answered 200 without touching SQS;
+# False once found unset
+_response_cache = None
+
+# Identical-prompt coalescing (router.coalesce): a repeat within
+# COALESCE_WINDOW_SECONDS attaches to the first job; False once built-and-disabled
+_coalescer = None
+
+# GET /jobs/{request_id}: long-poll the result store the worker writes
+# (tinyllama.utils.results; RESULT_BUCKET / RESULT_TABLE / RESULT_DIR).
+# Capped below API Gateway's 29 s integration timeout; False once found unset
+JOBS_ROUTE = 'GET /jobs/{request_id}'
+JOB_POLL_MAX_SECONDS = int(os.environ.get('JOB_POLL_MAX_SECONDS', '20'))
+_result_store = None
+
+# FIFO MessageGroupId strategy: user (default) / shard / request
+GROUP_STRATEGY = grouping.MESSAGE_GROUP_STRATEGY
+GROUP_SHARDS = grouping.MESSAGE_GROUP_SHARDS
+if GROUP_STRATEGY not in grouping.STRATEGIES:
+    log.warning("unknown_group_strategy", strategy=GROUP_STRATEGY, fallback=grouping.USER)
+    GROUP_STRATEGY = grouping.USER
+
+def _get_sqs():
+    global _sqs
+    if _sqs is None:
+        import boto3
+        _sqs = boto3.client('sqs')
+    return _sqs
+
+def _get_queue():
+    global _queue
+    if QUEUE_BACKEND == 'sqs':
+        return SqsQueue(QUEUE_URL, client=_get_sqs())
+    if _queue is None:
+        _queue = queue_from_env(QUEUE_BACKEND)
+    return _queue
+
+def _queue_configured():
+    return QUEUE_BACKEND != 'sqs' or bool(QUEUE_URL)
+
+# Module init duration, reported once by the first (cold) invocation
+INIT_MS = (time.perf_counter() - _INIT_START) * 1000
+_cold_start = True
+
+def _report_cold_start():
+    global _cold_start
+    if _cold_start:
+        _cold_start = False
+        log.info(
+            "cold_start",
+            init_ms=round(INIT_MS, 2),
+            config_version=ssm.snapshot_info().get('version'),
+        )
+
 def lambda_handler(event, context):
     """
     Entry-point for TinyLlama Router:
-      - logs raw event
       - validates request, auth token
-      - enqueues into SQS for further processing, logging send_message response
+      - enqueues into the job queue (SQS by default) for further processing
+      - logs one JSON 'response' record (statusCode feeds the Router4xx metric filter)
     """
-    print("DBG event:", event)
-    print("DBG headers:", event.get('headers'))
-    print("DBG raw body:", event.get('body'))
+    _report_cold_start()
+    request_id = getattr(context, 'aws_request_id', None)
+    set_context(request_id=request_id)
+    timer = StageTimer()
+    status = 500
+    try:
+        with activate(timer):
+            resp = _route(event, context)
+        status = resp['statusCode']
+        log.info("response", statusCode=status)
+        return resp
+    finally:
+        emit(
+            METRICS_NAMESPACE,
+            timer.metrics(),
+            dimensions={'Route': _route_name(event)},
+            properties={'request_id': request_id, 'statusCode': status},
+        )
+        clear_context()
+
+def _route_name(event):
+    if _job_id(event) is not None:
+        return 'jobs'
+    return 'batch' if _is_batch(event) else 'infer'
+
+def _route(event, context):
+    log.debug(
+        "request",
+        route=event.get('routeKey') or event.get('rawPath'),
+        body_bytes=len(event.get('body') or ''),
+    )
+
+    job_id = _job_id(event)
+    if job_id is not None:
+        return _handle_job_status(event, job_id)
+
+    if _is_batch(event):
+        return _handle_batch(event, context)
 
     # Parse and validate request body
     try:
-        body_text = event.get('body', '')
-        req = json.loads(body_text)
-        prompt = req['prompt']
-        idle = req['idle']
-        print(f"DBG parsed prompt='{prompt[:30]}...' idle={idle}")
+        with timed('parse'):
+            body_text = event.get('body', '')
+            req = json.loads(body_text)
+            prompt = req['prompt']
+            idle = req['idle']
+            priority = _priority_field(req.get('priority'))
+        log.debug("parsed", prompt_chars=lambda: len(prompt), idle=idle)
     except Exception as exc:
-        print("ERROR invalid_request:", exc)
+        log.warning("invalid_request", details=str(exc))
         return {
             'statusCode': 400,
             'body': json.dumps({'error': 'invalid_request', 'details': str(exc)})
         }
 
-    # Extract and validate Authorization header
-    auth_header = (event.get('headers') or {}).get('authorization', '')
-    print("DBG authorization header:", auth_header)
-    token = auth_header.removeprefix('Bearer ').strip()
-    if not token:
-        print("ERROR missing_token")
-        return {'statusCode': 401, 'body': json.dumps({'error': 'missing_token'})}
+    # Extract and verify Authorization header
+    token, claims, error = _authenticate(event)
+    if error:
+        return error
 
-    # Verify JWT
-    try:
-        claims = verify_jwt(token)
-        print("DBG verified claims:", claims)
-        print("JWT_OK")
-    except ExpiredSignatureError:
-        print("ERROR token_expired")
-        return {'statusCode': 401, 'body': json.dumps({'error': 'token_expired'})}
-    except JWTError as exc:
-        print("ERROR invalid_token:", exc)
-        return {'statusCode': 403, 'body': json.dumps({'error': 'invalid_token'})}
+    # Answered before: 200 from the response cache, nothing enqueued
+    cached = _cached_reply(prompt, req)
+    if cached:
+        return cached
 
-    # Check SQS configuration
-    if not QUEUE_URL:
-        print("ERROR queue_not_configured")
+    # Check queue configuration
+    if not _queue_configured():
+        log.error("queue_not_configured")
         return {'statusCode': 500, 'body': json.dumps({'error': 'queue_not_configured'})}
-    print("DBG using SQS URL:", QUEUE_URL)
 
-    # Enqueue valid request into SQS
+    # Retried request with a known Idempotency-Key: replay, don't enqueue
+    slot, replay = _idempotency_begin(event, claims)
+    if replay:
+        return replay
+
+    # Shed load: per-user rate limit
+    rejected = _rate_limit(claims, cost=1)
+    if rejected:
+        _idempotency_finish(slot, rejected)
+        return rejected
+
+    # Same prompt already queued within the window: share that job
+    key, attached = _coalesce_join(prompt, req, context.aws_request_id, claims)
+    if attached:
+        _idempotency_finish(slot, attached)
+        return attached
+
+    # Shed load: queue depth
+    rejected = _admit(batch=False)
+    if rejected:
+        _coalesce_release(key, context.aws_request_id)
+        _idempotency_finish(slot, rejected)
+        return rejected
+
+    signing_key = _signing_key()
+    unavailable = _key_unavailable(signing_key)
+    if unavailable:
+        _coalesce_release(key, context.aws_request_id)
+        _idempotency_finish(slot, None)
+        return unavailable
+
+    # Enqueue valid request into the job queue
     try:
         message = {
-            'token': token,
+            **_identity_fields(token, claims, context.aws_request_id, prompt, signing_key),
             'prompt': prompt,
             'idle': idle,
-            'request_id': context.aws_request_id
+            **priority,
+            **promptkey.generation_params(req),
+            **({'cache': False} if req.get('cache') is False else {}),
+            'request_id': context.aws_request_id,
+            'group_strategy': GROUP_STRATEGY,
         }
-        resp = _sqs.send_message(
-            QueueUrl=QUEUE_URL,
-            MessageBody=json.dumps(message),
-            MessageGroupId = claims["sub"]
-        )
-        print("DBG send_message response:", resp)
+        with timed('enqueue'):
+            message_id = _get_queue().enqueue(
+                _encode_message(message),
+                group_id=_group_id(claims, context.aws_request_id),
+                dedup_id=slot['dedup_id'] if slot else None,
+            )
     except Exception as exc:
-        print("ERROR enqueue_failed:", exc)
+        log.exception("enqueue_failed")
+        _coalesce_release(key, context.aws_request_id)
+        _idempotency_finish(slot, None)
         return {
             'statusCode': 502,
             'body': json.dumps({'error': 'enqueue_failed', 'details': str(exc)})
         }
 
     # Successful enqueue
-    print("DBG enqueue succeeded, message_id:", resp.get('MessageId'))
+    log.debug("enqueued", message_id=message_id)
+    result = {
+        'statusCode': 202,
+        'body': json.dumps({'status': 'queued', 'messageId': message_id,
+                            'requestId': context.aws_request_id})
+    }
+    _idempotency_finish(slot, result)
+    return result
+
+def _priority_field(value):
+    """{'priority': n} for a valid request priority, {} when none was sent."""
+    if value is None:
+        return {}
+    from tinyllama.utils.schema import parse_priority   # pydantic only when needed
+    return {'priority': parse_priority(value)}
+
+def _authenticate(event):
+    """
+    Verify the bearer token of *event*.
+    Returns (token, claims, None) on success or (None, None, error_response).
+    """
+    auth_header = (event.get('headers') or {}).get('authorization', '')
+    token = auth_header.removeprefix('Bearer ').strip()
+    if not token:
+        log.warning("missing_token")
+        return None, None, {'statusCode': 401, 'body': json.dumps({'error': 'missing_token'})}
+
+    try:
+        with timed('verify'):           # includes jwks_fetch when keys are (re)loaded
+            claims = verify_jwt(token)
+        log.debug("jwt_ok", sub=claims.get('sub'))
+    except ExpiredSignatureError:
+        log.warning("token_expired")
+        return None, None, {'statusCode': 401, 'body': json.dumps({'error': 'token_expired'})}
+    except JWTError as exc:
+        log.warning("invalid_token", details=str(exc))
+        return None, None, {'statusCode': 403, 'body': json.dumps({'error': 'invalid_token'})}
+    return token, claims, None
+
+# ---------------------------------------------------------------------------
+#  Message body
+# ---------------------------------------------------------------------------
+def _get_codec():
+    global _codec
+    if _codec is None:
+        from tinyllama.utils.codec import MessageCodec
+        _codec = MessageCodec()
+    return _codec
+
+def _encode_message(message):
+    with timed('encode'):
+        return _get_codec().encode(message)
+
+def _signing_key():
+    """
+    Envelope HMAC key, or None (also outside envelope mode). In envelope mode
+    a missing key means _key_unavailable(): the worker would reject the job.
+    """
+    if MESSAGE_TOKEN_MODE != 'envelope':
+        return None
+    try:
+        return envelope.signing_key()
+    except Exception:
+        log.exception("signing_key_unavailable")
+        return None
+
+def _key_unavailable(signing_key):
+    """The 503 when envelope mode has no key to sign with, else None."""
+    if MESSAGE_TOKEN_MODE != 'envelope' or signing_key:
+        return None
+    count('signing_key_unavailable')
+    return {
+        'statusCode': 503,
+        'headers': {'Retry-After': '5'},
+        'body': json.dumps({'error': 'signing_key_unavailable'}),
+    }
+
+def _identity_fields(token, claims, request_id, prompt, signing_key):
+    """What of the caller's identity travels in the message (see MESSAGE_TOKEN_MODE)."""
+    if MESSAGE_TOKEN_MODE == 'envelope' and signing_key:
+        with timed('sign'):
+            return {'job': envelope.sign(claims['sub'], claims['exp'], request_id, prompt, signing_key)}
+    if MESSAGE_TOKEN_MODE != 'digest':
+        raise ValueError(f"unknown MESSAGE_TOKEN_MODE {MESSAGE_TOKEN_MODE!r}; expected envelope or digest")
+    digest = hashlib.sha256(token.encode('utf-8')).digest()[:16]
+    return {'claims': {
+        'sub': claims['sub'],
+        'exp': claims.get('exp'),
+        'tdig': base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii'),
+    }}
+
+def _group_id(claims, request_id):
+    return grouping.group_id(GROUP_STRATEGY, claims['sub'], request_id, GROUP_SHARDS)
+
+# ---------------------------------------------------------------------------
+#  Per-user rate limit
+# ---------------------------------------------------------------------------
+def _get_rate_limiter():
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = ratelimit.limiter_from_env() or False
+    return _rate_limiter
+
+def _rate_limit(claims, cost):
+    """None to admit, or a 429 when the caller's bucket is empty. Fails open."""
+    limiter = _get_rate_limiter()
+    if not limiter:
+        return None
+    try:
+        with timed('rate_limit'):
+            allowed, wait = limiter.acquire(claims['sub'], cost)
+    except Exception:
+        log.exception("rate_limit_store_failed")
+        return None
+    if allowed:
+        return None
+    count('rate_limited')
+    retry_after = ratelimit.retry_after_header(wait)
+    log.warning("rate_limited", sub=claims['sub'], cost=cost, retry_after=retry_after)
+    return {
+        'statusCode': 429,
+        'headers': {'Retry-After': retry_after},
+        'body': json.dumps({'error': 'rate_limited', 'retry_after': int(retry_after)}),
+    }
+
+# ---------------------------------------------------------------------------
+#  Response cache
+# ---------------------------------------------------------------------------
+def _get_response_cache():
+    global _response_cache
+    if _response_cache is None:
+        from tinyllama.utils.cache import cache_from_env
+        _response_cache = cache_from_env() or False
+    return _response_cache
+
+def _cached_reply(prompt, req):
+    """200 with a cached output, or None (miss, opted out, no cache). Fails open."""
+    cache = _get_response_cache()
+    if not cache or req.get('cache') is False:
+        return None
+    try:
+        with timed('cache'):
+            output = cache.lookup(prompt, promptkey.generation_params(req))
+    except Exception:
+        log.exception("response_cache_failed")
+        return None
+    if output is None:
+        count('cache_miss')
+        return None
+    # hit ratio = cache_hit / (cache_hit + cache_miss) over any period
+    count('cache_hit')
+    count('cache_bytes_saved', len(output.encode('utf-8')))
+    log.info("cache_hit", output_chars=len(output))
+    return {'statusCode': 200, 'body': json.dumps({'status': 'done', 'output': output, 'cached': True})}
+
+# ---------------------------------------------------------------------------
+#  Identical-prompt coalescing
+# ---------------------------------------------------------------------------
+def _get_coalescer():
+    global _coalescer
+    if _coalescer is None:
+        _coalescer = coalesce.store_from_env() or False
+    return _coalescer
+
+def _coalesce_join(prompt, req, request_id, claims):
+    """
+    (key, None) when this request leads and must be enqueued - key is None
+    when coalescing is off - or (key, 202) attaching it to the open job.
+    Fails open: a store error just means one more inference.
+    """
+    store = _get_coalescer()
+    if not store:
+        return None, None
+    try:
+        with timed('coalesce'):
+            key = promptkey.request_key(prompt, promptkey.generation_params(req))
+            leader = store.join(key, request_id, claims['sub'])
+    except Exception:
+        log.exception("coalesce_store_failed")
+        return None, None
+    if leader is None:
+        return key, None
+    # work saved: one inference of roughly this many prompt tokens
+    count('coalesced')
+    count('coalesced_prompt_tokens', len(prompt) // 4 + 1)
+    log.info("coalesced", leader=leader)
+    return key, {
+        'statusCode': 202,
+        'body': json.dumps({'status': 'queued', 'requestId': leader, 'coalesced': True}),
+    }
+
+def _coalesce_release(key, request_id):
+    """The leader was not enqueued after all: let the next identical prompt lead."""
+    if key is None:
+        return
+    try:
+        _get_coalescer().release(key, request_id)
+    except Exception:
+        log.exception("coalesce_store_failed")
+
+def _coalesce_reader(request_id, sub):
+    store = _get_coalescer()
+    if not store:
+        return False
+    try:
+        return store.is_reader(request_id, sub)
+    except Exception:
+        log.exception("coalesce_store_failed")
+        return False
+
+# ---------------------------------------------------------------------------
+#  Admission control
+# ---------------------------------------------------------------------------
+def _queue_depth():
+    return _get_queue().depth()
+
+def _get_admission():
+    global _admission
+    if _admission is None:
+        _admission = admission.AdmissionController(admission.QueueDepthProbe(_queue_depth))
+    return _admission
+
+def _admit(batch=False):
+    """None to admit, or the 429 (batch shed) / 503 (queue full) response."""
+    with timed('admission'):
+        decision, wait, depth = _get_admission().check(batch=batch)
+    if decision == admission.ADMIT:
+        return None
+    status, error = (429, 'queue_busy') if decision == admission.SHED else (503, 'queue_full')
+    count('admission_rejected')
+    log.warning("admission_rejected", decision=decision, queue_depth=depth, retry_after=wait)
     return {
+        'statusCode': status,
+        'headers': {'Retry-After': str(wait)},
+        'body': json.dumps({'error': error, 'retry_after': wait}),
+    }
+
+# ---------------------------------------------------------------------------
+#  Idempotency-Key
+# ---------------------------------------------------------------------------
+def _get_idempotency_store():
+    global _idem_store
+    if _idem_store is None:
+        _idem_store = idempotency.store_from_env()
+    return _idem_store
+
+def _header(event, name):
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+def _idempotency_begin(event, claims):
+    """
+    Claim the request's Idempotency-Key for the caller.
+    Returns (slot, None) to go ahead - slot is None when no key was sent -
+    or (None, response) when a stored response or a conflict is returned.
+    """
+    key = _header(event, IDEMPOTENCY_HEADER)
+    if key is None:
+        return None, None
+    key = key.strip()
+    if not idempotency.valid_key(key):
+        log.warning("invalid_idempotency_key", key_chars=len(key))
+        return None, {'statusCode': 400, 'body': json.dumps({'error': 'invalid_idempotency_key'})}
+
+    user = claims['sub']
+    fingerprint = idempotency.fingerprint(
+        event.get('routeKey') or event.get('rawPath') or '', event.get('body') or '')
+    slot = {'store': _get_idempotency_store(), 'user': user, 'key': key,
+            'fingerprint': fingerprint, 'dedup_id': idempotency.dedup_id(user, key)}
+    try:
+        with timed('idempotency'):
+            record = slot['store'].claim(user, key, fingerprint)
+    except Exception:
+        # Fail open: the SQS deduplication id still collapses retries for 5 minutes
+        log.exception("idempotency_store_failed")
+        slot['store'] = None
+        return slot, None
+
+    if record is None:
+        return slot, None
+    if record['fingerprint'] != fingerprint:
+        log.warning("idempotency_key_reused", idempotency_key=key)
+        return None, {'statusCode': 422, 'body': json.dumps({'error': 'idempotency_key_reused'})}
+    if record['state'] != idempotency.DONE:
+        log.info("idempotency_in_progress", idempotency_key=key)
+        return None, {
+            'statusCode': 409,
+            'headers': {'Retry-After': '1'},
+            'body': json.dumps({'error': 'request_in_progress'}),
+        }
+    log.info("idempotent_replay", idempotency_key=key)
+    replay = dict(record['response'])
+    replay['headers'] = {**replay.get('headers', {}), 'Idempotent-Replayed': 'true'}
+    return None, replay
+
+def _idempotency_finish(slot, response):
+    """Store a 202 for replay; release the key for any other outcome."""
+    if not slot or slot['store'] is None:
+        return
+    try:
+        if response is not None and response['statusCode'] == 202:
+            slot['store'].complete(slot['user'], slot['key'], slot['fingerprint'], response)
+        else:
+            slot['store'].release(slot['user'], slot['key'])
+    except Exception:
+        log.exception("idempotency_store_failed")
+
+# ---------------------------------------------------------------------------
+#  GET /jobs/{request_id}
+# ---------------------------------------------------------------------------
+def _get_result_store():
+    global _result_store
+    if _result_store is None:
+        from tinyllama.utils import results
+        _result_store = results.store_from_env() or False
+    return _result_store
+
+def _job_id(event):
+    """request_id of a GET /jobs/{request_id} call, None for other routes."""
+    if event.get('routeKey') == JOBS_ROUTE:
+        return (event.get('pathParameters') or {}).get('request_id', '')
+    method = ((event.get('requestContext') or {}).get('http') or {}).get('method')
+    path = (event.get('rawPath') or '').rstrip('/')
+    if method == 'GET' and '/jobs/' in path:
+        return path.rsplit('/jobs/', 1)[1]
+    return None
+
+def _poll_seconds(event):
+    """?wait=N (default and cap JOB_POLL_MAX_SECONDS); 0 returns at once."""
+    raw = (event.get('queryStringParameters') or {}).get('wait', JOB_POLL_MAX_SECONDS)
+    try:
+        return max(0, min(int(raw), JOB_POLL_MAX_SECONDS))
+    except (TypeError, ValueError):
+        return JOB_POLL_MAX_SECONDS
+
+def _handle_job_status(event, request_id):
+    """200 with the result, or 202 pending once the long-poll window runs out."""
+    from tinyllama.utils import results
+
+    token, claims, error = _authenticate(event)
+    if error:
+        return error
+    if not results.valid_request_id(request_id):
+        return {'statusCode': 400, 'body': json.dumps({'error': 'invalid_request_id'})}
+
+    store = _get_result_store()
+    if not store:
+        log.error("result_store_not_configured")
+        return {'statusCode': 500, 'body': json.dumps({'error': 'result_store_not_configured'})}
+
+    try:
+        with timed('result_wait'):
+            record = results.wait_for(store, request_id, _poll_seconds(event))
+    except Exception as exc:
+        log.exception("result_store_failed")
+        return {'statusCode': 502, 'body': json.dumps({'error': 'result_store_failed', 'details': str(exc)})}
+
+    # another user's job looks like an unknown one; so does a record without
+    # a sub (token / drop modes, --no-verify workers): its owner is unknown
+    if record is not None and (record.get('sub') is None or (
+            record['sub'] != claims['sub'] and not _coalesce_reader(request_id, claims['sub']))):
+        record = None
+    if record is None:
+        return {
+            'statusCode': 202,
+            'headers': {'Retry-After': '0'},
+            'body': json.dumps({'status': 'pending', 'requestId': request_id}),
+        }
+    count('result_served')
+    return {'statusCode': 200, 'body': json.dumps({k: v for k, v in record.items() if k != 'sub'})}
+
+# ---------------------------------------------------------------------------
+#  POST /infer/batch
+# ---------------------------------------------------------------------------
+def _is_batch(event):
+    if event.get('routeKey') == BATCH_ROUTE:
+        return True
+    return (event.get('rawPath') or '').rstrip('/').endswith('/infer/batch')
+
+def _validate_batch(req):
+    """
+    Split the batch body into (valid, failed).
+      valid  – list of (index, prompt, idle, priority, options)
+      failed – list of per-item error dicts
+    Items may be plain strings (sharing the top-level idle and priority) or
+    {"prompt": ..., "idle": ..., "priority": ...} objects. options holds the
+    generation parameters and a "cache": false opt-out, per item over top level.
+    """
+    from pydantic import ValidationError
+    from tinyllama.utils.schema import PromptReq
+
+    valid, failed = [], []
+    for index, item in enumerate(req['prompts']):
+        fields = item if isinstance(item, dict) else {'prompt': item}
+        try:
+            parsed = PromptReq(prompt=fields.get('prompt'), idle=fields.get('idle', req.get('idle')),
+                               priority=fields.get('priority', req.get('priority')))
+        except ValidationError as exc:
+            failed.append({'index': index, 'error': 'schema_invalid',
+                           'details': exc.errors()[0].get('msg', str(exc))})
+            continue
+        options = {**promptkey.generation_params(req), **promptkey.generation_params(fields)}
+        if fields.get('cache', req.get('cache')) is False:
+            options['cache'] = False
+        valid.append((index, parsed.prompt, parsed.idle, parsed.priority, options))
+    return valid, failed
+
+def _handle_batch(event, context):
+    """
+    Validate up to MAX_BATCH_PROMPTS prompts, verify the JWT once, enqueue in chunks of 10.
+    Batches are not answered from the response cache here; every prompt is
+    enqueued and the worker serves repeats from the cache (unless opted out).
+    """
+    try:
+        with timed('parse'):
+            req = json.loads(event.get('body') or '')
+            prompts = req['prompts']
+            if not isinstance(prompts, list) or not prompts:
+                raise ValueError("'prompts' must be a non-empty list")
+            if len(prompts) > MAX_BATCH_PROMPTS:
+                raise ValueError(f"at most {MAX_BATCH_PROMPTS} prompts per batch; got {len(prompts)}")
+    except Exception as exc:
+        log.warning("invalid_request", details=str(exc))
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'invalid_request', 'details': str(exc)})
+        }
+
+    token, claims, error = _authenticate(event)
+    if error:
+        return error
+
+    if not _queue_configured():
+        log.error("queue_not_configured")
+        return {'statusCode': 500, 'body': json.dumps({'error': 'queue_not_configured'})}
+
+    with timed('parse'):
+        valid, failed = _validate_batch(req)
+    if not valid:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'schema_invalid', 'failed': failed})
+        }
+
+    slot, replay = _idempotency_begin(event, claims)
+    if replay:
+        return replay
+
+    rejected = _rate_limit(claims, cost=len(valid)) or _admit(batch=True)
+    if rejected:
+        _idempotency_finish(slot, rejected)
+        return rejected
+
+    signing_key = _signing_key()
+    unavailable = _key_unavailable(signing_key)
+    if unavailable:
+        _idempotency_finish(slot, None)
+        return unavailable
+
+    base_id = getattr(context, 'aws_request_id', None) or 'batch'
+    entries = []
+    for index, prompt, idle, priority, options in valid:
+        try:
+            body = _encode_message({
+                **_identity_fields(token, claims, f"{base_id}-{index}", prompt, signing_key),
+                'prompt': prompt,
+                'idle': idle,
+                **_priority_field(priority),
+                **options,
+                'request_id': f"{base_id}-{index}",
+                'group_strategy': GROUP_STRATEGY,
+            })
+        except Exception as exc:
+            log.exception("encode_failed", index=index)
+            failed.append({'index': index, 'error': 'encode_failed', 'details': str(exc)})
+            continue
+        entries.append({
+            'id': str(index),
+            'body': body,
+            'group_id': _group_id(claims, f"{base_id}-{index}"),
+            'dedup_id': f"{slot['dedup_id']}-{index}" if slot else None,
+        })
+
+    # SQS sends these in SendMessageBatch calls of <= 10 entries / 256 KiB
+    queued = []
+    try:
+        with timed('enqueue'):
+            results = _get_queue().enqueue_batch(entries) if entries else []
+    except Exception as exc:
+        log.exception("enqueue_failed", count=len(entries))
+        results = [{'id': e['id'], 'error': str(exc)} for e in entries]
+    for res in results:
+        if 'error' in res:
+            failed.append({'index': int(res['id']), 'error': 'enqueue_failed', 'details': res['error']})
+        else:
+            queued.append({'index': int(res['id']), 'messageId': res['message_id'],
+                           'requestId': f"{base_id}-{res['id']}"})
+
+    queued.sort(key=lambda r: r['index'])
+    failed.sort(key=lambda r: r['index'])
+    if not queued:
+        _idempotency_finish(slot, None)
+        return {
+            'statusCode': 502,
+            'body': json.dumps({'error': 'enqueue_failed', 'failed': failed})
+        }
+    result = {
         'statusCode': 202,
-        'body': json.dumps({'status': 'queued', 'messageId': resp.get('MessageId')})
+        'body': json.dumps({
+            'status': 'queued' if not failed else 'partial',
+            'queued': queued,
+            'failed': failed,
+        })
     }
+    _idempotency_finish(slot, result)
+    return result
@@ -0,0 +1,218 @@
+# tinyllama/router/idempotency.py
+# ---------------------------------------------------------------------------
+# Idempotency-Key support for the router.
+#
+# A client that retries POST /infer after a timeout sends the same
+# Idempotency-Key header; the router then replays the first 202 instead of
+# enqueueing a second job. Entries are scoped per user (JWT "sub").
+#
+#   store.claim(user, key, fingerprint)  -> None  (caller owns the key)
+#                                        -> dict  (existing record)
+#   store.complete(user, key, fingerprint, response)
+#                                        -> record the response to replay
+#   store.release(user, key)             -> forget a failed attempt
+#
+# Records: {"state": "pending"|"done", "fingerprint": str, "response": dict|None}
+# A pending claim expires after PENDING_TTL so a crashed invocation never
+# locks a key for the full TTL.
+#
+# Stores:
+#   InMemoryIdempotencyStore  – per warm container (default)
+#   DynamoDbIdempotencyStore  – shared across containers; IDEMPOTENCY_TABLE
+# ---------------------------------------------------------------------------
+
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_PENDING_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_PENDING_TTL_SECONDS", "30"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+MAX_KEY_LENGTH = 255
+
+PENDING = "pending"
+DONE = "done"
+
+Record = Dict[str, Any]
+
+
+def fingerprint(*parts: str) -> str:
+    """Stable digest of the request parts a key is bound to (route, body)."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def dedup_id(user: str, key: str) -> str:
+    """SQS MessageDeduplicationId for (user, key): 64 hex chars, within the 128 limit."""
+    return hashlib.sha256(f"{user}\0{key}".encode("utf-8")).hexdigest()
+
+
+def valid_key(key: str) -> bool:
+    return 0 < len(key) <= MAX_KEY_LENGTH and key.isprintable()
+
+# ---------------------------------------------------------------------------
+#  In-memory store
+# ---------------------------------------------------------------------------
+class InMemoryIdempotencyStore:
+    """Bounded LRU of records; only dedups retries that hit the same container."""
+
+    def __init__(
+        self,
+        ttl: int = IDEMPOTENCY_TTL_SECONDS,
+        pending_ttl: int = IDEMPOTENCY_PENDING_TTL_SECONDS,
+        maxsize: int = IDEMPOTENCY_CACHE_SIZE,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+        self.maxsize = maxsize
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[tuple, tuple]" = OrderedDict()  # (user, key) -> (record, expires_at)
+
+    def claim(self, user: str, key: str, fp: str) -> Optional[Record]:
+        now = self._clock()
+        with self._lock:
+            entry = self._data.get((user, key))
+            if entry is not None and entry[1] > now:
+                self._data.move_to_end((user, key))
+                return dict(entry[0])
+            self._data[(user, key)] = (
+                {"state": PENDING, "fingerprint": fp, "response": None},
+                now + self.pending_ttl,
+            )
+            self._data.move_to_end((user, key))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return None
+
+    def complete(self, user: str, key: str, fp: str, response: Dict[str, Any]) -> None:
+        # fp is passed in: the pending entry may have been evicted meanwhile
+        with self._lock:
+            self._data[(user, key)] = (
+                {"state": DONE, "fingerprint": fp, "response": response},
+                self._clock() + self.ttl,
+            )
+            self._data.move_to_end((user, key))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def release(self, user: str, key: str) -> None:
+        with self._lock:
+            self._data.pop((user, key), None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+# ---------------------------------------------------------------------------
+#  DynamoDB store
+# ---------------------------------------------------------------------------
+class DynamoDbIdempotencyStore:
+    """
+    Shared store on a DynamoDB table with string hash key ``pk``.
+    Enable TTL on the ``expires_at`` attribute; expiry is also checked in the
+    conditional write because DynamoDB deletes expired items lazily.
+    """
+
+    def __init__(
+        self,
+        table: str,
+        client: Any = None,
+        ttl: int = IDEMPOTENCY_TTL_SECONDS,
+        pending_ttl: int = IDEMPOTENCY_PENDING_TTL_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.table = table
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+        self._client = client
+        self._clock = clock
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("dynamodb")
+        return self._client
+
+    @staticmethod
+    def _pk(user: str, key: str) -> str:
+        return f"{user}#{key}"
+
+    def claim(self, user: str, key: str, fp: str, *, retry: bool = True) -> Optional[Record]:
+        now = int(self._clock())
+        try:
+            self.client.put_item(
+                TableName=self.table,
+                Item={
+                    "pk": {"S": self._pk(user, key)},
+                    "state": {"S": PENDING},
+                    "fingerprint": {"S": fp},
+                    "expires_at": {"N": str(now + self.pending_ttl)},
+                },
+                ConditionExpression="attribute_not_exists(pk) OR expires_at < :now",
+                ExpressionAttributeValues={":now": {"N": str(now)}},
+            )
+            return None
+        except Exception as exc:
+            if _error_code(exc) != "ConditionalCheckFailedException":
+                raise
+
+        item = self.client.get_item(
+            TableName=self.table,
+            Key={"pk": {"S": self._pk(user, key)}},
+            ConsistentRead=True,
+        ).get("Item")
+        if item is None:                            # deleted in between: retry once
+            if not retry:
+                raise RuntimeError(f"idempotency key {key!r} kept changing under claim")
+            return self.claim(user, key, fp, retry=False)
+        return {
+            "state": item["state"]["S"],
+            "fingerprint": item.get("fingerprint", {}).get("S", ""),
+            "response": json.loads(item["response"]["S"]) if "response" in item else None,
+        }
+
+    def complete(self, user: str, key: str, fp: str, response: Dict[str, Any]) -> None:
+        self.client.update_item(
+            TableName=self.table,
+            Key={"pk": {"S": self._pk(user, key)}},
+            UpdateExpression="SET #s = :done, #r = :resp, fingerprint = :fp, expires_at = :exp",
+            ExpressionAttributeNames={"#s": "state", "#r": "response"},
+            ExpressionAttributeValues={
+                ":done": {"S": DONE},
+                ":fp": {"S": fp},
+                ":resp": {"S": json.dumps(response)},
+                ":exp": {"N": str(int(self._clock()) + self.ttl)},
+            },
+        )
+
+    def release(self, user: str, key: str) -> None:
+        self.client.delete_item(TableName=self.table, Key={"pk": {"S": self._pk(user, key)}})
+
+
+def _error_code(exc: Exception) -> Optional[str]:
+    """botocore ClientError code without importing botocore."""
+    return (getattr(exc, "response", None) or {}).get("Error", {}).get("Code")
+
+
+def store_from_env() -> Any:
+    """DynamoDB store when IDEMPOTENCY_TABLE is set, otherwise in-memory."""
+    table = os.getenv("IDEMPOTENCY_TABLE", "").strip()
+    if table:
+        return DynamoDbIdempotencyStore(table)
+    return InMemoryIdempotencyStore()
+
+
+__all__ = [
+    "InMemoryIdempotencyStore", "DynamoDbIdempotencyStore", "store_from_env",
+    "fingerprint", "dedup_id", "valid_key",
+]
@@ -0,0 +1,238 @@
+# tinyllama/router/ratelimit.py
+# ---------------------------------------------------------------------------
+# Per-user rate limiting in front of the SQS enqueue.
+#
+#   limiter.acquire(sub, cost)  -> (allowed, retry_after_seconds)
+#
+# Two backends:
+#   InMemoryRateLimiter  – exact token bucket per sub, bounded LRU; only sees
+#                          the traffic of one warm container (default)
+#   CounterRateLimiter   – shared across containers on an atomic-counter store
+#                          (DynamoDB ADD / Redis INCRBY). Counters cannot hold
+#                          a refilling bucket, so the bucket is approximated
+#                          with a sliding-window counter: *burst* requests per
+#                          window of burst / rate seconds, the previous window
+#                          weighted by its remaining overlap.
+#
+# A request costs one token per prompt, capped at *burst* so a full batch can
+# still go through an idle bucket.
+#
+# RATE_LIMIT_PER_MINUTE (30), RATE_LIMIT_BURST (10); RATE_LIMIT_TABLE selects
+# the shared DynamoDB counter store, else RATE_LIMIT_REDIS_URL the Redis one
+# (needs redis-py). A rate of 0 disables limiting.
+# ---------------------------------------------------------------------------
+
+from __future__ import annotations
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "30"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "10"))
+RATE_LIMIT_CACHE_SIZE = int(os.getenv("RATE_LIMIT_CACHE_SIZE", "10000"))
+
+Decision = Tuple[bool, float]
+
+# ---------------------------------------------------------------------------
+#  In-process token bucket
+# ---------------------------------------------------------------------------
+class InMemoryRateLimiter:
+    """Token bucket per key: *burst* capacity, refilled at *rate_per_sec*."""
+
+    def __init__(
+        self,
+        rate_per_sec: float,
+        burst: int,
+        maxsize: int = RATE_LIMIT_CACHE_SIZE,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rate = rate_per_sec
+        self.burst = burst
+        self.maxsize = maxsize
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (tokens, updated_at)
+        self.allowed = 0
+        self.rejected = 0
+
+    def acquire(self, key: str, cost: int = 1) -> Decision:
+        cost = min(cost, self.burst)
+        now = self._clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+                self.allowed += 1
+            else:
+                wait = (cost - tokens) / self.rate
+                self.rejected += 1
+            self._buckets[key] = (tokens, now)          # re-insert as most recent
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait == 0.0, wait
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"keys": len(self._buckets), "allowed": self.allowed, "rejected": self.rejected}
+
+# ---------------------------------------------------------------------------
+#  Atomic-counter stores
+# ---------------------------------------------------------------------------
+class InMemoryCounterStore:
+    """Local stand-in for a shared counter store (tests, single process)."""
+
+    def __init__(self, clock: Callable[[], float] = time.time) -> None:
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data: Dict[str, Tuple[int, float]] = {}       # key -> (value, expires_at)
+
+    def incr(self, key: str, amount: int, ttl: float) -> int:
+        now = self._clock()
+        with self._lock:
+            value, expires = self._data.get(key, (0, now + ttl))
+            if expires <= now:
+                value, expires = 0, now + ttl
+            value += amount
+            self._data[key] = (value, expires)
+            return value
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            value, expires = self._data.get(key, (0, 0.0))
+            return value if expires > self._clock() else 0
+
+
+class DynamoDbCounterStore:
+    """
+    Counters on a DynamoDB table with string hash key ``pk`` and number
+    attribute ``n``; enable TTL on ``expires_at``.
+    """
+
+    def __init__(self, table: str, client: Any = None, clock: Callable[[], float] = time.time) -> None:
+        self.table = table
+        self._client = client
+        self._clock = clock
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("dynamodb")
+        return self._client
+
+    def incr(self, key: str, amount: int, ttl: float) -> int:
+        resp = self.client.update_item(
+            TableName=self.table,
+            Key={"pk": {"S": key}},
+            UpdateExpression="ADD n :amount SET expires_at = if_not_exists(expires_at, :exp)",
+            ExpressionAttributeValues={
+                ":amount": {"N": str(amount)},
+                ":exp": {"N": str(int(self._clock() + ttl))},
+            },
+            ReturnValues="UPDATED_NEW",
+        )
+        return int(resp["Attributes"]["n"]["N"])
+
+    def get(self, key: str) -> int:
+        item = self.client.get_item(TableName=self.table, Key={"pk": {"S": key}}).get("Item")
+        return int(item["n"]["N"]) if item else 0
+
+class RedisCounterStore:
+    """
+    Counters as Redis integers under ``tl:ratelimit:<key>``. INCRBY and the
+    first EXPIRE run as one Lua script, so a counter never outlives its
+    window even if the container dies between the two.
+    """
+
+    _INCR = """
+local n = redis.call('INCRBY', KEYS[1], ARGV[1])
+if redis.call('PTTL', KEYS[1]) < 0 then redis.call('PEXPIRE', KEYS[1], ARGV[2]) end
+return n
+"""
+
+    def __init__(self, client: Any, prefix: str = "tl:ratelimit:") -> None:
+        self.client = client
+        self.prefix = prefix
+        self._incr: Any = None
+
+    def incr(self, key: str, amount: int, ttl: float) -> int:
+        if self._incr is None:
+            self._incr = self.client.register_script(self._INCR)
+        return int(self._incr(keys=[self.prefix + key], args=[amount, max(int(ttl * 1000), 1)]))
+
+    def get(self, key: str) -> int:
+        return int(self.client.get(self.prefix + key) or 0)
+
+# ---------------------------------------------------------------------------
+#  Shared limiter
+# ---------------------------------------------------------------------------
+class CounterRateLimiter:
+    """Sliding-window approximation of the token bucket over a counter store."""
+
+    def __init__(
+        self,
+        store: Any,
+        rate_per_sec: float,
+        burst: int,
+        prefix: str = "rl",
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.store = store
+        self.rate = rate_per_sec
+        self.burst = burst
+        self.window = burst / rate_per_sec
+        self.prefix = prefix
+        self._clock = clock
+        self.allowed = 0
+        self.rejected = 0
+
+    def acquire(self, key: str, cost: int = 1) -> Decision:
+        cost = min(cost, self.burst)
+        now = self._clock()
+        index = int(now // self.window)
+        overlap = 1.0 - (now - index * self.window) / self.window
+
+        current = self.store.incr(f"{self.prefix}#{key}#{index}", cost, ttl=2 * self.window)
+        previous = self.store.get(f"{self.prefix}#{key}#{index - 1}")
+        used = previous * overlap + current
+        if used <= self.burst:
+            self.allowed += 1
+            return True, 0.0
+
+        self.store.incr(f"{self.prefix}#{key}#{index}", -cost, ttl=2 * self.window)  # refund
+        self.rejected += 1
+        return False, max((used - self.burst) / self.rate, 1.0)
+
+    def stats(self) -> Dict[str, int]:
+        return {"allowed": self.allowed, "rejected": self.rejected}
+
+
+def limiter_from_env() -> Any:
+    """None when disabled; shared limiter when RATE_LIMIT_TABLE or RATE_LIMIT_REDIS_URL is set."""
+    if RATE_LIMIT_PER_MINUTE <= 0 or RATE_LIMIT_BURST <= 0:
+        return None
+    rate = RATE_LIMIT_PER_MINUTE / 60.0
+    table = os.getenv("RATE_LIMIT_TABLE", "").strip()
+    if table:
+        return CounterRateLimiter(DynamoDbCounterStore(table), rate, RATE_LIMIT_BURST)
+    url = os.getenv("RATE_LIMIT_REDIS_URL", "").strip()
+    if url:
+        import redis
+        return CounterRateLimiter(RedisCounterStore(redis.Redis.from_url(url)), rate, RATE_LIMIT_BURST)
+    return InMemoryRateLimiter(rate, RATE_LIMIT_BURST)
+
+
+def retry_after_header(wait: float) -> str:
+    return str(max(int(math.ceil(wait)), 1))
+
+
+__all__ = [
+    "InMemoryRateLimiter", "CounterRateLimiter",
+    "InMemoryCounterStore", "DynamoDbCounterStore", "RedisCounterStore",
+    "limiter_from_env", "retry_after_header",
+]
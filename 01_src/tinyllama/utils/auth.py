@@ -6,35 +6,126 @@
 # ---------------------------------------------------------------------------
 
 from __future__ import annotations
-import json
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Any
-import urllib.request
-import urllib.error
+from typing import Dict, Any, Optional, Tuple
 
-from jose import jwt, jwk, JWTError
+from jose import jwt, JWTError
 
-# ---------------------------------------------------------------------------
-#  Test helper (kept unchanged)
-# ---------------------------------------------------------------------------
-from .jwt_tools import make_token                      # noqa: F401
+from tinyllama.utils.jwks import JwksManager, fetch_jwks
+from tinyllama.utils.log import get_logger
+from tinyllama.utils.metrics import timed
+
+log = get_logger(__name__)
 
 # ---------------------------------------------------------------------------
-#  Runtime configuration (resolved via SSM)
+#  Runtime configuration (resolved via SSM on first use, not at import)
+#
+#  The test helper make_token lives in tinyllama.utils.jwt_tools and is
+#  deliberately NOT imported here: it pulls in RSA key generation and may
+#  write key files, which has no place on the Lambda cold-start path.
 # ---------------------------------------------------------------------------
 from tinyllama.utils.ssm import get_id
 
 AWS_REGION = os.getenv("AWS_REGION", "eu-central-1")
-COGNITO_CLIENT_ID = get_id("cognito_client_id")
-COGNITO_ISSUER = (
-    f"https://cognito-idp.{AWS_REGION}.amazonaws.com/"
-    f"{get_id('cognito_user_pool_id')}"
-)
+
+# Terraform injects COGNITO_ISSUER / COGNITO_AUD into the Lambda env; when
+# present they are used as-is. Otherwise get_id resolves the IDs through the
+# baked config snapshot or the env-aware TTL cache in tinyllama.utils.ssm.
+def _cognito_client_id() -> str:
+    return os.getenv("COGNITO_AUD") or get_id("cognito_client_id")
+
+def _cognito_issuer() -> str:
+    issuer = os.getenv("COGNITO_ISSUER")
+    if issuer:
+        return issuer.rstrip("/")
+    return (
+        f"https://cognito-idp.{AWS_REGION}.amazonaws.com/"
+        f"{get_id('cognito_user_pool_id')}"
+    )
+
+def __getattr__(name: str) -> str:
+    # keep `auth.COGNITO_ISSUER` / `auth.COGNITO_CLIENT_ID` working, lazily
+    if name == "COGNITO_ISSUER":
+        return _cognito_issuer()
+    if name == "COGNITO_CLIENT_ID":
+        return _cognito_client_id()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Optional local JWKS override for unit tests
 _LOCAL_JWKS_PATH = Path(os.getenv("LOCAL_JWKS_PATH", ""))
-_cached_jwks: Dict[str, Dict[str, Any]] = {}
+
+# Size cap for the verified-claims cache (0 disables it)
+CLAIMS_CACHE_SIZE = int(os.getenv("JWT_CLAIMS_CACHE_SIZE", "256"))
+
+# ---------------------------------------------------------------------------
+#  Verified-claims cache (warm containers)
+# ---------------------------------------------------------------------------
+class _ClaimsCache:
+    """
+    Bounded LRU of already-verified claims.
+
+    Keys are SHA-256 digests of the full token (signature included), so a
+    tampered token can never hit. Each entry expires at the token's `exp`.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            exp, claims = entry
+            if now >= exp:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return dict(claims)
+
+    def put(self, key: str, claims: Dict[str, Any]) -> None:
+        exp = claims.get("exp")
+        if self.maxsize <= 0 or not isinstance(exp, (int, float)):
+            return
+        with self._lock:
+            self._data[key] = (float(exp), dict(claims))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
+
+_claims_cache = _ClaimsCache(CLAIMS_CACHE_SIZE)
 
 # ---------------------------------------------------------------------------
 #  Helpers
@@ -45,15 +136,16 @@ def _load_jwks() -> Dict[str, Dict[str, Any]]:
     – Uses LOCAL_JWKS_PATH during tests.
     – Falls back to Cognito’s JWKS endpoint in Lambda.
     """
-    print("DBG jwks-path:", _LOCAL_JWKS_PATH if _LOCAL_JWKS_PATH else ".")
-    if _LOCAL_JWKS_PATH.is_file():
-        data = json.loads(_LOCAL_JWKS_PATH.read_text())
-    else:
-        url = f"{COGNITO_ISSUER}/.well-known/jwks.json"
-        with urllib.request.urlopen(url, timeout=5) as resp:
-            data = json.loads(resp.read().decode("utf-8"))
-    print("DBG jwks kids:", [k["kid"] for k in data["keys"]])
-    return {k["kid"]: k for k in data["keys"]}
+    jwks = fetch_jwks(f"{_cognito_issuer()}/.well-known/jwks.json", _LOCAL_JWKS_PATH)
+    log.info("jwks_loaded", kids=list(jwks), local=_LOCAL_JWKS_PATH.is_file())
+    return jwks
+
+def _timed_load_jwks() -> Dict[str, Dict[str, Any]]:
+    with timed("jwks_fetch"):
+        return _load_jwks()
+
+# Late-bound so tests can swap _load_jwks on the module
+_jwks_manager = JwksManager(_timed_load_jwks)
 
 # ---------------------------------------------------------------------------
 #  Public API
@@ -64,36 +156,49 @@ def verify_jwt(token: str) -> Dict[str, Any]:
 
     Raises jose.JWTError on any failure.
     Returns decoded claims dict when valid.
+    Tokens verified earlier in this container are served from the claims
+    cache until their `exp`, skipping the RSA signature check.
     """
-    print("DBG raw-token-len:", len(token))
     segs = token.count(".") + 1
-    print("DBG segments:", segs)
     if segs != 3:
+        log.debug("malformed_token", token_len=len(token), segments=segs)
         raise JWTError("token is not header.payload.signature")
 
+    cache_key = _ClaimsCache.key(token)
+    cached = _claims_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
         header = jwt.get_unverified_header(token)
     except Exception as exc:
-        print("DBG header-decode-error:", exc)
+        log.debug("header_decode_error", details=str(exc))
         raise
 
     kid = header.get("kid")
     if not kid:
         raise JWTError("missing kid")
 
-    global _cached_jwks
-    if kid not in _cached_jwks:
-        _cached_jwks = _load_jwks()
-    jwk_entry = _cached_jwks.get(kid)
-    if jwk_entry is None:
+    key = _jwks_manager.get_key(kid)
+    if key is None:
         raise JWTError("unknown kid")
 
-    return jwt.decode(
+    claims = jwt.decode(
         token,
-        jwk.construct(jwk_entry),
+        key,
         algorithms=["RS256"],
         options={"verify_aud": False},
-        issuer=COGNITO_ISSUER,
+        issuer=_cognito_issuer(),
     )
+    _claims_cache.put(cache_key, claims)
+    return claims
+
+def claims_cache_stats() -> Dict[str, int]:
+    """Return hit/miss counters and current size of the claims cache."""
+    return _claims_cache.stats()
+
+def clear_claims_cache() -> None:
+    """Drop every cached claims entry and reset the counters."""
+    _claims_cache.clear()
 
-__all__ = ["make_token", "verify_jwt"]
+__all__ = ["verify_jwt", "claims_cache_stats", "clear_claims_cache"]
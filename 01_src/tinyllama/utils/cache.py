@@ -0,0 +1,246 @@
+# tinyllama/utils/cache.py
+# ---------------------------------------------------------------------------
+# Prompt -> completion response cache, shared by the worker (fills it after
+# each inference) and the router (answers 200 from it without enqueueing).
+#
+#   cache = cache_from_env()                       # or ResponseCache(backend)
+#   cache.lookup(prompt, params)   -> output or None (counts hit / miss)
+#   cache.store(prompt, params, output)
+#   cache.stats, cache.hit_ratio
+#
+# Keys are tinyllama.utils.promptkey.request_key(prompt, params, model):
+# model + normalised prompt + generation parameters.
+#
+# Backends (get / set):
+#   MemoryCacheBackend   – LRU in this process; the worker, local runs
+#   SqliteCacheBackend   – one SQLite file; survives restarts, can be shared
+#                          by processes on one host
+#   RedisCacheBackend    – any Redis-compatible server; shared by router and
+#                          workers. Size eviction is the server's job: run it
+#                          with maxmemory + maxmemory-policy allkeys-lru
+#
+# Every backend expires entries after RESPONSE_CACHE_TTL_SECONDS; the local
+# ones also evict least-recently-used entries beyond
+# RESPONSE_CACHE_MAX_ENTRIES / RESPONSE_CACHE_MAX_BYTES (UTF-8 bytes of the
+# stored outputs).
+#
+# RESPONSE_CACHE_URL selects the backend: "memory", "sqlite:<path>",
+# "redis://..." (needs redis-py); unset means no cache.
+#
+# A request opts out with "cache": false in its body: it is neither answered
+# from nor written to the cache.
+# ---------------------------------------------------------------------------
+
+from __future__ import annotations
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from tinyllama.utils.promptkey import MODEL_ID, request_key
+
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+def _size(value: str) -> int:
+    return len(value.encode("utf-8"))
+
+
+def cache_enabled(body: Mapping[str, Any]) -> bool:
+    """False when the request opted out with "cache": false."""
+    return body.get("cache") is not False
+
+# ---------------------------------------------------------------------------
+#  Backends
+# ---------------------------------------------------------------------------
+class MemoryCacheBackend:
+    def __init__(
+        self,
+        ttl: int = RESPONSE_CACHE_TTL_SECONDS,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()  # key -> (value, expires_at)
+        self._bytes = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= self._clock():
+                self._drop(key)
+                return None
+            self._data.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (value, self._clock() + self.ttl)
+            self._bytes += _size(value)
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._data)))
+
+    def _drop(self, key: str) -> None:
+        value, _ = self._data.pop(key)
+        self._bytes -= _size(value)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SqliteCacheBackend:
+    def __init__(
+        self,
+        path: str,
+        ttl: int = RESPONSE_CACHE_TTL_SECONDS,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, bytes INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL, used_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS response_cache_used ON response_cache (used_at)")
+
+    def get(self, key: str) -> Optional[str]:
+        now = self._clock()
+        with self._lock:
+            row = self._db.execute("SELECT value, expires_at FROM response_cache WHERE key = ?",
+                                   (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._db.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                return None
+            self._db.execute("UPDATE response_cache SET used_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = self._clock()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?, ?)",
+                    (key, value, _size(value), now + self.ttl, now),
+                )
+                self._db.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+                self._evict()
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _evict(self) -> None:
+        entries, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM response_cache").fetchone()
+        if entries <= self.max_entries and total <= self.max_bytes:
+            return
+        drop = []
+        for key, size in self._db.execute("SELECT key, bytes FROM response_cache ORDER BY used_at"):
+            if entries <= self.max_entries and total <= self.max_bytes:
+                break
+            drop.append((key,))
+            entries, total = entries - 1, total - size
+        self._db.executemany("DELETE FROM response_cache WHERE key = ?", drop)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM response_cache WHERE expires_at > ?",
+                                    (self._clock(),)).fetchone()[0]
+
+    def close(self) -> None:
+        self._db.close()
+
+
+class RedisCacheBackend:
+    def __init__(self, client: Any, ttl: int = RESPONSE_CACHE_TTL_SECONDS, prefix: str = "tl:cache:") -> None:
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self.client.set(self.prefix + key, value, ex=self.ttl)
+
+# ---------------------------------------------------------------------------
+#  Cache
+# ---------------------------------------------------------------------------
+class ResponseCache:
+    def __init__(self, backend: Any, model: str = MODEL_ID) -> None:
+        self.backend = backend
+        self.model = model
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0, "bytes_saved": 0}
+
+    def key(self, prompt: str, params: Optional[Mapping[str, Any]] = None) -> str:
+        return request_key(prompt, params, self.model)
+
+    def lookup(self, prompt: str, params: Optional[Mapping[str, Any]] = None) -> Optional[str]:
+        output = self.backend.get(self.key(prompt, params))
+        with self._lock:
+            if output is None:
+                self.stats["misses"] += 1
+            else:
+                self.stats["hits"] += 1
+                self.stats["bytes_saved"] += _size(output)
+        return output
+
+    def store(self, prompt: str, params: Optional[Mapping[str, Any]], output: str) -> None:
+        self.backend.set(self.key(prompt, params), output)
+        with self._lock:
+            self.stats["stores"] += 1
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+
+def cache_from_env() -> Optional[ResponseCache]:
+    """ResponseCache on the RESPONSE_CACHE_URL backend; None when unset."""
+    url = os.getenv("RESPONSE_CACHE_URL", "").strip()
+    if not url:
+        return None
+    if url == "memory":
+        return ResponseCache(MemoryCacheBackend())
+    if url.startswith("sqlite:"):
+        path = url[len("sqlite:"):]
+        return ResponseCache(SqliteCacheBackend(path[2:] if path.startswith("//") else path))
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        import redis
+        return ResponseCache(RedisCacheBackend(redis.Redis.from_url(url)))
+    raise ValueError(f"unsupported RESPONSE_CACHE_URL {url!r}")
+
+
+__all__ = [
+    "ResponseCache", "MemoryCacheBackend", "SqliteCacheBackend", "RedisCacheBackend",
+    "cache_from_env", "cache_enabled",
+]
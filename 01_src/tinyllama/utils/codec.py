@@ -0,0 +1,194 @@
+# tinyllama/utils/codec.py
+# ---------------------------------------------------------------------------
+# SQS message-body codec shared by the router (encode) and queue consumers
+# (decode).
+#
+#   codec = MessageCodec(compression="zlib", offload_bytes=64 * 1024,
+#                        bucket="tlfif-claim-check", s3=boto3.client("s3"))
+#   body  = codec.encode({"prompt": ..., "request_id": ...})
+#   job   = codec.decode(body)
+#
+# Body formats (all valid SQS text):
+#   plain JSON object                      small payloads and legacy messages
+#   {"_tlc": 1, "enc": "zlib", "data": b64}                   inline, compressed
+#   {"_tlc": 1, "enc": "zlib", "s3": {"bucket", "key"}, "sha256", "bytes"}
+#                                          claim check: compressed payload in S3
+#
+# Payloads shorter than compress_min_bytes stay plain; compression is kept
+# only when it actually shrinks the body. Claim-check objects are
+# content-addressed (key = <prefix>/<sha256>), so retries overwrite the same
+# object; expire them with an S3 lifecycle rule.
+#
+# "zstd" needs the optional `zstandard` package; "zlib" is stdlib.
+# ---------------------------------------------------------------------------
+
+from __future__ import annotations
+import base64
+import binascii
+import hashlib
+import json
+import os
+import zlib
+from typing import Any, Dict, Optional
+
+MESSAGE_COMPRESSION = os.getenv("MESSAGE_COMPRESSION", "zlib").strip().lower()
+MESSAGE_COMPRESS_MIN_BYTES = int(os.getenv("MESSAGE_COMPRESS_MIN_BYTES", "1024"))
+CLAIM_CHECK_BYTES = int(os.getenv("CLAIM_CHECK_BYTES", str(64 * 1024)))
+CLAIM_CHECK_BUCKET = os.getenv("CLAIM_CHECK_BUCKET", "")
+CLAIM_CHECK_PREFIX = os.getenv("CLAIM_CHECK_PREFIX", "claim-check")
+
+SQS_MAX_BODY_BYTES = 256 * 1024
+MARKER = "_tlc"
+
+
+class CodecError(ValueError):
+    """Body cannot be encoded within SQS limits or cannot be decoded."""
+
+# ---------------------------------------------------------------------------
+#  Compression back-ends
+# ---------------------------------------------------------------------------
+def _zstd():
+    try:
+        import zstandard
+    except ImportError as exc:                       # optional dependency
+        raise CodecError("zstd compression needs the 'zstandard' package") from exc
+    return zstandard
+
+
+def compress(data: bytes, enc: str, level: Optional[int] = None) -> bytes:
+    if enc == "zlib":
+        return zlib.compress(data, 6 if level is None else level)
+    if enc == "zstd":
+        return _zstd().ZstdCompressor(level=3 if level is None else level).compress(data)
+    if enc == "none":
+        return data
+    raise CodecError(f"unknown compression {enc!r}")
+
+
+def decompress(data: bytes, enc: str) -> bytes:
+    if enc == "zlib":
+        return zlib.decompress(data)
+    if enc == "zstd":
+        zstandard = _zstd()
+        try:
+            return zstandard.ZstdDecompressor().decompress(data)
+        except zstandard.ZstdError as exc:
+            raise CodecError(f"corrupt zstd data: {exc}") from exc
+    if enc == "none":
+        return data
+    raise CodecError(f"unknown compression {enc!r}")
+
+# ---------------------------------------------------------------------------
+#  Codec
+# ---------------------------------------------------------------------------
+class MessageCodec:
+    def __init__(
+        self,
+        compression: str = MESSAGE_COMPRESSION,
+        compress_min_bytes: int = MESSAGE_COMPRESS_MIN_BYTES,
+        offload_bytes: int = CLAIM_CHECK_BYTES,
+        bucket: str = CLAIM_CHECK_BUCKET,
+        prefix: str = CLAIM_CHECK_PREFIX,
+        s3: Any = None,
+        level: Optional[int] = None,
+    ) -> None:
+        if compression not in ("zlib", "zstd", "none"):
+            raise CodecError(f"unknown compression {compression!r}")
+        self.compression = compression
+        self.compress_min_bytes = compress_min_bytes
+        self.offload_bytes = offload_bytes
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/")
+        self.level = level
+        self._s3 = s3
+
+    @property
+    def s3(self) -> Any:
+        if self._s3 is None:
+            import boto3
+            self._s3 = boto3.client("s3")
+        return self._s3
+
+    # ------------------------------------------------------------- encoding
+    def encode(self, payload: Dict[str, Any]) -> str:
+        raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+        raw_bytes = raw.encode("utf-8")
+        if len(raw_bytes) < self.compress_min_bytes and len(raw_bytes) <= self.offload_bytes:
+            return raw
+
+        packed = compress(raw_bytes, self.compression, self.level)
+        enc = self.compression
+        if len(packed) >= len(raw_bytes):            # incompressible: ship as is
+            packed, enc = raw_bytes, "none"
+
+        inline = json.dumps({MARKER: 1, "enc": enc,
+                             "data": base64.b64encode(packed).decode("ascii")})
+        best = inline if len(inline) < len(raw_bytes) else raw
+        if len(best.encode("utf-8")) <= self.offload_bytes:
+            return best
+        if not self.bucket:
+            if len(best.encode("utf-8")) <= SQS_MAX_BODY_BYTES:
+                return best
+            raise CodecError(
+                f"payload of {len(raw_bytes)} B exceeds SQS limits and CLAIM_CHECK_BUCKET is not set")
+        return self._claim_check(packed, enc, len(raw_bytes))
+
+    def _claim_check(self, packed: bytes, enc: str, raw_len: int) -> str:
+        digest = hashlib.sha256(packed).hexdigest()
+        key = f"{self.prefix}/{digest}"
+        self.s3.put_object(Bucket=self.bucket, Key=key, Body=packed)
+        return json.dumps({
+            MARKER: 1,
+            "enc": enc,
+            "s3": {"bucket": self.bucket, "key": key},
+            "sha256": digest,
+            "bytes": raw_len,
+        })
+
+    # ------------------------------------------------------------- decoding
+    def decode(self, body: str) -> Dict[str, Any]:
+        """
+        The job payload as a dict. Anything malformed raises CodecError, so
+        consumers can drop it; S3 transport errors propagate unchanged and
+        stay retryable.
+        """
+        try:
+            outer = json.loads(body)
+        except (TypeError, ValueError) as exc:
+            raise CodecError(f"message body is not JSON: {exc}") from exc
+        if not isinstance(outer, dict):
+            raise CodecError(f"message body is a JSON {type(outer).__name__}, not an object")
+        if outer.get(MARKER) != 1:
+            return outer                                   # plain / legacy body
+
+        try:
+            if "s3" in outer:
+                bucket, key = outer["s3"]["bucket"], outer["s3"]["key"]
+            else:
+                packed = base64.b64decode(outer["data"])
+            enc = outer["enc"]
+        except (KeyError, TypeError, ValueError, binascii.Error) as exc:
+            raise CodecError(f"malformed message envelope: {exc!r}") from exc
+        if "s3" in outer:
+            packed = self.s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+            if hashlib.sha256(packed).hexdigest() != outer.get("sha256"):
+                raise CodecError(f"claim-check object {key} failed its sha256 check")
+        try:
+            payload = json.loads(decompress(packed, enc).decode("utf-8"))
+        except (KeyError, TypeError, ValueError, zlib.error, binascii.Error) as exc:
+            raise CodecError(f"message payload cannot be decoded: {exc!r}") from exc
+        if not isinstance(payload, dict):
+            raise CodecError(f"message payload is a JSON {type(payload).__name__}, not an object")
+        return payload
+
+
+def is_claim_check(body: str) -> bool:
+    """True when *body* points at an S3 object (consumers may delete it after use)."""
+    try:
+        outer = json.loads(body)
+    except ValueError:
+        return False
+    return isinstance(outer, dict) and outer.get(MARKER) == 1 and "s3" in outer
+
+
+__all__ = ["MessageCodec", "CodecError", "compress", "decompress", "is_claim_check"]
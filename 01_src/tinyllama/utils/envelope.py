@@ -0,0 +1,213 @@
+# tinyllama/utils/envelope.py
+# ---------------------------------------------------------------------------
+# Signed compact job envelope.
+#
+# The router has already verified the caller's RS256 token; instead of
+# forwarding that token it signs what it learned with a shared HMAC key:
+#
+#   v1.<base64url(json payload)>.<base64url(hmac-sha256)>
+#
+#   payload = {"sub", "exp", "iat", "rid", "pref", "kid"}
+#     rid  – request_id of the job
+#     pref – base64url(sha256(prompt))[:22], binds the envelope to the prompt
+#     kid  – first 8 hex chars of sha256(key), selects the key on rotation
+#     exp  – token exp + JOB_ENVELOPE_GRACE_SECONDS (time spent queued)
+#
+# Consumers call verify_job(message) – one HMAC and one SHA-256 instead of an
+# RSA verification and a JWKS lookup.
+#
+# Keys come from SSM through tinyllama.utils.ssm: job_hmac_key (current) and
+# optionally job_hmac_key_previous (still accepted while rotating).
+# ---------------------------------------------------------------------------
+
+from __future__ import annotations
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Mapping, Optional, Union
+
+VERSION = "v1"
+HMAC_KEY_PARAM = "job_hmac_key"
+HMAC_PREVIOUS_KEY_PARAM = "job_hmac_key_previous"
+JOB_ENVELOPE_GRACE_SECONDS = int(os.getenv("JOB_ENVELOPE_GRACE_SECONDS", "900"))
+MIN_KEY_BYTES = 16
+
+Keys = Union[bytes, str, Mapping[str, bytes]]
+
+
+class EnvelopeError(ValueError):
+    """Envelope is malformed, forged, expired or does not match its job."""
+
+
+class EnvelopeExpired(EnvelopeError):
+    """Authentic envelope past its exp; *payload* can be trusted for sub / rid."""
+
+    def __init__(self, payload: Dict[str, Any]) -> None:
+        super().__init__("envelope expired")
+        self.payload = payload
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _key_bytes(key: Union[bytes, str]) -> bytes:
+    key = key.encode("utf-8") if isinstance(key, str) else key
+    if len(key) < MIN_KEY_BYTES:
+        raise EnvelopeError(f"HMAC key must be at least {MIN_KEY_BYTES} bytes")
+    return key
+
+
+def key_id(key: Union[bytes, str]) -> str:
+    return hashlib.sha256(_key_bytes(key)).hexdigest()[:8]
+
+
+def prompt_ref(prompt: str) -> str:
+    return _b64(hashlib.sha256(prompt.encode("utf-8")).digest())[:22]
+
+# ---------------------------------------------------------------------------
+#  Sign / verify
+# ---------------------------------------------------------------------------
+def sign(
+    sub: str,
+    exp: int,
+    request_id: str,
+    prompt: str,
+    key: Union[bytes, str],
+    grace: int = JOB_ENVELOPE_GRACE_SECONDS,
+    now: Optional[float] = None,
+) -> str:
+    key = _key_bytes(key)
+    payload = {
+        "sub": sub,
+        "exp": int(exp) + grace,
+        "iat": int(time.time() if now is None else now),
+        "rid": request_id,
+        "pref": prompt_ref(prompt),
+        "kid": key_id(key),
+    }
+    body = _b64(json.dumps(payload, separators=(",", ":"), sort_keys=True).encode("utf-8"))
+    signing_input = f"{VERSION}.{body}".encode("ascii")
+    return f"{VERSION}.{body}.{_b64(hmac.new(key, signing_input, hashlib.sha256).digest())}"
+
+
+def _key_map(keys: Keys) -> Dict[str, bytes]:
+    """kid -> key; a Mapping is taken to be kid-keyed already (see verification_keys)."""
+    if isinstance(keys, Mapping):
+        return keys
+    if isinstance(keys, (bytes, str)):
+        keys = [keys]
+    return {key_id(k): _key_bytes(k) for k in keys}
+
+
+def verify(envelope: str, keys: Keys, now: Optional[float] = None) -> Dict[str, Any]:
+    """Return the payload of a valid, unexpired *envelope*; raise EnvelopeError otherwise."""
+    try:
+        version, body, sig = envelope.split(".")
+    except (AttributeError, ValueError):
+        raise EnvelopeError("malformed envelope") from None
+    if version != VERSION:
+        raise EnvelopeError(f"unsupported envelope version {version!r}")
+    try:
+        payload = json.loads(_unb64(body))
+        given = _unb64(sig)
+    except ValueError:
+        raise EnvelopeError("malformed envelope") from None
+    if not isinstance(payload, dict):
+        raise EnvelopeError("malformed envelope")
+
+    key = _key_map(keys).get(payload.get("kid"))
+    if key is None:
+        raise EnvelopeError("unknown envelope key")
+    expected = hmac.new(key, f"{version}.{body}".encode("ascii"), hashlib.sha256).digest()
+    if not hmac.compare_digest(expected, given):
+        raise EnvelopeError("bad envelope signature")
+    if (time.time() if now is None else now) >= payload.get("exp", 0):
+        raise EnvelopeExpired(payload)
+    return payload
+
+
+def verify_job(message: Mapping[str, Any], keys: Keys, now: Optional[float] = None) -> Dict[str, Any]:
+    """Verify message["job"] and that it was issued for this prompt and request_id."""
+    if "job" not in message:
+        raise EnvelopeError("message carries no job envelope")
+    try:
+        payload = verify(message["job"], keys, now=now)
+    except EnvelopeExpired as exc:
+        _check_binding(exc.payload, message)        # expired, but for this job?
+        raise
+    _check_binding(payload, message)
+    return payload
+
+
+def _check_binding(payload: Mapping[str, Any], message: Mapping[str, Any]) -> None:
+    if payload.get("rid") != message.get("request_id"):
+        raise EnvelopeError("envelope request_id mismatch")
+    if payload.get("pref") != prompt_ref(message.get("prompt", "")):
+        raise EnvelopeError("envelope prompt mismatch")
+
+# ---------------------------------------------------------------------------
+#  Keys from SSM
+# ---------------------------------------------------------------------------
+def signing_key() -> str:
+    from tinyllama.utils import ssm
+    return ssm.get_id(HMAC_KEY_PARAM)
+
+
+def verification_keys() -> Dict[str, bytes]:
+    """Current key plus the previous one while a rotation is in progress."""
+    from tinyllama.utils import ssm
+    keys = [ssm.get_id(HMAC_KEY_PARAM)]
+    try:
+        keys.append(ssm.get_id(HMAC_PREVIOUS_KEY_PARAM))
+    except Exception:
+        pass
+    return _key_map(keys)
+
+
+class JobVerifier:
+    """
+    Consumer-side verifier with cached keys. An unknown kid (key rotated
+    since the last load) triggers at most one reload per *min_reload* seconds.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Dict[str, bytes]] = verification_keys,
+        ttl: float = 300.0,
+        min_reload: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._loader = loader
+        self.ttl = ttl
+        self.min_reload = min_reload
+        self._clock = clock
+        self._keys: Optional[Dict[str, bytes]] = None
+        self._loaded_at = 0.0
+
+    def _current(self, force: bool = False) -> Dict[str, bytes]:
+        age = self._clock() - self._loaded_at
+        if self._keys is None or age >= self.ttl or (force and age >= self.min_reload):
+            self._keys, self._loaded_at = self._loader(), self._clock()
+        return self._keys
+
+    def verify(self, message: Mapping[str, Any], now: Optional[float] = None) -> Dict[str, Any]:
+        try:
+            return verify_job(message, self._current(), now=now)
+        except EnvelopeError as exc:
+            if str(exc) != "unknown envelope key":
+                raise
+        return verify_job(message, self._current(force=True), now=now)
+
+
+__all__ = [
+    "sign", "verify", "verify_job", "prompt_ref", "key_id",
+    "signing_key", "verification_keys", "JobVerifier", "EnvelopeError", "EnvelopeExpired",
+]
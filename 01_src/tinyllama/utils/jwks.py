@@ -0,0 +1,217 @@
+# tinyllama/utils/jwks.py
+# ---------------------------------------------------------------------------
+# JWKS manager shared by tinyllama.utils.auth (Lambda router) and
+# api.security (FastAPI edge).
+#
+#   – keys are kept as ready-to-use jose key objects, keyed by kid
+#   – TTL with stale-while-revalidate: an expired set is still served while
+#     one background refresh runs
+#   – single-flight: concurrent callers share one in-flight refresh
+#   – unknown kids are negatively cached for a short time in an LRU capped at
+#     JWKS_NEGATIVE_MAX_ENTRIES, and no refresh (forced or stale) runs more
+#     often than the minimum refresh interval, failed attempts included
+#
+# A burst of garbage tokens therefore costs at most one JWKS fetch per
+# MIN_REFRESH_SECONDS and bounded memory, instead of one blocking fetch per
+# request.
+# ---------------------------------------------------------------------------
+
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from jose import jwk
+
+JWKS_TTL_SECONDS = float(os.getenv("JWKS_TTL_SECONDS", "3600"))
+JWKS_MIN_REFRESH_SECONDS = float(os.getenv("JWKS_MIN_REFRESH_SECONDS", "30"))
+JWKS_NEGATIVE_TTL_SECONDS = float(os.getenv("JWKS_NEGATIVE_TTL_SECONDS", "60"))
+JWKS_NEGATIVE_MAX_ENTRIES = int(os.getenv("JWKS_NEGATIVE_MAX_ENTRIES", "1024"))
+
+Loader = Callable[[], Dict[str, Dict[str, Any]]]
+
+# ---------------------------------------------------------------------------
+#  Loader helper
+# ---------------------------------------------------------------------------
+def fetch_jwks(
+    url: str,
+    local_path: Optional[Path] = None,
+    timeout: float = 5.0,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Return a dict mapping kid -> JWK entry.
+    – Reads *local_path* when it points at a file (unit tests, CI).
+    – Otherwise GETs *url* with urllib (no extra packages in the Lambda zip).
+    """
+    if local_path is not None and local_path.is_file():
+        data = json.loads(local_path.read_text())
+    else:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            data = json.loads(resp.read().decode("utf-8"))
+    return {k["kid"]: k for k in data["keys"]}
+
+# ---------------------------------------------------------------------------
+#  Manager
+# ---------------------------------------------------------------------------
+class _Flight:
+    """One in-flight refresh; late callers wait on the same event."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+class JwksManager:
+    """
+    Caches JWK key objects for a single issuer.
+
+    *loader* returns the raw kid -> JWK mapping; it is only ever called by
+    one thread at a time.
+    """
+
+    def __init__(
+        self,
+        loader: Loader,
+        *,
+        ttl: float = JWKS_TTL_SECONDS,
+        min_refresh_interval: float = JWKS_MIN_REFRESH_SECONDS,
+        negative_ttl: float = JWKS_NEGATIVE_TTL_SECONDS,
+        negative_max: int = JWKS_NEGATIVE_MAX_ENTRIES,
+        wait_timeout: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._loader = loader
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.negative_ttl = negative_ttl
+        self.negative_max = negative_max
+        self.wait_timeout = wait_timeout
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._jwks: Dict[str, Dict[str, Any]] = {}
+        self._keys: Dict[str, Any] = {}
+        self._loaded_at: Optional[float] = None
+        self._last_attempt: Optional[float] = None
+        self._negative: "OrderedDict[str, float]" = OrderedDict()   # kid -> until, oldest first
+        self._inflight: Optional[_Flight] = None
+
+        self.fetches = 0
+        self.fetch_errors = 0
+        self.negative_hits = 0
+
+    # ----------------------------------------------------------- public API
+    def get_key(self, kid: str) -> Optional[Any]:
+        """
+        Return the key object for *kid*, or None if the issuer does not
+        publish it. Raises the loader's exception only when no keys have
+        ever been loaded.
+        """
+        now = self._clock()
+        with self._lock:
+            key = self._keys.get(kid)
+            stale = self._loaded_at is None or now - self._loaded_at >= self.ttl
+            neg_until = self._negative.get(kid)
+
+        if key is not None:
+            if stale and self._may_refresh(now):
+                self._start_refresh(wait=False)
+            return key
+
+        if neg_until is not None and now < neg_until:
+            with self._lock:
+                self.negative_hits += 1
+            return None
+
+        if self._loaded_at is None or self._may_refresh(now):
+            self._start_refresh(wait=True)
+            with self._lock:
+                key = self._keys.get(kid)
+
+        if key is None:
+            self._remember_unknown(kid)
+        return key
+
+    def refresh(self) -> None:
+        """Reload the JWKS now (single-flight), ignoring the minimum interval."""
+        self._start_refresh(wait=True)
+
+    @property
+    def jwks(self) -> Dict[str, Dict[str, Any]]:
+        """Raw kid -> JWK mapping of the currently served key set."""
+        with self._lock:
+            return dict(self._jwks)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "keys": len(self._keys),
+                "fetches": self.fetches,
+                "fetch_errors": self.fetch_errors,
+                "negative_hits": self.negative_hits,
+                "negative_kids": len(self._negative),
+            }
+
+    # ------------------------------------------------------------ internals
+    def _remember_unknown(self, kid: str) -> None:
+        now = self._clock()
+        with self._lock:
+            neg = self._negative
+            neg[kid] = now + self.negative_ttl
+            neg.move_to_end(kid)
+            # one TTL for all entries: insertion order is expiry order
+            while neg and (next(iter(neg.values())) <= now or len(neg) > self.negative_max):
+                neg.popitem(last=False)
+
+    def _may_refresh(self, now: float) -> bool:
+        with self._lock:
+            last = self._last_attempt
+        return last is None or now - last >= self.min_refresh_interval
+
+    def _start_refresh(self, *, wait: bool) -> None:
+        with self._lock:
+            flight = self._inflight
+            leader = flight is None
+            if leader:
+                flight = self._inflight = _Flight()
+
+        if leader and wait:
+            self._run_refresh(flight)
+        elif leader:
+            threading.Thread(
+                target=self._run_refresh, args=(flight,),
+                name="JwksRefresh", daemon=True,
+            ).start()
+
+        if wait:
+            flight.done.wait(self.wait_timeout)
+            if flight.error is not None and self._loaded_at is None:
+                raise flight.error
+
+    def _run_refresh(self, flight: _Flight) -> None:
+        try:
+            jwks = self._loader()
+            keys = {kid: jwk.construct(entry, "RS256") for kid, entry in jwks.items()}
+            with self._lock:
+                self._jwks, self._keys = jwks, keys
+                self._loaded_at = self._clock()
+                for kid in [k for k in self._negative if k in keys]:
+                    del self._negative[kid]
+                self.fetches += 1
+        except Exception as exc:                       # keep serving stale keys
+            flight.error = exc
+            with self._lock:
+                self.fetch_errors += 1
+        finally:
+            with self._lock:
+                self._last_attempt = self._clock()
+                self._inflight = None
+            flight.done.set()
+
+
+__all__ = ["JwksManager", "fetch_jwks"]
@@ -0,0 +1,150 @@
+# tinyllama/utils/log.py
+# ---------------------------------------------------------------------------
+# Small structured-logging layer for the router, auth and api modules.
+#
+#   log = get_logger(__name__)
+#   log.info("enqueued", message_id=mid, idle=5)
+#   log.debug("claims", claims=lambda: expensive())   # evaluated only if emitted
+#
+# – one JSON object per line on stdout (CloudWatch-friendly)
+# – level from TL_LOG_LEVEL (default INFO); disabled levels cost one int compare
+# – DEBUG records sampled by TL_LOG_DEBUG_SAMPLE (0.0–1.0, default 1.0)
+# – tokens, Authorization headers, passwords and JWT-looking strings are
+#   redacted before anything is written
+# ---------------------------------------------------------------------------
+
+from __future__ import annotations
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import sys
+from typing import Any, Dict
+
+LOG_LEVEL = os.getenv("TL_LOG_LEVEL", "INFO").upper()
+DEBUG_SAMPLE = float(os.getenv("TL_LOG_DEBUG_SAMPLE", "1.0"))
+
+REDACTED = "[REDACTED]"
+_SECRET_KEYS = {
+    "token", "authorization", "password", "secret", "access_token",
+    "id_token", "refresh_token", "jwt", "hmac_key",
+}
+_JWT_RE = re.compile(r"eyJ[\w-]+\.[\w-]+\.[\w-]*")
+_BEARER_RE = re.compile(r"(?i)(bearer\s+)\S+")
+
+# Fields attached to every record of the current invocation (e.g. request_id)
+_context: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("tl_log_context", default={})
+
+# ---------------------------------------------------------------------------
+#  Redaction
+# ---------------------------------------------------------------------------
+def redact(value: Any) -> Any:
+    """Return *value* with secrets masked (dict keys, JWTs, bearer tokens)."""
+    if isinstance(value, dict):
+        return {
+            k: REDACTED if str(k).lower() in _SECRET_KEYS else redact(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    if isinstance(value, str):
+        return _BEARER_RE.sub(r"\1" + REDACTED, _JWT_RE.sub(REDACTED, value))
+    return value
+
+# ---------------------------------------------------------------------------
+#  Formatter
+# ---------------------------------------------------------------------------
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        payload.update(_context.get())
+        for key, value in getattr(record, "fields", {}).items():
+            payload[key] = value() if callable(value) else value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(redact(payload), default=str)
+
+# ---------------------------------------------------------------------------
+#  Logger wrapper
+# ---------------------------------------------------------------------------
+class StructLogger:
+    """Thin wrapper over logging.Logger taking structured keyword fields."""
+
+    def __init__(self, logger: logging.Logger, debug_sample: float = DEBUG_SAMPLE) -> None:
+        self._logger = logger
+        self.debug_sample = debug_sample
+
+    def isEnabledFor(self, level: int) -> bool:
+        return self._logger.isEnabledFor(level)
+
+    def _log(self, level: int, msg: str, fields: Dict[str, Any], exc_info: Any = None) -> None:
+        if not self._logger.isEnabledFor(level):
+            return
+        if level == logging.DEBUG and self.debug_sample < 1.0 and random.random() >= self.debug_sample:
+            return
+        self._logger.log(level, msg, exc_info=exc_info, extra={"fields": fields}, stacklevel=3)
+
+    def debug(self, msg: str, **fields: Any) -> None:
+        self._log(logging.DEBUG, msg, fields)
+
+    def info(self, msg: str, **fields: Any) -> None:
+        self._log(logging.INFO, msg, fields)
+
+    def warning(self, msg: str, **fields: Any) -> None:
+        self._log(logging.WARNING, msg, fields)
+
+    def error(self, msg: str, **fields: Any) -> None:
+        self._log(logging.ERROR, msg, fields)
+
+    def exception(self, msg: str, **fields: Any) -> None:
+        self._log(logging.ERROR, msg, fields, exc_info=True)
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout is *now* (Lambda, pytest capture, ...)."""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, _value):
+        pass
+
+
+_ROOT = "tinyllama"
+
+def _configure_root() -> logging.Logger:
+    root = logging.getLogger(_ROOT)
+    if not getattr(root, "_tl_configured", False):
+        handler = _StdoutHandler()
+        handler.setFormatter(JsonFormatter())
+        root.addHandler(handler)
+        root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        root.propagate = False          # keep Lambda's plain-text root handler out
+        root._tl_configured = True      # type: ignore[attr-defined]
+    return root
+
+def get_logger(name: str) -> StructLogger:
+    """Return a JSON logger; names outside 'tinyllama.' are nested under it."""
+    _configure_root()
+    if name != _ROOT and not name.startswith(_ROOT + "."):
+        name = f"{_ROOT}.{name}"
+    return StructLogger(logging.getLogger(name))
+
+def set_context(**fields: Any) -> None:
+    """Attach *fields* (e.g. request_id) to every record until cleared."""
+    _context.set({**_context.get(), **fields})
+
+def clear_context() -> None:
+    _context.set({})
+
+
+__all__ = ["get_logger", "set_context", "clear_context", "redact", "JsonFormatter", "StructLogger"]
@@ -0,0 +1,188 @@
+# tinyllama/utils/metrics.py
+# ---------------------------------------------------------------------------
+# Lightweight per-invocation timing + CloudWatch Embedded Metric Format.
+#
+#   timer = StageTimer()
+#   with activate(timer):
+#       with timer.stage("parse"): ...
+#       with timed("jwks_fetch"): ...        # nested code, no timer passed in
+#       count("rate_limited")                # per-invocation Count metric
+#   emit("TLFIF/LAM", timer.metrics(), dimensions={"Route": "infer"})
+#
+# emit() writes ONE EMF JSON line to stdout, which CloudWatch turns into
+# metrics without any API call. TL_METRICS_SINK redirects it:
+#   ""/"emf"   – EMF line on stdout (default, Lambda)
+#   "off"      – drop everything
+#   <path>     – append plain JSON lines to a local file
+# Tests can install any callable with set_sink().
+# ---------------------------------------------------------------------------
+
+from __future__ import annotations
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+Sink = Callable[[Dict[str, Any]], None]
+
+# ---------------------------------------------------------------------------
+#  Stage timer
+# ---------------------------------------------------------------------------
+class StageTimer:
+    """Accumulates wall-clock milliseconds per named stage, plus counters."""
+
+    def __init__(self) -> None:
+        self._start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - t0) * 1000)
+
+    def add(self, name: str, ms: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + ms
+
+    def count(self, name: str, n: float = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+    def metrics(self, total_name: str = "total") -> Dict[str, float]:
+        """Stage timings plus the elapsed total, rounded for logging, and counters."""
+        out = {f"{k}_ms": round(v, 3) for k, v in self.stages.items()}
+        out[f"{total_name}_ms"] = round(self.total_ms(), 3)
+        out.update(self.counters)
+        return out
+
+
+_active: contextvars.ContextVar[Optional[StageTimer]] = contextvars.ContextVar("tl_stage_timer", default=None)
+
+@contextmanager
+def activate(timer: StageTimer) -> Iterator[StageTimer]:
+    """Make *timer* the target of timed() for the current invocation."""
+    token = _active.set(timer)
+    try:
+        yield timer
+    finally:
+        _active.reset(token)
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """Time a block into the active StageTimer (no-op when none is active)."""
+    timer = _active.get()
+    if timer is None:
+        yield
+        return
+    with timer.stage(name):
+        yield
+
+def count(name: str, n: float = 1) -> None:
+    """Add *n* to a Count metric of the active StageTimer (no-op when none)."""
+    timer = _active.get()
+    if timer is not None:
+        timer.count(name, n)
+
+# ---------------------------------------------------------------------------
+#  EMF
+# ---------------------------------------------------------------------------
+def emf_record(
+    namespace: str,
+    metrics: Dict[str, float],
+    dimensions: Optional[Dict[str, str]] = None,
+    properties: Optional[Dict[str, Any]] = None,
+    units: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """Build one EMF document; metric units default to Milliseconds for *_ms."""
+    dimensions = dimensions or {}
+    units = units or {}
+    definitions: List[Dict[str, str]] = [
+        {"Name": name, "Unit": units.get(name, "Milliseconds" if name.endswith("_ms") else "Count")}
+        for name in metrics
+    ]
+    record: Dict[str, Any] = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": namespace,
+                "Dimensions": [list(dimensions)] if dimensions else [[]],
+                "Metrics": definitions,
+            }],
+        },
+    }
+    record.update(properties or {})
+    record.update(dimensions)
+    record.update(metrics)
+    return record
+
+
+def _stdout_sink(record: Dict[str, Any]) -> None:
+    sys.stdout.write(json.dumps(record, default=str) + "\n")
+
+
+class FileSink:
+    """Local sink: appends {namespace, dimensions, metrics, properties} lines."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, record: Dict[str, Any]) -> None:
+        aws = record["_aws"]["CloudWatchMetrics"][0]
+        names = [m["Name"] for m in aws["Metrics"]]
+        dims = aws["Dimensions"][0]
+        line = {
+            "namespace": aws["Namespace"],
+            "dimensions": {d: record.get(d) for d in dims},
+            "metrics": {n: record.get(n) for n in names},
+            "properties": {k: v for k, v in record.items()
+                           if k != "_aws" and k not in names and k not in dims},
+        }
+        with self._lock, open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(line, default=str) + "\n")
+
+
+def _sink_from_env() -> Optional[Sink]:
+    target = os.getenv("TL_METRICS_SINK", "").strip()
+    if target in ("", "emf", "stdout"):
+        return _stdout_sink
+    if target.lower() == "off":
+        return None
+    return FileSink(target)
+
+_sink: Optional[Sink] = _sink_from_env()
+
+def set_sink(sink: Optional[Sink]) -> Optional[Sink]:
+    """Install *sink* (None disables emission); returns the previous one."""
+    global _sink
+    previous, _sink = _sink, sink
+    return previous
+
+def emit(
+    namespace: str,
+    metrics: Dict[str, float],
+    dimensions: Optional[Dict[str, str]] = None,
+    properties: Optional[Dict[str, Any]] = None,
+    units: Optional[Dict[str, str]] = None,
+) -> None:
+    """Emit one EMF record through the configured sink. Never raises."""
+    if _sink is None or not metrics:
+        return
+    try:
+        _sink(emf_record(namespace, metrics, dimensions, properties, units))
+    except Exception:                   # metrics must never break a request
+        pass
+
+
+__all__ = [
+    "StageTimer", "activate", "timed", "count", "emf_record", "emit", "set_sink", "FileSink",
+]
@@ -0,0 +1,56 @@
+# tinyllama/utils/promptkey.py
+# ---------------------------------------------------------------------------
+# Stable keys for "the same inference": model + normalised prompt + the
+# generation parameters that change the output.
+#
+#   key = request_key(prompt, generation_params(body))
+#
+# Normalisation is deliberately conservative: Unicode NFC, leading/trailing
+# whitespace dropped, inner whitespace runs collapsed to one space. Case and
+# punctuation are kept – they change what the model answers.
+#
+# idle and priority are scheduling hints, not generation parameters: two
+# requests that differ only in those produce the same text.
+#
+# MODEL_ID names the deployed model so keys from an old model never match a
+# new one.
+# ---------------------------------------------------------------------------
+
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from typing import Any, Dict, Mapping, Optional
+
+MODEL_ID = os.getenv("MODEL_ID", "tinyllama")
+
+# Body fields that change the generated text (none are required today)
+GENERATION_PARAMS = ("max_tokens", "temperature", "top_p", "stop")
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    return _WS_RE.sub(" ", unicodedata.normalize("NFC", prompt)).strip()
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+
+
+def generation_params(body: Mapping[str, Any]) -> Dict[str, Any]:
+    return {k: body[k] for k in GENERATION_PARAMS if body.get(k) is not None}
+
+
+def request_key(prompt: str, params: Optional[Mapping[str, Any]] = None, model: str = MODEL_ID) -> str:
+    """64 hex chars identifying (model, normalised prompt, params)."""
+    h = hashlib.sha256()
+    for part in (model, prompt_hash(prompt), json.dumps(dict(params or {}), sort_keys=True, default=str)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+__all__ = ["normalize_prompt", "prompt_hash", "generation_params", "request_key", "MODEL_ID"]
@@ -0,0 +1,159 @@
+# tinyllama/utils/pubsub.py
+# ---------------------------------------------------------------------------
+# Token streaming channel between the worker and the SSE route.
+#
+#   bus = pubsub_from_env()
+#   bus.publish(stream_channel(rid), {"type": "token", "text": "Hel"})
+#   sub = bus.subscribe(stream_channel(rid))
+#   sub.get(timeout=15)   -> message dict, or None on timeout
+#
+# Messages per job, in order:
+#   {"type": "start", "sub": <user>}    ownership, checked by the SSE route
+#   {"type": "token", "text": ...}      one per generated chunk
+#   {"type": "done",  "output": ...}    full text, end of stream
+#   {"type": "error", "error": ...}     end of stream
+#
+# A subscriber always starts at the beginning of the channel, so a client
+# that connects after the first tokens still sees the whole answer.
+#
+# Buses:
+#   InProcessPubSub     – worker and API in one process; tests, local runs
+#   RedisStreamPubSub   – one Redis stream per job (XADD / XREAD BLOCK),
+#                         trimmed to STREAM_MAXLEN, expiring after
+#                         STREAM_TTL_SECONDS; REDIS_URL (needs redis-py)
+# ---------------------------------------------------------------------------
+
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+STREAM_TTL_SECONDS = int(os.getenv("STREAM_TTL_SECONDS", "300"))
+STREAM_MAXLEN = int(os.getenv("STREAM_MAXLEN", "4096"))
+
+TERMINAL = ("done", "error")
+
+Message = Dict[str, Any]
+
+
+def stream_channel(request_id: str) -> str:
+    return f"stream:{request_id}"
+
+# ---------------------------------------------------------------------------
+#  In-process
+# ---------------------------------------------------------------------------
+class _Channel:
+    __slots__ = ("messages", "touched")
+
+    def __init__(self, now: float) -> None:
+        self.messages: List[Message] = []
+        self.touched = now
+
+
+class InProcessPubSub:
+    def __init__(self, ttl: float = STREAM_TTL_SECONDS, clock: Callable[[], float] = time.monotonic) -> None:
+        self.ttl = ttl
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._channels: Dict[str, _Channel] = {}
+
+    def _channel(self, name: str) -> _Channel:
+        chan = self._channels.get(name)
+        if chan is None:
+            chan = self._channels[name] = _Channel(self._clock())
+        return chan
+
+    def publish(self, channel: str, message: Message) -> None:
+        with self._cond:
+            now = self._clock()
+            for name in [n for n, c in self._channels.items() if now - c.touched > self.ttl]:
+                del self._channels[name]
+            chan = self._channel(channel)
+            chan.messages.append(message)
+            chan.touched = now
+            self._cond.notify_all()
+
+    def subscribe(self, channel: str) -> "_InProcessSubscription":
+        return _InProcessSubscription(self, channel)
+
+
+class _InProcessSubscription:
+    def __init__(self, bus: InProcessPubSub, channel: str) -> None:
+        self._bus = bus
+        self._name = channel
+        self._next = 0
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Message]:
+        bus = self._bus
+        with bus._cond:
+            chan = bus._channel(self._name)
+            if not bus._cond.wait_for(lambda: len(chan.messages) > self._next, timeout):
+                return None
+            msg = chan.messages[self._next]
+            self._next += 1
+            return msg
+
+    def close(self) -> None:
+        pass
+
+# ---------------------------------------------------------------------------
+#  Redis streams
+# ---------------------------------------------------------------------------
+class RedisStreamPubSub:
+    def __init__(self, client: Any, ttl: int = STREAM_TTL_SECONDS, maxlen: int = STREAM_MAXLEN,
+                 prefix: str = "tl:") -> None:
+        self.client = client
+        self.ttl = ttl
+        self.maxlen = maxlen
+        self.prefix = prefix
+
+    def publish(self, channel: str, message: Message) -> None:
+        key = self.prefix + channel
+        self.client.xadd(key, {"m": json.dumps(message)}, maxlen=self.maxlen, approximate=True)
+        self.client.expire(key, self.ttl)
+
+    def subscribe(self, channel: str) -> "_RedisSubscription":
+        return _RedisSubscription(self.client, self.prefix + channel)
+
+
+class _RedisSubscription:
+    def __init__(self, client: Any, key: str) -> None:
+        self._client = client
+        self._key = key
+        self._last_id = "0-0"
+        self._buffer: List[Message] = []
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Message]:
+        if not self._buffer:
+            block = None if timeout is None else max(int(timeout * 1000), 1)
+            for _, entries in self._client.xread({self._key: self._last_id}, count=100, block=block) or []:
+                for entry_id, fields in entries:
+                    self._last_id = entry_id
+                    raw = fields.get("m", fields.get(b"m"))
+                    self._buffer.append(json.loads(raw))
+        return self._buffer.pop(0) if self._buffer else None
+
+    def close(self) -> None:
+        pass
+
+
+_default_bus: Optional[InProcessPubSub] = None
+
+
+def pubsub_from_env() -> Any:
+    """RedisStreamPubSub when REDIS_URL is set, else one process-wide InProcessPubSub."""
+    global _default_bus
+    url = os.getenv("REDIS_URL", "").strip()
+    if url:
+        import redis
+        return RedisStreamPubSub(redis.Redis.from_url(url))
+    if _default_bus is None:
+        _default_bus = InProcessPubSub()
+    return _default_bus
+
+
+__all__ = [
+    "InProcessPubSub", "RedisStreamPubSub", "pubsub_from_env", "stream_channel", "TERMINAL",
+]
@@ -0,0 +1,208 @@
+# tinyllama/utils/results.py
+# ---------------------------------------------------------------------------
+# Job result store: the worker writes, GET /jobs/{request_id} reads.
+#
+#   store.put(request_id, record)      -> worker, once per finished job
+#   store.get(request_id)              -> record dict or None
+#   wait_for(store, request_id, 20)    -> long-poll with backoff
+#
+# Records: {"request_id", "status": "done"|"failed", "sub", "output"|"error",
+#           "completed_at"}; "sub" lets the router return results only to
+# the user who asked.
+#
+# Stores:
+#   FileResultStore      – one JSON file per job; local runs and tests
+#                          (RESULT_DIR)
+#   S3ResultStore        – s3://RESULT_BUCKET/RESULT_PREFIX<request_id>.json;
+#                          add a lifecycle rule to expire old results
+#   DynamoDbResultStore  – key-value table with string hash key ``pk`` and
+#                          TTL on ``expires_at`` (RESULT_TABLE)
+#
+# wait_for polls at 50 ms, doubling up to 1 s: fast answers come back within
+# tens of milliseconds, slow ones cost at most one read per second.
+# ---------------------------------------------------------------------------
+
+from __future__ import annotations
+import json
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+RESULT_PREFIX = os.getenv("RESULT_PREFIX", "results/")
+RESULT_TTL_SECONDS = int(os.getenv("RESULT_TTL_SECONDS", "86400"))
+POLL_INITIAL_SECONDS = 0.05
+POLL_MAX_SECONDS = 1.0
+
+DONE = "done"
+FAILED = "failed"
+
+Record = Dict[str, Any]
+
+_ID_RE = re.compile(r"^[A-Za-z0-9_.:-]{1,128}$")
+
+
+def valid_request_id(request_id: str) -> bool:
+    """Request ids end up in file names and object keys: no slashes, no dot-dot."""
+    return bool(isinstance(request_id, str) and _ID_RE.match(request_id) and ".." not in request_id)
+
+
+def record(request_id: str, sub: Optional[str], output: Optional[str] = None,
+           error: Optional[str] = None) -> Record:
+    out: Record = {
+        "request_id": request_id,
+        "status": FAILED if error is not None else DONE,
+        "sub": sub,
+        "completed_at": int(time.time()),
+    }
+    if error is not None:
+        out["error"] = error
+    else:
+        out["output"] = output
+    return out
+
+
+def _error_code(exc: Exception) -> Optional[str]:
+    """botocore ClientError code without importing botocore."""
+    return (getattr(exc, "response", None) or {}).get("Error", {}).get("Code")
+
+# ---------------------------------------------------------------------------
+#  Stores
+# ---------------------------------------------------------------------------
+class FileResultStore:
+    def __init__(self, root: str) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, request_id: str) -> Path:
+        if not valid_request_id(request_id):
+            raise ValueError(f"invalid request id {request_id!r}")
+        return self.root / f"{request_id}.json"
+
+    def put(self, request_id: str, rec: Record) -> None:
+        path = self._path(request_id)
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(rec, fh)
+        os.replace(tmp, path)                       # readers never see half a file
+
+    def get(self, request_id: str) -> Optional[Record]:
+        try:
+            return json.loads(self._path(request_id).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+
+
+class S3ResultStore:
+    def __init__(self, bucket: str, prefix: str = RESULT_PREFIX, client: Any = None) -> None:
+        self.bucket = bucket
+        self.prefix = prefix
+        self._client = client
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("s3")
+        return self._client
+
+    def _key(self, request_id: str) -> str:
+        if not valid_request_id(request_id):
+            raise ValueError(f"invalid request id {request_id!r}")
+        return f"{self.prefix}{request_id}.json"
+
+    def put(self, request_id: str, rec: Record) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=self._key(request_id),
+                               Body=json.dumps(rec).encode("utf-8"), ContentType="application/json")
+
+    def get(self, request_id: str) -> Optional[Record]:
+        try:
+            body = self.client.get_object(Bucket=self.bucket, Key=self._key(request_id))["Body"].read()
+        except Exception as exc:
+            if _error_code(exc) in ("NoSuchKey", "404") or type(exc).__name__ == "NoSuchKey":
+                return None
+            raise
+        return json.loads(body)
+
+
+class DynamoDbResultStore:
+    def __init__(
+        self,
+        table: str,
+        client: Any = None,
+        ttl: int = RESULT_TTL_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.table = table
+        self.ttl = ttl
+        self._client = client
+        self._clock = clock
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("dynamodb")
+        return self._client
+
+    def put(self, request_id: str, rec: Record) -> None:
+        self.client.put_item(
+            TableName=self.table,
+            Item={
+                "pk": {"S": f"result#{request_id}"},
+                "record": {"S": json.dumps(rec)},
+                "expires_at": {"N": str(int(self._clock()) + self.ttl)},
+            },
+        )
+
+    def get(self, request_id: str) -> Optional[Record]:
+        item = self.client.get_item(
+            TableName=self.table,
+            Key={"pk": {"S": f"result#{request_id}"}},
+        ).get("Item")
+        if item is None or int(item["expires_at"]["N"]) < self._clock():
+            return None
+        return json.loads(item["record"]["S"])
+
+
+def store_from_env() -> Any:
+    """S3 (RESULT_BUCKET), DynamoDB (RESULT_TABLE) or files (RESULT_DIR); None if unset."""
+    bucket = os.getenv("RESULT_BUCKET", "").strip()
+    if bucket:
+        return S3ResultStore(bucket)
+    table = os.getenv("RESULT_TABLE", "").strip()
+    if table:
+        return DynamoDbResultStore(table)
+    directory = os.getenv("RESULT_DIR", "").strip()
+    if directory:
+        return FileResultStore(directory)
+    return None
+
+# ---------------------------------------------------------------------------
+#  Long-poll
+# ---------------------------------------------------------------------------
+def wait_for(
+    store: Any,
+    request_id: str,
+    timeout: float,
+    clock: Callable[[], float] = time.monotonic,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Optional[Record]:
+    """Poll *store* until the record exists or *timeout* seconds passed."""
+    deadline = clock() + timeout
+    interval = POLL_INITIAL_SECONDS
+    while True:
+        rec = store.get(request_id)
+        remaining = deadline - clock()
+        if rec is not None or remaining <= 0:
+            return rec
+        sleep(min(interval, remaining))
+        interval = min(interval * 2, POLL_MAX_SECONDS)
+
+
+__all__ = [
+    "FileResultStore", "S3ResultStore", "DynamoDbResultStore", "store_from_env",
+    "wait_for", "record", "valid_request_id", "DONE", "FAILED",
+]
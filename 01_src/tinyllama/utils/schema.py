@@ -1,4 +1,6 @@
 """Data-validation schemas for TinyLlama."""
+from typing import Optional
+
 from pydantic import BaseModel, root_validator, ValidationError
 
 
@@ -6,12 +8,23 @@ MAX_PROMPT_BYTES = 6 * 1024  # 6 KB
 MIN_PROMPT_BYTES = 1
 IDLE_MIN = 1
 IDLE_MAX = 30
+PRIORITY_MIN = 0      # background
+PRIORITY_MAX = 9      # interactive
+PRIORITY_DEFAULT = 5
+
+
+def parse_priority(value) -> int:
+    """Validate a request-supplied job priority."""
+    if isinstance(value, bool) or not isinstance(value, int) or not (PRIORITY_MIN <= value <= PRIORITY_MAX):
+        raise ValueError(f"priority must be an integer {PRIORITY_MIN}-{PRIORITY_MAX}; got {value!r}")
+    return value
 
 
 class PromptReq(BaseModel):
     """Request body for /infer and Lambda Router."""
     prompt: str
     idle: int
+    priority: Optional[int] = None
 
     @root_validator(skip_on_failure=True)
     def _validate(cls, values):
@@ -29,6 +42,10 @@ class PromptReq(BaseModel):
         if not (IDLE_MIN <= idle <= IDLE_MAX):
             raise ValueError(f"idle must be {IDLE_MIN}-{IDLE_MAX}; got {idle}")
 
+        # optional priority (absent = PRIORITY_DEFAULT on the worker)
+        if values.get("priority") is not None:
+            parse_priority(values["priority"])
+
         return values
 
 
@@ -1,16 +1,242 @@
+import json
 import os
-import functools
-import boto3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
 
-_SSM = boto3.client("ssm")
+from tinyllama.utils.metrics import timed
 
-@functools.lru_cache(maxsize=128)
+_SSM = None
+
+# Per-entry lifetime; hot entries are refreshed in the background once they
+# are older than REFRESH_AHEAD * TTL, so callers keep getting cached values.
+TTL_SECONDS = float(os.getenv("SSM_CACHE_TTL_SECONDS", "300"))
+REFRESH_AHEAD = float(os.getenv("SSM_REFRESH_AHEAD", "0.8"))
+
+_Key = Tuple[str, str]                      # (env, name)
+
+# (env, name) -> (value, fetched_at); filled by prefetch() or single lookups
+_CACHE: Dict[_Key, Tuple[str, float]] = {}
+# envs whose whole subtree has already been bulk-loaded (or attempted)
+_PREFETCHED: Set[str] = set()
+# keys with a background refresh in flight
+_INFLIGHT: Dict[_Key, threading.Thread] = {}
+_LOCK = threading.Lock()
+_clock = time.monotonic
+
+# Build-time snapshot (see `tools.py lambda-package --bake-config`). Values
+# baked for the current env are served without any SSM call; live lookup
+# remains the fallback. TL_CONFIG_SNAPSHOT may hold a file path, inline
+# JSON, or "off".
+SNAPSHOT_FILE = Path(__file__).with_name("config_snapshot.json")
+_SNAPSHOT: Optional[dict] = None
+
+_STATS = {
+    "snapshot_hits": 0,
+    "hits": 0,
+    "misses": 0,
+    "refreshes": 0,
+    "refresh_errors": 0,
+    "refresh_ms_total": 0.0,
+    "refresh_ms_max": 0.0,
+}
+
+def _client():
+    """Create the SSM client on first use (keeps boto3 off the cold-start import path)."""
+    global _SSM
+    if _SSM is None:
+        import boto3
+        _SSM = boto3.client("ssm")
+    return _SSM
+
+def _env(env: Optional[str] = None) -> str:
+    return env or os.getenv("TLFIF_ENV", "default")
+
+def _path(env: str, name: str) -> str:
+    return f"/tinyllama/{env}/{name}"
+
+def _load_snapshot() -> dict:
+    global _SNAPSHOT
+    if _SNAPSHOT is None:
+        raw = os.getenv("TL_CONFIG_SNAPSHOT", "").strip()
+        data: dict = {}
+        try:
+            if raw.startswith("{"):
+                data = json.loads(raw)
+            elif raw.lower() != "off":
+                path = Path(raw) if raw else SNAPSHOT_FILE
+                if path.is_file():
+                    data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = {}
+        _SNAPSHOT = data
+    return _SNAPSHOT
+
+def _store(key: _Key, value: str) -> None:
+    with _LOCK:
+        _CACHE[key] = (value, _clock())
+
+def _fetch(key: _Key) -> str:
+    resp = _client().get_parameter(Name=_path(*key), WithDecryption=True)
+    value = resp["Parameter"]["Value"]
+    _store(key, value)
+    return value
+
+def prefetch(env: Optional[str] = None) -> int:
+    """
+    Bulk-load every parameter under /tinyllama/<env>/ into the cache using
+    paged get_parameters_by_path calls. Returns the number of values loaded.
+    """
+    env = _env(env)
+    prefix = _path(env, "")
+    loaded: Dict[_Key, str] = {}
+    kwargs = {"Path": prefix, "Recursive": True, "WithDecryption": True}
+    while True:
+        resp = _client().get_parameters_by_path(**kwargs)
+        for p in resp.get("Parameters", []):
+            loaded[(env, p["Name"][len(prefix):])] = p["Value"]
+        token = resp.get("NextToken")
+        if not token:
+            break
+        kwargs["NextToken"] = token
+    now = _clock()
+    with _LOCK:
+        _CACHE.update({k: (v, now) for k, v in loaded.items()})
+        _PREFETCHED.add(env)
+    return len(loaded)
+
+# ---------------------------------------------------------------------------
+#  Refresh-ahead
+# ---------------------------------------------------------------------------
+def _refresh_worker(key: _Key) -> None:
+    t0 = time.perf_counter()
+    try:
+        _fetch(key)
+        ok = True
+    except Exception:               # keep serving the cached value
+        ok = False
+    ms = (time.perf_counter() - t0) * 1000
+    with _LOCK:
+        _INFLIGHT.pop(key, None)
+        _STATS["refreshes"] += 1
+        _STATS["refresh_ms_total"] += ms
+        _STATS["refresh_ms_max"] = max(_STATS["refresh_ms_max"], ms)
+        if not ok:
+            _STATS["refresh_errors"] += 1
+
+def _schedule_refresh(key: _Key) -> None:
+    with _LOCK:
+        if key in _INFLIGHT:
+            return
+        worker = threading.Thread(
+            target=_refresh_worker, args=(key,),
+            name="SsmRefresh", daemon=True,
+        )
+        _INFLIGHT[key] = worker
+    worker.start()
+
+# ---------------------------------------------------------------------------
+#  Public API
+# ---------------------------------------------------------------------------
 def get_id(name: str) -> str:
     """
     Return the ID stored at /tinyllama/<env>/<name> (cached per name+env).
     Prefix is read _each_ call from the current TLFIF_ENV.
+    Values baked into the deployment snapshot win; otherwise the first miss
+    for an env bulk-loads the whole subtree (see prefetch) and names it did
+    not return fall back to a single get_parameter.
+    Entries live TTL_SECONDS and are refreshed in the background shortly
+    before they expire.
+    """
+    env = _env()
+    snapshot = _load_snapshot()
+    if snapshot.get("env") == env and name in snapshot.get("values", {}):
+        with _LOCK:
+            _STATS["snapshot_hits"] += 1
+        return snapshot["values"][name]
+    return _resolve(env, name)
+
+def _resolve(env: str, name: str) -> str:
+    """Live (cached) SSM lookup, bypassing the build-time snapshot."""
+    key = (env, name)
+    now = _clock()
+    entry = _CACHE.get(key)
+    if entry is not None:
+        value, fetched_at = entry
+        age = now - fetched_at
+        if age < TTL_SECONDS:
+            with _LOCK:
+                _STATS["hits"] += 1
+            if age >= TTL_SECONDS * REFRESH_AHEAD:
+                _schedule_refresh(key)
+            return value
+
+    with _LOCK:
+        _STATS["misses"] += 1
+
+    if entry is None and env not in _PREFETCHED:
+        try:
+            with timed("ssm_fetch"):
+                prefetch(env)
+        except Exception:           # e.g. no ssm:GetParametersByPath – go per-name
+            with _LOCK:
+                _PREFETCHED.add(env)
+        entry = _CACHE.get(key)
+        if entry is not None:
+            return entry[0]
+
+    with timed("ssm_fetch"):
+        return _fetch(key)
+
+def build_snapshot(names: Iterable[str], env: Optional[str] = None, version: str = "") -> dict:
+    """Resolve *names* from live SSM into a snapshot dict for bundling."""
+    env = _env(env)
+    return {
+        "version": version,
+        "env": env,
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "values": {name: _resolve(env, name) for name in names},
+    }
+
+def snapshot_info() -> Dict[str, object]:
+    """Version/env of the loaded snapshot (empty dict when none is bundled)."""
+    snapshot = _load_snapshot()
+    if not snapshot:
+        return {}
+    return {
+        "version": snapshot.get("version", ""),
+        "env": snapshot.get("env", ""),
+        "names": len(snapshot.get("values", {})),
+    }
+
+def invalidate(name: Optional[str] = None, env: Optional[str] = None) -> None:
     """
-    env = os.getenv("TLFIF_ENV", "default")
-    path = f"/tinyllama/{env}/{name}"
-    resp = _SSM.get_parameter(Name=path)
-    return resp["Parameter"]["Value"]
+    Drop cached values so the next get_id goes back to SSM.
+      invalidate()                 – everything, every env
+      invalidate(env="dev")        – the whole dev subtree
+      invalidate("x", env="dev")   – a single entry (env defaults to TLFIF_ENV)
+    """
+    with _LOCK:
+        if name is None and env is None:
+            _CACHE.clear()
+            _PREFETCHED.clear()
+        elif name is None:
+            for key in [k for k in _CACHE if k[0] == env]:
+                del _CACHE[key]
+            _PREFETCHED.discard(env)
+        else:
+            _CACHE.pop((_env(env), name), None)
+
+def clear_cache() -> None:
+    """Forget every cached value (next lookup prefetches again)."""
+    invalidate()
+
+def cache_stats() -> Dict[str, float]:
+    """Hit/miss counters plus background-refresh count and latency (ms)."""
+    with _LOCK:
+        stats = dict(_STATS)
+        stats["size"] = len(_CACHE)
+    n = stats["refreshes"]
+    stats["refresh_ms_avg"] = stats["refresh_ms_total"] / n if n else 0.0
+    return stats
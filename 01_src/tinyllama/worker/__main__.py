@@ -0,0 +1,185 @@
+# tinyllama/worker/__main__.py
+# ---------------------------------------------------------------------------
+# Worker entry point.
+#
+#   python -m tinyllama.worker --queue-url https://sqs.../job-queue.fifo \
+#       --generate mypkg.model:generate --generate-batch mypkg.model:generate_batch
+#   python -m tinyllama.worker --queue-backend redis --max-batch 1 --generate mypkg.model:generate
+#   python -m tinyllama.worker --local 50      # in-memory queue, fake jobs
+#   python -m tinyllama.worker --local 50 --queue-backend memory
+#   python -m tinyllama.worker --local 50 --max-batch 8 --max-wait-ms 20
+#
+# Outside --local the model must be named as MODULE:CALLABLE: --generate
+# (prompt -> text, WORKER_GENERATE), plus --generate-batch (prompts -> texts,
+# WORKER_GENERATE_BATCH) when --max-batch > 1 and --generate-stream (prompt ->
+# text chunks, WORKER_GENERATE_STREAM) with --stream. --fake runs the echo
+# backends on a real queue instead, writing echo output as results: testing
+# only. The response cache (RESPONSE_CACHE_URL) is only filled by a real model.
+#
+# SIGTERM / SIGINT stop receiving and drain in-flight jobs before exit.
+# After the requested idle minutes without jobs the worker drains and stops
+# its EC2 instance (--local: a stub that only logs).
+# ---------------------------------------------------------------------------
+
+from __future__ import annotations
+import argparse
+import importlib
+import json
+import os
+import signal
+import uuid
+
+from tinyllama.queue.backends import BACKENDS, QUEUE_BACKEND, InProcessQueue, SqsQueue, queue_from_env
+from tinyllama.utils import results
+from tinyllama.utils.cache import cache_from_env
+from tinyllama.utils.codec import MessageCodec
+from tinyllama.utils.log import get_logger
+from tinyllama.utils.pubsub import pubsub_from_env
+from tinyllama.worker.consumer import (
+    WORKER_CONCURRENCY, WORKER_VISIBILITY_SECONDS, WORKER_WAIT_SECONDS, Consumer,
+)
+from tinyllama.worker.batching import WORKER_MAX_BATCH, WORKER_MAX_WAIT_MS, BatchScheduler
+from tinyllama.worker.idle import WORKER_IDLE_MINUTES, Ec2StopAction, IdleController, LocalStopStub
+from tinyllama.worker.inference import (
+    FakeBatchBackend, JobHandler, ResultWriter, fake_generate, fake_generate_stream,
+)
+from tinyllama.worker.priority import PriorityScheduler
+
+log = get_logger(__name__)
+
+
+def _local_queue(n: int, backend: str):
+    """InProcessQueue for --queue-backend memory, else the FIFO-faithful InMemorySQS."""
+    if backend == "memory":
+        queue = InProcessQueue()
+    else:
+        from tinyllama.worker.local_sqs import InMemorySQS
+        queue = SqsQueue("local", client=InMemorySQS())
+    codec = MessageCodec()
+    for i in range(n):
+        body = {"prompt": f"local prompt {i}", "idle": 5, "request_id": str(uuid.uuid4())}
+        queue.enqueue(codec.encode(body), group_id=f"user-{i % 4}")
+    return queue
+
+
+def _load(spec: str):
+    """The callable named by "package.module:attr"."""
+    module, _, attr = spec.partition(":")
+    if not module or not attr:
+        raise ValueError(f"expected MODULE:CALLABLE, got {spec!r}")
+    return getattr(importlib.import_module(module), attr)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="tinyllama.worker", description=__doc__)
+    ap.add_argument("--queue-url", default=os.getenv("JOB_QUEUE_URL", ""))
+    ap.add_argument("--queue-backend", choices=BACKENDS, default=QUEUE_BACKEND,
+                    help="job queue (QUEUE_BACKEND); redis reads QUEUE_REDIS_URL or REDIS_URL")
+    ap.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY)
+    ap.add_argument("--wait-seconds", type=int, default=WORKER_WAIT_SECONDS)
+    ap.add_argument("--visibility", type=int, default=WORKER_VISIBILITY_SECONDS)
+    ap.add_argument("--max-batch", type=int, default=WORKER_MAX_BATCH,
+                    help="dynamic batching size; 1 runs jobs one by one")
+    ap.add_argument("--max-wait-ms", type=float, default=WORKER_MAX_WAIT_MS)
+    ap.add_argument("--prioritise", action="store_true",
+                    help="shortest-job-first with request priority and aging over prefetched jobs")
+    ap.add_argument("--idle-minutes", type=float, default=WORKER_IDLE_MINUTES,
+                    help="idle window before the first job; jobs extend it by their own idle")
+    ap.add_argument("--results-dir", default=None,
+                    help="write results to this directory (default: RESULT_BUCKET/TABLE/DIR env)")
+    ap.add_argument("--stream", action="store_true",
+                    help="publish tokens for SSE clients (REDIS_URL, else in-process)")
+    ap.add_argument("--local", type=int, metavar="N",
+                    help="consume N fake jobs from an in-memory queue and exit")
+    ap.add_argument("--no-verify", action="store_true",
+                    help="skip job envelope verification (local testing only)")
+    ap.add_argument("--generate", default=os.getenv("WORKER_GENERATE", ""), metavar="MODULE:CALLABLE",
+                    help="model: prompt -> text")
+    ap.add_argument("--generate-batch", default=os.getenv("WORKER_GENERATE_BATCH", ""),
+                    metavar="MODULE:CALLABLE", help="model: list of prompts -> list of texts")
+    ap.add_argument("--generate-stream", default=os.getenv("WORKER_GENERATE_STREAM", ""),
+                    metavar="MODULE:CALLABLE", help="model: prompt -> iterator of text chunks")
+    ap.add_argument("--fake", action="store_true",
+                    help="echo backends instead of a model (implied by --local; testing only)")
+    args = ap.parse_args(argv)
+
+    fake_model = args.fake or args.local is not None
+    if not fake_model:
+        if not args.generate:
+            ap.error("--generate (or WORKER_GENERATE) is required; --fake runs the echo backend")
+        if args.max_batch > 1 and not args.generate_batch:
+            ap.error("--max-batch > 1 needs --generate-batch; use --max-batch 1 to run unbatched")
+        if args.stream and not args.generate_stream:
+            ap.error("--stream needs --generate-stream")
+
+    if args.local is not None:
+        queue, url, verifier = _local_queue(args.local, args.queue_backend), "local", None
+    else:
+        if args.queue_backend == "sqs" and not args.queue_url:
+            ap.error("--queue-url or JOB_QUEUE_URL is required")
+        from tinyllama.utils.envelope import JobVerifier
+        queue = queue_from_env(args.queue_backend, args.queue_url)
+        url = args.queue_url if args.queue_backend == "sqs" else args.queue_backend
+        verifier = None if args.no_verify else JobVerifier()
+
+    if fake_model:
+        generate, generate_batch, generate_stream = fake_generate, FakeBatchBackend(), fake_generate_stream
+        if args.local is None:
+            log.warning("fake_backend", queue=url, details="real jobs are answered with echo output")
+    else:
+        try:
+            generate = _load(args.generate)
+            generate_batch = _load(args.generate_batch) if args.max_batch > 1 else None
+            generate_stream = _load(args.generate_stream) if args.stream else None
+        except (ValueError, ImportError, AttributeError) as exc:
+            ap.error(f"cannot load the model: {exc}")
+
+    scheduler = None
+    concurrency = args.concurrency
+    if args.max_batch > 1:
+        scheduler = BatchScheduler(generate_batch, args.max_batch, args.max_wait_ms / 1000)
+        generate = scheduler
+        concurrency = max(concurrency, args.max_batch)   # enough jobs in hand to fill a batch
+
+    store = results.FileResultStore(args.results_dir) if args.results_dir else results.store_from_env()
+    writer = ResultWriter(store) if store else None
+    # The fake backends echo prompts; never let them fill a shared response cache
+    cache = None if fake_model else cache_from_env()    # RESPONSE_CACHE_URL
+
+    consumer = Consumer(
+        queue, url,
+        JobHandler(generate, stream_generate=generate_stream if args.stream else None,
+                   pubsub=pubsub_from_env() if args.stream else None, cache=cache),
+        concurrency=concurrency,
+        wait_seconds=1 if args.local is not None else args.wait_seconds,
+        visibility_timeout=args.visibility,
+        verifier=verifier,
+        scheduler=PriorityScheduler() if args.prioritise else None,
+        on_result=writer,
+        on_failure=writer.failed if writer else None,
+    )
+    stop_instance = LocalStopStub() if args.local is not None else Ec2StopAction()
+
+    def stop_self():
+        consumer.stop()
+        stop_instance()
+
+    idle = IdleController(stop_self, args.idle_minutes)
+    consumer.idle = idle
+    idle.start()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: consumer.stop())
+
+    stats = consumer.run(until_empty=args.local is not None)
+    idle.close()
+    if scheduler is not None:
+        scheduler.close()
+        stats["batches"] = scheduler.stats["batches"]
+    if cache is not None:
+        stats["cache"] = {**cache.stats, "hit_ratio": round(cache.hit_ratio, 3)}
+    print(json.dumps(stats))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,163 @@
+# tinyllama/worker/batching.py
+# ---------------------------------------------------------------------------
+# Dynamic batching in front of a batched generate(prompts) backend.
+#
+#   scheduler = BatchScheduler(backend, max_batch=8, max_wait=0.02)
+#   output = scheduler("prompt")           # blocks; or scheduler.submit(p)
+#   Consumer(sqs, url, JobHandler(scheduler), concurrency=16).run()
+#
+# – jobs wait in length buckets keyed by estimated prompt tokens (powers of
+#   two of WORKER_BATCH_BUCKET_TOKENS), so a batch pads only to its bucket
+# – a bucket is dispatched when it holds max_batch jobs, or when its oldest
+#   job has waited max_wait seconds; the oldest ripe bucket goes first
+# – one dispatcher thread runs generate() serially (one model, one device);
+#   jobs arriving while it runs queue up and form the next batch
+# – a backend error fails every job of that batch (the consumer retries them)
+#
+# The consumer needs concurrency >= max_batch for batches to fill.
+# ---------------------------------------------------------------------------
+
+from __future__ import annotations
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tinyllama.utils.log import get_logger
+from tinyllama.worker.inference import estimate_tokens
+
+log = get_logger(__name__)
+
+WORKER_MAX_BATCH = int(os.getenv("WORKER_MAX_BATCH", "8"))
+WORKER_MAX_WAIT_MS = float(os.getenv("WORKER_MAX_WAIT_MS", "20"))
+WORKER_BATCH_BUCKET_TOKENS = int(os.getenv("WORKER_BATCH_BUCKET_TOKENS", "32"))
+
+
+def bucket_for(tokens: int, base: int = WORKER_BATCH_BUCKET_TOKENS) -> int:
+    """Smallest base * 2**k that holds *tokens*."""
+    size = base
+    while size < tokens:
+        size *= 2
+    return size
+
+
+class _Pending:
+    __slots__ = ("prompt", "tokens", "future", "enqueued_at")
+
+    def __init__(self, prompt: str, tokens: int, enqueued_at: float) -> None:
+        self.prompt = prompt
+        self.tokens = tokens
+        self.future: Future = Future()
+        self.enqueued_at = enqueued_at
+
+
+class BatchScheduler:
+    def __init__(
+        self,
+        generate: Callable[[List[str]], List[str]],
+        max_batch: int = WORKER_MAX_BATCH,
+        max_wait: float = WORKER_MAX_WAIT_MS / 1000,
+        bucket_tokens: int = WORKER_BATCH_BUCKET_TOKENS,
+    ) -> None:
+        if max_batch < 1:
+            raise ValueError("max_batch must be >= 1")
+        self.generate = generate
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.bucket_tokens = bucket_tokens
+
+        self._cond = threading.Condition()
+        self._buckets: Dict[int, List[_Pending]] = {}
+        self._closed = False
+        self.stats: Dict[str, int] = {"jobs": 0, "batches": 0, "tokens": 0, "padded_tokens": 0, "errors": 0}
+        self._thread = threading.Thread(target=self._loop, name="BatchDispatcher", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------- callers
+    def submit(self, prompt: str) -> Future:
+        tokens = estimate_tokens(prompt)
+        item = _Pending(prompt, tokens, time.monotonic())
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("scheduler is closed")
+            self._buckets.setdefault(bucket_for(tokens, self.bucket_tokens), []).append(item)
+            self._cond.notify()
+        return item.future
+
+    def __call__(self, prompt: str) -> str:
+        return self.submit(prompt).result()
+
+    def close(self) -> None:
+        """Dispatch what is queued without waiting for max_wait, then stop."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    @property
+    def padding_waste(self) -> float:
+        """Share of dispatched token slots that were padding."""
+        padded = self.stats["padded_tokens"]
+        return 1 - self.stats["tokens"] / padded if padded else 0.0
+
+    # ----------------------------------------------------------- dispatcher
+    def _take(self, now: float) -> Tuple[Optional[List[_Pending]], Optional[float]]:
+        """Next batch to run, or (None, seconds until one is due)."""
+        ripe, ripe_age, wait = None, -1.0, None
+        for key, items in self._buckets.items():
+            age = now - items[0].enqueued_at
+            if len(items) >= self.max_batch:
+                age = float("inf")                      # full buckets never wait
+            if age >= self.max_wait or self._closed:
+                if age > ripe_age:
+                    ripe, ripe_age = key, age
+            else:
+                due = self.max_wait - age
+                wait = due if wait is None else min(wait, due)
+        if ripe is None:
+            return None, wait
+        items = self._buckets[ripe]
+        batch, rest = items[:self.max_batch], items[self.max_batch:]
+        if rest:
+            self._buckets[ripe] = rest
+        else:
+            del self._buckets[ripe]
+        return batch, None
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    batch, wait = self._take(time.monotonic())
+                    if batch is not None:
+                        break
+                    if self._closed and not self._buckets:
+                        return
+                    self._cond.wait(wait)
+            self._run(batch)
+
+    def _run(self, batch: List[_Pending]) -> None:
+        longest = max(p.tokens for p in batch)
+        try:
+            outputs = self.generate([p.prompt for p in batch])
+            if len(outputs) != len(batch):
+                raise RuntimeError(f"backend returned {len(outputs)} outputs for {len(batch)} prompts")
+        except Exception as exc:
+            log.exception("batch_failed", size=len(batch))
+            with self._cond:
+                self.stats["errors"] += 1
+            for p in batch:
+                p.future.set_exception(exc)
+            return
+        with self._cond:
+            self.stats["jobs"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["tokens"] += sum(p.tokens for p in batch)
+            self.stats["padded_tokens"] += longest * len(batch)
+        log.debug("batch_done", size=len(batch), longest=longest)
+        for p, out in zip(batch, outputs):
+            p.future.set_result(out)
+
+
+__all__ = ["BatchScheduler", "bucket_for"]
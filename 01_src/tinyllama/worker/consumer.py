@@ -0,0 +1,459 @@
+# tinyllama/worker/consumer.py
+# ---------------------------------------------------------------------------
+# Job queue consumer: job-queue.fifo, or any tinyllama.queue backend.
+#
+#   consumer = Consumer(sqs, queue_url, handle_job, concurrency=4)
+#   consumer = Consumer(queue_from_env(), "redis", handle_job)
+#   consumer.run()              # until consumer.stop() (SIGTERM in __main__)
+#
+# An SQS client (boto3, InMemorySQS) is wrapped in tinyllama.queue's
+# SqsQueue; *queue_url* then names the queue, otherwise it only labels logs.
+#
+# – long-poll receive, up to 10 messages per call, only as many as there
+#   are free processing slots
+# – messages of one MessageGroupId from the same receive run in order on one
+#   slot, so FIFO ordering within a group is kept
+# – a heartbeat thread extends the visibility of every message still held
+#   before it runs out (queue visibility_timeout_seconds is 60)
+# – successful messages are acked in batches of up to 10 (DeleteMessageBatch
+#   on SQS), flushed before each receive and at least every
+#   delete_flush_interval s
+# – failed messages are made visible again after failure_visibility seconds;
+#   the rest of their group batch is released with them
+# – stop() drains: no new receives, in-flight jobs finish, deletes flush
+#
+# With a PriorityScheduler (worker/priority.py) the consumer prefetches up to
+# concurrency + prefetch messages and workers take the best-ranked job next
+# instead of keeping per-group receive order; prefetched jobs still waiting
+# at stop() are made visible again for other workers.
+#
+# With an IdleController (worker/idle.py) every job reports start and finish,
+# so the instance stops only after the requested idle minutes without work.
+#
+# Bodies are decoded with utils.codec (compressed / S3 claim-check) and, when
+# a verifier is given, authenticated with the router's job envelope:
+#   – undecodable, forged or mismatched (CodecError / EnvelopeError): deleted,
+#     retrying cannot help; no result is written, its owner is unknown
+#   – authentic but expired envelope (queued longer than the token lifetime
+#     plus JOB_ENVELOPE_GRACE_SECONDS): not run on stale identity, deleted,
+#     and on_failure records "envelope_expired" for the signed sub so
+#     GET /jobs answers instead of timing out; the client may resubmit
+#   – anything else (SSM / S3 outage while loading keys or claim-checks):
+#     released with an exponential backoff, so it retries and ends in the DLQ
+#
+# A job that fails on its max_receives-th delivery (the queue's redrive
+# maxReceiveCount, WORKER_MAX_RECEIVES) is about to go to the DLQ: on_failure
+# records the error so GET /jobs stops waiting. When on_result raises, the
+# message is not deleted: it is released and the job runs again.
+# ---------------------------------------------------------------------------
+
+from __future__ import annotations
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from tinyllama.queue.backends import QueueMessage, as_queue
+from tinyllama.utils.codec import CodecError, MessageCodec
+from tinyllama.utils.envelope import EnvelopeError, EnvelopeExpired
+from tinyllama.utils.log import get_logger
+from tinyllama.utils.schema import PRIORITY_DEFAULT
+from tinyllama.worker.inference import estimate_tokens
+
+log = get_logger(__name__)
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "4"))
+WORKER_WAIT_SECONDS = int(os.getenv("WORKER_WAIT_SECONDS", "20"))
+WORKER_VISIBILITY_SECONDS = int(os.getenv("WORKER_VISIBILITY_SECONDS", "60"))
+WORKER_PREFETCH = int(os.getenv("WORKER_PREFETCH", "10"))
+WORKER_MAX_RECEIVES = int(os.getenv("WORKER_MAX_RECEIVES", "3"))
+MAX_RECEIVE = 10
+MAX_BACKOFF_SECONDS = 900
+
+_DEFERRED = object()      # _decode: released for a retry, stop the group here
+
+
+class Job:
+    """One decoded queue message."""
+
+    __slots__ = ("message_id", "receipt_handle", "group_id", "receive_count", "body", "claims")
+
+    def __init__(self, message: QueueMessage, body: Dict[str, Any], claims: Optional[Dict[str, Any]]) -> None:
+        self.message_id: str = message.message_id
+        self.receipt_handle: str = message.receipt
+        self.group_id: str = message.group_id
+        self.receive_count = message.receive_count
+        self.body = body
+        self.claims = claims
+
+    @property
+    def request_id(self) -> Optional[str]:
+        return self.body.get("request_id")
+
+    @property
+    def prompt(self) -> str:
+        return self.body.get("prompt", "")
+
+    @property
+    def idle(self) -> Optional[int]:
+        return self.body.get("idle")
+
+    @property
+    def sub(self) -> Optional[str]:
+        """Caller's user id: verified envelope claims, else the router's claims digest."""
+        if self.claims:
+            return self.claims.get("sub")
+        return (self.body.get("claims") or {}).get("sub")
+
+    @property
+    def priority(self) -> int:
+        return self.body.get("priority", PRIORITY_DEFAULT)
+
+
+class _Held:
+    """Receipt handle we still own, and when its visibility runs out."""
+
+    __slots__ = ("receipt", "expires_at")
+
+    def __init__(self, receipt: str, expires_at: float) -> None:
+        self.receipt = receipt
+        self.expires_at = expires_at
+
+
+class Consumer:
+    def __init__(
+        self,
+        queue: Any,
+        queue_url: str,
+        handle: Callable[[Job], Any],
+        *,
+        concurrency: int = WORKER_CONCURRENCY,
+        wait_seconds: int = WORKER_WAIT_SECONDS,
+        visibility_timeout: int = WORKER_VISIBILITY_SECONDS,
+        heartbeat_interval: Optional[float] = None,
+        delete_flush_interval: float = 1.0,
+        failure_visibility: int = 10,
+        max_receives: int = WORKER_MAX_RECEIVES,
+        codec: Optional[MessageCodec] = None,
+        verifier: Any = None,
+        on_result: Optional[Callable[[Job, Any], None]] = None,
+        on_failure: Optional[Callable[[Job, str], None]] = None,
+        scheduler: Any = None,
+        prefetch: int = WORKER_PREFETCH,
+        idle: Any = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.queue = as_queue(queue, queue_url)
+        self.queue_url = queue_url
+        self.handle = handle
+        self.concurrency = concurrency
+        self.wait_seconds = wait_seconds
+        self.visibility_timeout = visibility_timeout
+        self.delete_flush_interval = delete_flush_interval
+        # wake up often enough to extend with a third of the timeout to spare
+        # and to keep the delete flush interval
+        self.heartbeat_interval = heartbeat_interval or max(
+            min(visibility_timeout / 6, delete_flush_interval), 0.05)
+        self.failure_visibility = failure_visibility
+        self.max_receives = max_receives
+        self.codec = codec or MessageCodec()
+        self.verifier = verifier
+        self.on_result = on_result
+        self.on_failure = on_failure
+        self.scheduler = scheduler
+        self.prefetch = prefetch
+        self.idle = idle
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(concurrency)
+        self._held: Dict[str, _Held] = {}            # message_id -> receipt + expiry
+        self._deletes: List[str] = []                # receipts to ack
+        self._last_flush = clock()
+        self._stopping = threading.Event()
+        self._stopped = threading.Event()
+
+        self.stats: Dict[str, int] = {
+            "received": 0, "processed": 0, "failed": 0, "rejected": 0, "deferred": 0,
+            "deleted": 0, "extended": 0, "result_failed": 0, "receive_calls": 0,
+            "delete_calls": 0, "extend_calls": 0,
+        }
+
+    # ------------------------------------------------------------ lifecycle
+    def stop(self) -> None:
+        """Stop receiving; run() returns once in-flight jobs are done and deletes flushed."""
+        self._stopping.set()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stopping.is_set()
+
+    def run(self, until_empty: bool = False) -> Dict[str, int]:
+        """
+        Consume until stop(). With *until_empty* also return after a receive
+        comes back empty while nothing is in flight (local runs, tests).
+        """
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="WorkerHeartbeat", daemon=True)
+        heartbeat.start()
+        pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="WorkerJob")
+        log.info("worker_started", concurrency=self.concurrency, queue=self.queue_url)
+        try:
+            if self.scheduler is None:
+                self._consume_in_order(pool, until_empty)
+            else:
+                self._consume_prioritised(pool, until_empty)
+        finally:
+            pool.shutdown(wait=True)                    # graceful drain
+            self._stopped.set()
+            heartbeat.join()
+            self._flush_deletes(force=True)
+            log.info("worker_stopped", **self.stats)
+        return dict(self.stats)
+
+    def _consume_in_order(self, pool: ThreadPoolExecutor, until_empty: bool) -> None:
+        while not self._stopping.is_set():
+            free = self._acquire_slots()
+            if free == 0:
+                continue
+            # settle finished work first: in a FIFO queue a group stays
+            # locked until its in-flight message is deleted
+            self._flush_deletes(force=True)
+            messages = self._receive(free)
+            groups = self._group(messages)
+            for _ in range(free - len(groups)):      # hand back unused slots
+                self._slots.release()
+            for group in groups:
+                pool.submit(self._run_group, group)
+            if until_empty and not messages and self._idle():
+                break
+
+    def _consume_prioritised(self, pool: ThreadPoolExecutor, until_empty: bool) -> None:
+        for _ in range(self.concurrency):
+            pool.submit(self._pull_jobs)
+        try:
+            while not self._stopping.is_set():
+                self._flush_deletes(force=True)
+                with self._lock:
+                    room = self.concurrency + self.prefetch - len(self._held)
+                if room <= 0:
+                    self._stopping.wait(0.01)
+                    continue
+                messages = self._receive(min(room, MAX_RECEIVE))
+                for message in messages:
+                    job = self._decode(message)
+                    if isinstance(job, Job):
+                        self.scheduler.push(job, work=estimate_tokens(job.prompt), priority=job.priority)
+                if until_empty and not messages and self._idle():
+                    break
+        finally:
+            for job in self.scheduler.drain():          # not started: let others have them
+                self._release(job.message_id, 0)
+            self.scheduler.close()
+
+    def _pull_jobs(self) -> None:
+        while True:
+            job = self.scheduler.pop()
+            if job is None:
+                return
+            self._execute(job)
+
+    def _acquire_slots(self) -> int:
+        if not self._slots.acquire(timeout=0.1):
+            return 0
+        free = 1
+        while free < min(self.concurrency, MAX_RECEIVE) and self._slots.acquire(blocking=False):
+            free += 1
+        return free
+
+    def _idle(self) -> bool:
+        with self._lock:
+            return not self._held and not self._deletes
+
+    # ------------------------------------------------------------- receive
+    def _receive(self, limit: int) -> List[QueueMessage]:
+        try:
+            messages = self.queue.receive(min(limit, MAX_RECEIVE), self.wait_seconds, self.visibility_timeout)
+        except Exception:
+            log.exception("receive_failed")
+            time.sleep(1.0)
+            return []
+        now = self._clock()
+        with self._lock:
+            self.stats["receive_calls"] += 1
+            self.stats["received"] += len(messages)
+            for m in messages:
+                self._held[m.message_id] = _Held(m.receipt, now + self.visibility_timeout)
+        return messages
+
+    @staticmethod
+    def _group(messages: List[QueueMessage]) -> List[List[QueueMessage]]:
+        """Split a receive into per-MessageGroupId runs, keeping their order."""
+        groups: Dict[str, List[QueueMessage]] = {}
+        for m in messages:
+            key = m.group_id or m.message_id
+            groups.setdefault(key, []).append(m)
+        return list(groups.values())
+
+    # ------------------------------------------------------------- process
+    def _run_group(self, messages: List[QueueMessage]) -> None:
+        try:
+            for i, message in enumerate(messages):
+                if not self._process(message):
+                    for rest in messages[i + 1:]:        # keep group order: retry together
+                        self._release(rest.message_id, 0)
+                    break
+        finally:
+            self._slots.release()
+
+    def _process(self, message: QueueMessage) -> bool:
+        job = self._decode(message)
+        if job is _DEFERRED:
+            return False
+        return True if job is None else self._execute(job)
+
+    def _decode(self, message: QueueMessage) -> Any:
+        """Job; None when the message was dropped; _DEFERRED when released for a retry."""
+        body: Dict[str, Any] = {}
+        try:
+            body = self.codec.decode(message.body)
+            claims = self.verifier.verify(body) if self.verifier is not None else None
+        except EnvelopeExpired as exc:
+            log.warning("job_expired", message_id=message.message_id, request_id=body.get("request_id"))
+            self._reject(message)
+            self._report_failure(Job(message, body, exc.payload), "envelope_expired")
+            return None
+        except (CodecError, EnvelopeError) as exc:
+            # undecodable or forged: retrying cannot help, drop it
+            log.warning("job_rejected", message_id=message.message_id, details=str(exc))
+            self._reject(message)
+            return None
+        except Exception:
+            log.exception("job_decode_failed", message_id=message.message_id)
+            with self._lock:
+                self.stats["deferred"] += 1
+            self._release(message.message_id, self._backoff(message.receive_count))
+            return _DEFERRED
+        return Job(message, body, claims)
+
+    def _reject(self, message: QueueMessage) -> None:
+        with self._lock:
+            self.stats["rejected"] += 1
+        self._delete_later(message.message_id)
+
+    def _backoff(self, receive_count: int) -> int:
+        """failure_visibility doubled per earlier receive, capped at MAX_BACKOFF_SECONDS."""
+        return min(self.failure_visibility * 2 ** max(receive_count - 1, 0), MAX_BACKOFF_SECONDS)
+
+    def _report_failure(self, job: Job, error: str) -> None:
+        if self.on_failure is None:
+            return
+        try:
+            self.on_failure(job, error)
+        except Exception:
+            log.exception("on_failure_failed", request_id=job.request_id)
+
+    def _execute(self, job: Job) -> bool:
+        if self.idle is not None:
+            self.idle.job_started()
+        try:
+            result = self.handle(job)
+        except Exception as exc:
+            log.exception("job_failed", message_id=job.message_id, request_id=job.request_id)
+            with self._lock:
+                self.stats["failed"] += 1
+            if job.receive_count >= self.max_receives:      # next stop: the DLQ
+                self._report_failure(job, str(exc) or type(exc).__name__)
+            self._release(job.message_id, self.failure_visibility)
+            return False
+        finally:
+            if self.idle is not None:
+                self.idle.job_finished(job.idle)
+
+        with self._lock:
+            self.stats["processed"] += 1
+        log.info("job_done", message_id=job.message_id, request_id=job.request_id)
+        if self.on_result is not None:
+            try:
+                self.on_result(job, result)
+            except Exception:
+                # keep the message: the output would be lost with it
+                log.exception("on_result_failed", request_id=job.request_id)
+                with self._lock:
+                    self.stats["result_failed"] += 1
+                self._release(job.message_id, self.failure_visibility)
+                return False
+        self._delete_later(job.message_id)
+        return True
+
+    def _release(self, message_id: str, visibility: int) -> None:
+        with self._lock:
+            held = self._held.pop(message_id, None)
+        if held is None:
+            return
+        try:
+            failed = self.queue.extend([held.receipt], visibility)
+        except Exception:
+            log.exception("release_failed", message_id=message_id)
+            return
+        if failed:
+            log.warning("release_failed", message_id=message_id)
+
+    # -------------------------------------------------------------- delete
+    def _delete_later(self, message_id: str) -> None:
+        with self._lock:
+            held = self._held.pop(message_id, None)
+            if held is None:
+                return
+            self._deletes.append(held.receipt)
+            full = len(self._deletes) >= MAX_RECEIVE
+        if full:
+            self._flush_deletes(force=True)
+
+    def _flush_deletes(self, force: bool = False) -> None:
+        with self._lock:
+            due = force or self._clock() - self._last_flush >= self.delete_flush_interval
+            if not due or not self._deletes:
+                return
+            pending, self._deletes = self._deletes, []
+            self._last_flush = self._clock()
+        for start in range(0, len(pending), MAX_RECEIVE):
+            chunk = pending[start:start + MAX_RECEIVE]
+            try:
+                failed = self.queue.ack(chunk)
+            except Exception:
+                log.exception("delete_failed", count=len(chunk))
+                failed = chunk
+            with self._lock:
+                self.stats["delete_calls"] += 1
+                self.stats["deleted"] += len(chunk) - len(failed)
+            if failed:
+                log.warning("delete_partial", failed=len(failed))
+
+    # ----------------------------------------------------------- heartbeat
+    def _heartbeat_loop(self) -> None:
+        while not self._stopped.wait(self.heartbeat_interval):
+            self._extend_due()
+            self._flush_deletes()
+
+    def _extend_due(self) -> None:
+        now = self._clock()
+        margin = self.visibility_timeout / 3
+        with self._lock:
+            due = [(mid, h) for mid, h in self._held.items() if h.expires_at - now <= margin]
+        for start in range(0, len(due), MAX_RECEIVE):
+            chunk = due[start:start + MAX_RECEIVE]
+            try:
+                failed = set(self.queue.extend([h.receipt for _, h in chunk], self.visibility_timeout))
+            except Exception:
+                log.exception("extend_failed", count=len(chunk))
+                continue
+            with self._lock:
+                self.stats["extend_calls"] += 1
+                for mid, h in chunk:
+                    if h.receipt not in failed:
+                        h.expires_at = now + self.visibility_timeout
+                        self.stats["extended"] += 1
+
+
+__all__ = ["Consumer", "Job"]
@@ -0,0 +1,156 @@
+# tinyllama/worker/idle.py
+# ---------------------------------------------------------------------------
+# Idle auto-stop for the GPU worker.
+#
+#   idle = IdleController(Ec2StopAction())
+#   Consumer(sqs, url, handler, idle=idle)
+#   idle.start()                       # watcher thread, or call idle.check()
+#
+# – every message carries idle (1–30 minutes, validated by PromptReq)
+# – each completed job moves the deadline to completion + its idle window,
+#   but never earlier than it already is: the longest request wins
+# – before the first job the deadline is boot + WORKER_IDLE_MINUTES
+# – no stop while a job is running, whatever the deadline says
+# – on expiry the stop action runs once and an AutoStops count is emitted
+#
+# All timing is on a monotonic clock (injectable for tests), so wall-clock
+# jumps on the instance cannot stop it early or keep it alive.
+#
+# Stop actions: Ec2StopAction (StopInstances on this instance, id from
+# WORKER_INSTANCE_ID or IMDSv2) and LocalStopStub (records the call; local
+# runs and tests).
+# ---------------------------------------------------------------------------
+
+from __future__ import annotations
+import os
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+from tinyllama.utils.log import get_logger
+from tinyllama.utils.metrics import emit
+
+log = get_logger(__name__)
+
+WORKER_IDLE_MINUTES = float(os.getenv("WORKER_IDLE_MINUTES", "5"))
+WORKER_METRICS_NAMESPACE = os.getenv("WORKER_METRICS_NAMESPACE", "TLFIF/Worker")
+IMDS_URL = "http://169.254.169.254/latest"
+
+
+class IdleController:
+    def __init__(
+        self,
+        stop_action: Callable[[], Any],
+        initial_idle_minutes: float = WORKER_IDLE_MINUTES,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.stop_action = stop_action
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._deadline = clock() + initial_idle_minutes * 60
+        self._active = 0
+        self._watcher: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+        self.stopped = False
+
+    # ---------------------------------------------------------- job events
+    def job_started(self) -> None:
+        with self._lock:
+            self._active += 1
+
+    def job_finished(self, idle_minutes: Optional[float]) -> None:
+        with self._lock:
+            self._active = max(self._active - 1, 0)
+            if idle_minutes:
+                self._deadline = max(self._deadline, self._clock() + idle_minutes * 60)
+
+    def remaining(self) -> float:
+        """Seconds until the instance may stop (0 when due)."""
+        with self._lock:
+            return max(self._deadline - self._clock(), 0.0)
+
+    # -------------------------------------------------------------- expiry
+    def check(self) -> bool:
+        """Run the stop action if the deadline passed with no job running; True once stopped."""
+        with self._lock:
+            if self.stopped:
+                return True
+            if self._active or self._clock() < self._deadline:
+                return False
+            self.stopped = True
+        log.info("idle_timeout", action=getattr(self.stop_action, "__name__", type(self.stop_action).__name__))
+        emit(WORKER_METRICS_NAMESPACE, {"AutoStops": 1}, dimensions={"Component": "worker"})
+        try:
+            self.stop_action()
+        except Exception:
+            log.exception("stop_action_failed")
+        return True
+
+    def start(self, poll: float = 5.0) -> None:
+        """Check every *poll* seconds on a daemon thread until stopped or close()d."""
+        def watch() -> None:
+            while not self._closed.wait(min(poll, max(self.remaining(), 0.01))):
+                if self.check():
+                    return
+
+        self._watcher = threading.Thread(target=watch, name="IdleWatcher", daemon=True)
+        self._watcher.start()
+
+    def close(self) -> None:
+        self._closed.set()
+        if self._watcher is not None:
+            self._watcher.join()
+
+# ---------------------------------------------------------------------------
+#  Stop actions
+# ---------------------------------------------------------------------------
+class LocalStopStub:
+    """Stand-in for Ec2StopAction: logs and records instead of stopping anything."""
+
+    def __init__(self) -> None:
+        self.calls: List[float] = []
+
+    def __call__(self) -> None:
+        self.calls.append(time.time())
+        log.info("stop_instance_stub")
+
+
+class Ec2StopAction:
+    """StopInstances on this instance (stop, not terminate: the EBS volume stays)."""
+
+    def __init__(self, instance_id: Optional[str] = None, client: Any = None) -> None:
+        self._instance_id = instance_id or os.getenv("WORKER_INSTANCE_ID")
+        self._client = client
+
+    @property
+    def instance_id(self) -> str:
+        if not self._instance_id:
+            self._instance_id = _imds_instance_id()
+        return self._instance_id
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("ec2")
+        return self._client
+
+    def __call__(self) -> None:
+        log.info("stop_instance", instance_id=self.instance_id)
+        self.client.stop_instances(InstanceIds=[self.instance_id])
+
+
+def _imds_instance_id() -> str:
+    """Instance id from the metadata service (IMDSv2 token first)."""
+    import urllib.request
+    req = urllib.request.Request(f"{IMDS_URL}/api/token", method="PUT",
+                                 headers={"X-aws-ec2-metadata-token-ttl-seconds": "60"})
+    with urllib.request.urlopen(req, timeout=2) as resp:
+        token = resp.read().decode()
+    req = urllib.request.Request(f"{IMDS_URL}/meta-data/instance-id",
+                                 headers={"X-aws-ec2-metadata-token": token})
+    with urllib.request.urlopen(req, timeout=2) as resp:
+        return resp.read().decode()
+
+
+__all__ = ["IdleController", "LocalStopStub", "Ec2StopAction"]
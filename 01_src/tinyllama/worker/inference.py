@@ -0,0 +1,166 @@
+# tinyllama/worker/inference.py
+# ---------------------------------------------------------------------------
+# Job handler for the consumer, and a fake inference backend for local runs.
+#
+#   handler = JobHandler(fake_generate)
+#   Consumer(sqs, url, handler).run()
+#
+# fake_generate echoes the prompt after a delay proportional to its length
+# (WORKER_FAKE_MS_PER_CHAR, default 0) so queueing behaviour can be exercised
+# without a GPU. The real model plugs in as any callable prompt -> text.
+#
+# With stream_generate (prompt -> iterator of text chunks) and a pub/sub bus
+# the handler publishes start / token / done|error messages on
+# stream_channel(request_id) while generating (see tinyllama.utils.pubsub);
+# fake_generate_stream is the chunked echo for local runs.
+#
+# With a response cache (tinyllama.utils.cache) a repeated prompt is served
+# from the cache instead of the model, and every fresh output is stored for
+# the router and later jobs; "cache": false in the job body bypasses both.
+# Cache errors are logged and never fail a job.
+#
+# ResultWriter is the consumer's on_result hook: it stores {request_id,
+# output, sub} in a tinyllama.utils.results store for GET /jobs/{request_id};
+# its failed() is the on_failure hook and stores {..., error} instead.
+#
+# FakeBatchBackend is the CPU stand-in for a batched generate(prompts): a
+# batch costs one fixed step plus time for its longest (padded) prompt, which
+# is roughly how a batched forward pass behaves on the GPU.
+# ---------------------------------------------------------------------------
+
+from __future__ import annotations
+import os
+import re
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from tinyllama.utils import results
+from tinyllama.utils.cache import cache_enabled
+from tinyllama.utils.promptkey import generation_params
+from tinyllama.utils.pubsub import stream_channel
+from tinyllama.utils.log import get_logger
+
+log = get_logger(__name__)
+
+FAKE_MS_PER_CHAR = float(os.getenv("WORKER_FAKE_MS_PER_CHAR", "0"))
+FAKE_MS_PER_CHUNK = float(os.getenv("WORKER_FAKE_MS_PER_CHUNK", "0"))
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(prompt: str) -> int:
+    """Cheap prompt-length estimate (~4 chars per token for English text)."""
+    return len(prompt) // CHARS_PER_TOKEN + 1
+
+
+def fake_generate(prompt: str, ms_per_char: float = FAKE_MS_PER_CHAR) -> str:
+    if ms_per_char:
+        time.sleep(len(prompt) * ms_per_char / 1000)
+    return f"echo: {prompt}"
+
+
+def fake_generate_stream(prompt: str, ms_per_chunk: float = FAKE_MS_PER_CHUNK) -> Iterator[str]:
+    """fake_generate's text, one word (with its trailing space) at a time."""
+    for chunk in re.findall(r"\S+\s*|\s+", f"echo: {prompt}"):
+        if ms_per_chunk:
+            time.sleep(ms_per_chunk / 1000)
+        yield chunk
+
+
+class FakeBatchBackend:
+    """Echo backend for generate(batch) with a batched-GPU-like cost model."""
+
+    def __init__(self, base_ms: float = 0.0, ms_per_token: float = 0.0, ms_per_item: float = 0.0) -> None:
+        self.base_ms = base_ms
+        self.ms_per_token = ms_per_token
+        self.ms_per_item = ms_per_item
+        self.batches: List[int] = []
+
+    def __call__(self, prompts: List[str]) -> List[str]:
+        longest = max(estimate_tokens(p) for p in prompts)
+        cost_ms = self.base_ms + longest * self.ms_per_token + len(prompts) * self.ms_per_item
+        if cost_ms:
+            time.sleep(cost_ms / 1000)
+        self.batches.append(len(prompts))
+        return [f"echo: {p}" for p in prompts]
+
+
+class JobHandler:
+    """Turn a consumer Job into {request_id, output}; raises to have it retried."""
+
+    def __init__(
+        self,
+        generate: Callable[[str], str] = fake_generate,
+        stream_generate: Optional[Callable[[str], Iterator[str]]] = None,
+        pubsub: Any = None,
+        cache: Any = None,
+    ) -> None:
+        self.generate = generate
+        self.stream_generate = stream_generate
+        self.pubsub = pubsub
+        self.cache = cache
+
+    def __call__(self, job: Any) -> Dict[str, Any]:
+        started = time.perf_counter()
+        use_cache = self.cache is not None and cache_enabled(job.body)
+        cached = self._cache_lookup(job) if use_cache else None
+        streaming = self.stream_generate is not None and self.pubsub is not None and job.request_id
+        if cached is not None:
+            output = self._stream(job, iter([cached])) if streaming else cached
+        elif streaming:
+            output = self._stream(job, self.stream_generate(job.prompt))
+        else:
+            output = self.generate(job.prompt)
+        if use_cache and cached is None:
+            self._cache_store(job, output)
+        log.info("inference_done", request_id=job.request_id, cached=cached is not None,
+                 ms=round((time.perf_counter() - started) * 1000, 2))
+        return {"request_id": job.request_id, "output": output}
+
+    def _cache_lookup(self, job: Any) -> Optional[str]:
+        try:
+            return self.cache.lookup(job.prompt, generation_params(job.body))
+        except Exception:
+            log.exception("response_cache_failed", request_id=job.request_id)
+            return None
+
+    def _cache_store(self, job: Any, output: str) -> None:
+        try:
+            self.cache.store(job.prompt, generation_params(job.body), output)
+        except Exception:
+            log.exception("response_cache_failed", request_id=job.request_id)
+
+    def _stream(self, job: Any, chunks_in: Iterator[str]) -> str:
+        channel = stream_channel(job.request_id)
+        self.pubsub.publish(channel, {"type": "start", "sub": job.sub})
+        chunks: List[str] = []
+        try:
+            for text in chunks_in:
+                chunks.append(text)
+                self.pubsub.publish(channel, {"type": "token", "text": text})
+        except Exception as exc:
+            self.pubsub.publish(channel, {"type": "error", "error": str(exc)})
+            raise
+        output = "".join(chunks)
+        self.pubsub.publish(channel, {"type": "done", "output": output})
+        return output
+
+
+class ResultWriter:
+    """on_result hook: persist a finished job for GET /jobs/{request_id}."""
+
+    def __init__(self, store: Any) -> None:
+        self.store = store
+
+    def __call__(self, job: Any, result: Dict[str, Any]) -> None:
+        if job.request_id:
+            self.store.put(job.request_id, results.record(job.request_id, job.sub, result.get("output")))
+
+    def failed(self, job: Any, error: str) -> None:
+        if job.request_id:
+            self.store.put(job.request_id, results.record(job.request_id, job.sub, error=error))
+
+
+__all__ = [
+    "estimate_tokens", "fake_generate", "fake_generate_stream", "FakeBatchBackend",
+    "JobHandler", "ResultWriter",
+]
@@ -0,0 +1,202 @@
+# tinyllama/worker/local_sqs.py
+# ---------------------------------------------------------------------------
+# In-memory stand-in for the SQS calls the router and worker make, with the
+# FIFO semantics of job-queue.fifo:
+#
+#   – messages of one MessageGroupId are delivered in order, and a group with
+#     a message in flight delivers nothing else until it is deleted or its
+#     visibility expires
+#   – receive_message long-polls up to WaitTimeSeconds for MaxNumberOfMessages
+#   – every receive issues a fresh ReceiptHandle; stale handles fail deletes
+#
+# Good enough for local runs, unit tests and benchmarks; it does not model
+# deduplication windows, retention or DLQ redrive.
+# ---------------------------------------------------------------------------
+
+from __future__ import annotations
+import itertools
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+
+class _Msg:
+    __slots__ = ("message_id", "body", "group", "visible_at", "receipt", "receives", "sent_at")
+
+    def __init__(self, body: str, group: Optional[str], now: float) -> None:
+        self.message_id = str(uuid.uuid4())
+        self.body = body
+        self.group = group
+        self.visible_at = now
+        self.receipt: Optional[str] = None
+        self.receives = 0
+        self.sent_at = now
+
+
+class InMemorySQS:
+    def __init__(
+        self,
+        visibility_timeout: float = 60.0,
+        fifo: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.visibility_timeout = visibility_timeout
+        self.fifo = fifo
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._messages: List[_Msg] = []
+        self._by_receipt: Dict[str, _Msg] = {}
+        self.calls: Dict[str, int] = {}
+        self._ids = itertools.count()
+
+    def _count(self, name: str) -> None:
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    # ------------------------------------------------------------- sending
+    def send_message(self, *, QueueUrl: str = "", MessageBody: str,
+                     MessageGroupId: Optional[str] = None, **_: Any) -> Dict[str, str]:
+        with self._cond:
+            self._count("send_message")
+            msg = _Msg(MessageBody, MessageGroupId, self._clock())
+            self._messages.append(msg)
+            self._cond.notify_all()
+        return {"MessageId": msg.message_id}
+
+    def send_message_batch(self, *, QueueUrl: str = "", Entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        with self._cond:
+            self._count("send_message_batch")
+            ok = []
+            for e in Entries:
+                msg = _Msg(e["MessageBody"], e.get("MessageGroupId"), self._clock())
+                self._messages.append(msg)
+                ok.append({"Id": e["Id"], "MessageId": msg.message_id})
+            self._cond.notify_all()
+        return {"Successful": ok, "Failed": []}
+
+    # ----------------------------------------------------------- receiving
+    def _collect(self, limit: int, visibility: float) -> List[Dict[str, Any]]:
+        now = self._clock()
+        busy = set()
+        if self.fifo:
+            # groups with a message in flight are locked; the rest are handed
+            # out in send order, several of one group per receive as SQS does
+            busy = {m.group for m in self._messages if m.visible_at > now}
+        out = []
+        for m in self._messages:
+            if len(out) >= limit:
+                break
+            if m.visible_at > now:
+                continue
+            if self.fifo and m.group in busy:
+                continue
+            if m.receipt:
+                self._by_receipt.pop(m.receipt, None)
+            m.receipt = f"rh-{next(self._ids)}-{m.message_id}"
+            m.visible_at = now + visibility
+            m.receives += 1
+            self._by_receipt[m.receipt] = m
+            out.append({
+                "MessageId": m.message_id,
+                "ReceiptHandle": m.receipt,
+                "Body": m.body,
+                "Attributes": {
+                    "MessageGroupId": m.group or "",
+                    "ApproximateReceiveCount": str(m.receives),
+                    "SentTimestamp": str(int(m.sent_at * 1000)),
+                },
+            })
+        return out
+
+    def receive_message(
+        self,
+        *,
+        QueueUrl: str = "",
+        MaxNumberOfMessages: int = 1,
+        WaitTimeSeconds: float = 0,
+        VisibilityTimeout: Optional[float] = None,
+        **_: Any,
+    ) -> Dict[str, Any]:
+        visibility = self.visibility_timeout if VisibilityTimeout is None else VisibilityTimeout
+        deadline = time.monotonic() + WaitTimeSeconds
+        with self._cond:
+            self._count("receive_message")
+            while True:
+                got = self._collect(min(MaxNumberOfMessages, 10), visibility)
+                remaining = deadline - time.monotonic()
+                if got or remaining <= 0:
+                    return {"Messages": got} if got else {}
+                self._cond.wait(min(remaining, 0.05))   # also re-check expired visibility
+
+    # -------------------------------------------------- deleting / visibility
+    def _delete(self, receipt: str) -> bool:
+        msg = self._by_receipt.pop(receipt, None)
+        if msg is None:
+            return False
+        self._messages.remove(msg)
+        self._cond.notify_all()
+        return True
+
+    def delete_message(self, *, QueueUrl: str = "", ReceiptHandle: str) -> Dict[str, Any]:
+        with self._cond:
+            self._count("delete_message")
+            if not self._delete(ReceiptHandle):
+                raise ValueError("ReceiptHandleIsInvalid")
+        return {}
+
+    def delete_message_batch(self, *, QueueUrl: str = "", Entries: List[Dict[str, str]]) -> Dict[str, Any]:
+        with self._cond:
+            self._count("delete_message_batch")
+            ok, bad = [], []
+            for e in Entries:
+                (ok if self._delete(e["ReceiptHandle"]) else bad).append(e["Id"])
+        return {
+            "Successful": [{"Id": i} for i in ok],
+            "Failed": [{"Id": i, "Code": "ReceiptHandleIsInvalid", "SenderFault": True} for i in bad],
+        }
+
+    def _change(self, receipt: str, timeout: float) -> bool:
+        msg = self._by_receipt.get(receipt)
+        if msg is None:
+            return False
+        msg.visible_at = self._clock() + timeout
+        if timeout == 0:
+            self._cond.notify_all()
+        return True
+
+    def change_message_visibility(self, *, QueueUrl: str = "", ReceiptHandle: str,
+                                  VisibilityTimeout: float) -> Dict[str, Any]:
+        with self._cond:
+            self._count("change_message_visibility")
+            if not self._change(ReceiptHandle, VisibilityTimeout):
+                raise ValueError("ReceiptHandleIsInvalid")
+        return {}
+
+    def change_message_visibility_batch(self, *, QueueUrl: str = "",
+                                        Entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        with self._cond:
+            self._count("change_message_visibility_batch")
+            ok, bad = [], []
+            for e in Entries:
+                (ok if self._change(e["ReceiptHandle"], e["VisibilityTimeout"]) else bad).append(e["Id"])
+        return {
+            "Successful": [{"Id": i} for i in ok],
+            "Failed": [{"Id": i, "Code": "ReceiptHandleIsInvalid", "SenderFault": True} for i in bad],
+        }
+
+    # ---------------------------------------------------------- attributes
+    def get_queue_attributes(self, *, QueueUrl: str = "", AttributeNames: List[str] = ()) -> Dict[str, Any]:
+        with self._cond:
+            now = self._clock()
+            visible = sum(1 for m in self._messages if m.visible_at <= now)
+            return {"Attributes": {
+                "ApproximateNumberOfMessages": str(visible),
+                "ApproximateNumberOfMessagesNotVisible": str(len(self._messages) - visible),
+            }}
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._messages)
+
+
+__all__ = ["InMemorySQS"]
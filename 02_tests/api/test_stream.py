@@ -0,0 +1,132 @@
+import json
+import threading
+import time
+
+import httpx
+import pytest
+import uvicorn
+from fastapi.testclient import TestClient
+
+import api.routes as routes
+import tinyllama.router.handler as handler
+from api.config import settings
+from tinyllama.utils.envelope import JobVerifier
+from tinyllama.utils.jwt_tools import make_token
+from tinyllama.utils.pubsub import InProcessPubSub, stream_channel
+from tinyllama.worker.consumer import Consumer
+from tinyllama.worker.inference import JobHandler, fake_generate, fake_generate_stream
+from tinyllama.worker.local_sqs import InMemorySQS
+
+client = TestClient(routes.app)
+ISS = "https://cognito-idp.eu-central-1.amazonaws.com/eu-central-1_TEST"
+
+
+@pytest.fixture
+def bus(monkeypatch):
+    bus = InProcessPubSub()
+    monkeypatch.setattr(routes, "pubsub_from_env", lambda: bus)
+    return bus
+
+
+@pytest.fixture
+def server():
+    """The app on a real socket: TestClient buffers streamed bodies, uvicorn does not."""
+    srv = uvicorn.Server(uvicorn.Config(routes.app, host="127.0.0.1", port=0, log_level="warning"))
+    thread = threading.Thread(target=srv.run, daemon=True)
+    thread.start()
+    while not srv.started:
+        time.sleep(0.01)
+    port = srv.servers[0].sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}"
+    srv.should_exit = True
+    thread.join()
+
+
+def _events(resp, started=None):
+    """(event, data, seconds since *started*, default now) per SSE frame."""
+    started, event = started or time.monotonic(), None
+    for line in resp.iter_lines():
+        if line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            yield event, json.loads(line[5:]), time.monotonic() - started
+
+
+def _stream(request_id, token=None):
+    token = token or make_token(aud=settings.client_id)
+    return client.stream("GET", f"/infer/{request_id}/stream", headers={"Authorization": f"Bearer {token}"})
+
+
+def test_tokens_then_done(bus):
+    channel = stream_channel("r-1")
+    for msg in ({"type": "start", "sub": "test-user"}, {"type": "token", "text": "Hel"},
+                {"type": "token", "text": "lo"}, {"type": "done", "output": "Hello"}):
+        bus.publish(channel, msg)
+
+    with _stream("r-1") as resp:
+        events = [(e, d) for e, d, _ in _events(resp)]
+
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    assert events == [("token", {"type": "token", "text": "Hel"}), ("token", {"type": "token", "text": "lo"}),
+                      ("done", {"type": "done", "output": "Hello"})]
+
+
+def test_other_users_stream_is_refused(bus):
+    bus.publish(stream_channel("r-2"), {"type": "start", "sub": "someone-else"})
+    bus.publish(stream_channel("r-2"), {"type": "token", "text": "secret"})
+
+    with _stream("r-2") as resp:
+        events = [(e, d) for e, d, _ in _events(resp)]
+
+    assert events == [("error", {"error": "forbidden"})]
+
+
+def test_stream_without_start_is_refused(bus):
+    # start trimmed away or never published: the owner is unknown
+    bus.publish(stream_channel("r-5"), {"type": "token", "text": "secret"})
+    bus.publish(stream_channel("r-5"), {"type": "done", "output": "secret"})
+
+    with _stream("r-5") as resp:
+        events = [(e, d) for e, d, _ in _events(resp)]
+
+    assert events == [("error", {"error": "forbidden"})]
+
+
+def test_gives_up_after_the_stream_window(bus, monkeypatch):
+    monkeypatch.setattr(routes, "STREAM_MAX_SECONDS", 0.2)
+    monkeypatch.setattr(routes, "STREAM_KEEPALIVE_SECONDS", 0.05)
+
+    with _stream("r-3") as resp:
+        body = "".join(resp.iter_text())
+
+    assert ": keep-alive" in body and body.endswith('data: {"error": "timeout"}\n\n')
+
+
+def test_missing_token_is_rejected(bus):
+    assert client.get("/infer/r-4/stream").status_code == 401
+
+
+def test_time_to_first_token_end_to_end(bus, server, monkeypatch):
+    # router -> queue -> worker -> pub/sub -> SSE, 25 chunks at 40 ms each
+    sqs = InMemorySQS()
+    monkeypatch.setattr(handler, "_sqs", sqs)
+    monkeypatch.setattr(handler, "QUEUE_URL", "local")
+    token = make_token(iss=ISS, aud=settings.client_id)
+    prompt = " ".join(f"w{i}" for i in range(24))
+    started = time.monotonic()
+    resp = handler.lambda_handler({"headers": {"authorization": f"Bearer {token}"},
+                                   "body": json.dumps({"prompt": prompt, "idle": 5})}, None)
+    request_id = json.loads(resp["body"])["requestId"]
+
+    worker = Consumer(sqs, "local", JobHandler(stream_generate=lambda p: fake_generate_stream(p, 40),
+                                               pubsub=bus), wait_seconds=0.1, verifier=JobVerifier())
+    threading.Thread(target=worker.run, kwargs={"until_empty": True}, daemon=True).start()
+    with httpx.stream("GET", f"{server}/infer/{request_id}/stream", timeout=10,
+                      headers={"Authorization": f"Bearer {token}"}) as sse:
+        events = list(_events(sse, started))
+
+    tokens = [d["text"] for e, d, _ in events if e == "token"]
+    ttft, total = events[0][2], events[-1][2]
+    print(f"\nTTFT {ttft * 1000:.0f} ms, full answer {total * 1000:.0f} ms, {len(tokens)} chunks")
+    assert events[-1][0] == "done" and "".join(tokens) == fake_generate(prompt)
+    assert ttft < total / 4
@@ -53,14 +53,14 @@ def pytest_configure(config):
     os.environ["COGNITO_USER_POOL_ID"] = "eu-central-1_TEST"
     os.environ["COGNITO_CLIENT_ID"]    = "local-test-client-id"
     os.environ["JOB_QUEUE_URL"]        = "https://dummy-queue-url"
+    os.environ["JOB_HMAC_KEY"]         = "local-test-job-envelope-hmac-key"
     print("[debug] pytest_configure set env vars", file=sys.stderr)
 
 # ─── 2) Patch auth JWKS cache ────────────────────────────────────────────────
 import tinyllama.utils.auth as auth_module
 _kid_map = {k["kid"]: k for k in _raw_jwks["keys"]}
 auth_module._load_jwks = lambda: _kid_map
-auth_module._cached_jwks.clear()
-auth_module._cached_jwks.update(_kid_map)
+auth_module._jwks_manager.refresh()
 
 # ─── 3) Dummy SQS client ─────────────────────────────────────────────────────
 import tinyllama.router.handler as handler_module
@@ -78,7 +78,8 @@ def lambda_handler(event, context=None):
     except json.JSONDecodeError:
         pass
     idle = body.get("idle")
-    if not isinstance(idle, int) or idle < 1:
+    method = ((event.get("requestContext") or {}).get("http") or {}).get("method", "POST")
+    if method == "POST" and (not isinstance(idle, int) or idle < 1):
         return {
             "statusCode": 400,
             "body": json.dumps(
@@ -89,3 +90,26 @@ def lambda_handler(event, context=None):
         aws_request_id = "test-request"
     return _original_lambda(event, context or Ctx())
 handler_module.lambda_handler = lambda_handler
+
+# ─── 5) Fresh per-user rate-limit buckets for every test ─────────────────────
+import pytest
+
+@pytest.fixture(autouse=True)
+def _reset_rate_limiter():
+    handler_module._rate_limiter = None
+    yield
+    handler_module._rate_limiter = None
+
+# ─── 6) No coalescing window left open by an earlier test ────────────────────
+@pytest.fixture(autouse=True)
+def _reset_coalescer():
+    handler_module._coalescer = None
+    yield
+    handler_module._coalescer = None
+
+# ─── 7) Response cache off unless a test installs one ────────────────────────
+@pytest.fixture(autouse=True)
+def _reset_response_cache():
+    handler_module._response_cache = None
+    yield
+    handler_module._response_cache = None
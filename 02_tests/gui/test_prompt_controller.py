@@ -4,6 +4,8 @@ Unit tests for tinyllama.gui.controllers.prompt_controller.PromptController
 Checks:
 • on_send()          – empty prompt ignored; valid prompt schedules async job
 • _on_backend_reply  – success and error paths update state/UI correctly
+• streaming          – chunks reach the view through ThreadService.call_soon
+• AwsTinyLlamaClient – falls back to the 202 status when /jobs is unavailable
 """
 
 import sys
@@ -134,3 +136,70 @@ def test_on_backend_reply_error(monkeypatch):
 
     assert view.busy_log[-1] is False
     assert view.out_lines and "boom" in view.out_lines[-1]
+
+
+def test_streaming_client_renders_chunks(monkeypatch):
+    PromptController = _import_controller(monkeypatch)
+
+    class StreamingClient:
+        def stream_prompt(self, prompt, metadata, on_chunk):
+            for text in ("Hel", "lo"):
+                on_chunk(text)
+            return "Hello"
+
+    class StreamingView(StubView):
+        def append_output(self, text, newline=True):
+            self.out_lines.append((text, newline))
+
+    class ImmediateService(StubService):
+        def call_soon(self, fn, *args, **kw):
+            fn(*args, **kw)
+
+    monkeypatch.setitem(sys.modules["tinyllama.gui.controllers.prompt_controller"]._CLIENTS_BY_NAME,
+                        "Streaming", StreamingClient)
+    st, view, svc = StubState(), StreamingView(), ImmediateService()
+    st.backend = "Streaming"
+    ctrl = PromptController(state=st, service=svc, view=view)
+
+    ctrl.on_send("hello")
+    fn, args, cb = svc.async_jobs[0]
+    cb(fn(*args))
+
+    assert view.out_lines == [("Hel", False), ("lo", False), ("", True)]
+
+
+def test_read_stream_parses_sse():
+    pc_mod = importlib.import_module("tinyllama.gui.controllers.prompt_controller")
+    lines = [": keep-alive", "", "event: token", 'data: {"text": "Hi"}', "",
+             "event: done", 'data: {"output": "Hi!"}', ""]
+    chunks = []
+
+    assert pc_mod.read_stream(lines, chunks.append) == "Hi!"
+    assert chunks == ["Hi"]
+
+
+def test_aws_client_shows_queued_when_jobs_route_has_no_store(monkeypatch):
+    pc_mod = importlib.import_module("tinyllama.gui.controllers.prompt_controller")
+
+    class Resp:
+        def __init__(self, status, body):
+            self.status_code, self._body = status, body
+
+        def json(self):
+            return self._body
+
+        def raise_for_status(self):
+            if self.status_code >= 400:
+                raise Exception(f"HTTP {self.status_code}")
+
+    polls = []
+    monkeypatch.setenv("API_BASE_URL", "https://api.example")
+    monkeypatch.setattr(pc_mod.requests, "post",
+                        lambda url, **kw: Resp(202, {"status": "queued", "requestId": "r-1"}))
+    for status in (500, 404):
+        monkeypatch.setattr(pc_mod.requests, "get", lambda url, status=status, **kw: polls.append(url)
+                            or Resp(status, {"error": "result_store_not_configured"}))
+
+        assert pc_mod.AwsTinyLlamaClient("tok").send_prompt("hi", {}) == "queued"
+
+    assert polls == ["https://api.example/jobs/r-1"] * 2
@@ -0,0 +1 @@
+# package marker
\ No newline at end of file
@@ -0,0 +1,263 @@
+import json
+import threading
+
+import pytest
+
+import tinyllama.router.handler as handler
+import tinyllama.utils.jwt_tools as jt
+from tinyllama.queue import backends
+from tinyllama.queue.backends import InProcessQueue, RedisStreamQueue, SqsQueue, queue_from_env
+from tinyllama.worker.consumer import Consumer
+from tinyllama.worker.inference import JobHandler
+from tinyllama.worker.local_sqs import InMemorySQS
+
+ISS = "https://cognito-idp.eu-central-1.amazonaws.com/eu-central-1_TEST"
+AUD = "local-test-client-id"
+
+
+def _seq(entry_id):
+    ms, seq = (entry_id.decode() if isinstance(entry_id, bytes) else entry_id).split("-")
+    return int(ms), int(seq)
+
+
+class FakeRedis:
+    """One stream with one consumer group, plus the dedup script; idle times from *clock*."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.entries = []                 # [(id, fields)] in id order
+        self.pending = {}                 # id -> {"consumer", "at", "times"}
+        self.last_delivered = (0, 0)
+        self.group = None
+        self.kv = {}
+        self._n = 0
+        self._cond = threading.Condition(threading.RLock())
+
+    def xgroup_create(self, key, group, id="0", mkstream=False):
+        if self.group is not None:
+            raise RuntimeError("BUSYGROUP Consumer Group name already exists")
+        self.group = group
+
+    def register_script(self, source):
+        assert "XADD" in source
+
+        def dedup_xadd(keys, args):                  # same steps as the Lua, run atomically
+            with self._cond:
+                if keys[1] in self.kv:
+                    return self.kv[keys[1]]
+                entry_id = self.xadd(keys[0], {"body": args[1], "group": args[2]}, minid=args[0])
+                self.kv[keys[1]] = entry_id
+                return entry_id
+        return dedup_xadd
+
+    def xadd(self, key, fields, minid=None, approximate=True):
+        with self._cond:
+            self._n += 1
+            entry_id = f"{int(self.clock() * 1000)}-{self._n}"
+            self.entries.append((entry_id, {k.encode(): v.encode() for k, v in fields.items()}))
+            if minid is not None:
+                self.entries = [e for e in self.entries if _seq(e[0]) >= _seq(minid)]
+            self._cond.notify_all()
+            return entry_id.encode()
+
+    def xlen(self, key):
+        return len(self.entries)
+
+    def _new(self):
+        return [e for e in self.entries if _seq(e[0]) > self.last_delivered]
+
+    def xreadgroup(self, group, consumer, streams, count=None, block=None):
+        with self._cond:
+            if block is not None:
+                self._cond.wait_for(self._new, block / 1000)
+            out = self._new()[:count]
+            for entry_id, _ in out:
+                self.pending[entry_id] = {"consumer": consumer, "at": self.clock(), "times": 1}
+                self.last_delivered = _seq(entry_id)
+            return [(list(streams)[0], out)] if out else []
+
+    def xautoclaim(self, key, group, consumer, min_idle_time, start_id="0-0", count=None):
+        stored = dict(self.entries)
+        claimed, deleted = [], []
+        for entry_id, p in sorted(self.pending.items(), key=lambda kv: _seq(kv[0])):
+            if len(claimed) >= count or (self.clock() - p["at"]) * 1000 < min_idle_time:
+                continue
+            if entry_id not in stored:
+                deleted.append(entry_id)
+                del self.pending[entry_id]
+                continue
+            p.update(consumer=consumer, at=self.clock(), times=p["times"] + 1)
+            claimed.append((entry_id, stored[entry_id]))
+        return ["0-0", claimed, deleted]
+
+    def xpending_range(self, key, group, min, max, count):
+        p = self.pending.get(min)
+        return [{"message_id": min, "consumer": p["consumer"], "times_delivered": p["times"]}] if p else []
+
+    def xclaim(self, key, group, consumer, min_idle_time, message_ids, idle=None, justid=False):
+        kept = [m for m in message_ids if m in self.pending]
+        for m in kept:
+            self.pending[m].update(consumer=consumer, at=self.clock() - (idle or 0) / 1000)
+        return [m.encode() for m in kept]
+
+    def xack(self, key, group, *ids):
+        return sum(self.pending.pop(i, None) is not None for i in ids)
+
+    def xdel(self, key, *ids):
+        self.entries = [e for e in self.entries if e[0] not in ids]
+
+    def xinfo_groups(self, key):
+        return [{"name": self.group.encode(), "pending": len(self.pending), "lag": len(self._new())}]
+
+
+@pytest.fixture(params=["memory", "sqs", "redis"])
+def make_queue(request):
+    def make(clock):
+        if request.param == "memory":
+            return InProcessQueue(clock=clock)
+        if request.param == "sqs":
+            return SqsQueue("local", client=InMemorySQS(clock=clock))
+        return RedisStreamQueue(FakeRedis(clock), clock=clock)
+    return make
+
+
+def test_round_trip_in_order(make_queue):
+    queue = make_queue(lambda: 1000.0)
+    ids = [queue.enqueue(f"b{i}", group_id=f"g{i}") for i in range(3)]
+    results = queue.enqueue_batch([{"id": str(i), "body": f"b{i}", "group_id": f"g{i}"} for i in (3, 4)])
+
+    assert [r["id"] for r in results] == ["3", "4"] and all("message_id" in r for r in results)
+    assert queue.depth() == 5
+    got = queue.receive(10, wait_seconds=0, visibility=30)
+    assert [m.body for m in got] == ["b0", "b1", "b2", "b3", "b4"]
+    assert [m.message_id for m in got[:3]] == ids and got[0].group_id == "g0"
+    assert queue.depth() == 0
+    assert queue.ack([m.receipt for m in got]) == []
+    assert queue.receive(10, wait_seconds=0, visibility=30) == []
+
+
+def test_unacked_message_comes_back_after_visibility(make_queue):
+    now = [1000.0]
+    queue = make_queue(lambda: now[0])
+    queue.enqueue("job", group_id="g")
+
+    first = queue.receive(1, wait_seconds=0, visibility=10)
+    assert queue.receive(1, wait_seconds=0, visibility=10) == []
+    now[0] += 11
+    again = queue.receive(1, wait_seconds=0, visibility=10)
+
+    assert [m.message_id for m in again] == [first[0].message_id]
+    assert again[0].receive_count == 2
+
+
+def test_extend_hides_and_zero_releases(make_queue):
+    now = [1000.0]
+    queue = make_queue(lambda: now[0])
+    queue.enqueue("job", group_id="g")
+    receipt = queue.receive(1, wait_seconds=0, visibility=10)[0].receipt
+
+    now[0] += 8
+    assert queue.extend([receipt], 10) == []
+    now[0] += 8
+    assert queue.receive(1, wait_seconds=0, visibility=10) == []    # 16 s after receive
+    assert queue.extend([receipt], 0) == []
+    assert [m.body for m in queue.receive(1, wait_seconds=0, visibility=10)] == ["job"]
+
+
+def test_extend_after_ack_reports_the_receipt(make_queue):
+    queue = make_queue(lambda: 1000.0)
+    queue.enqueue("job", group_id="g")
+    receipt = queue.receive(1, wait_seconds=0, visibility=10)[0].receipt
+    queue.ack([receipt])
+
+    assert queue.extend([receipt], 10) == [receipt]
+
+
+def test_receive_waits_for_an_enqueue(make_queue):
+    queue = make_queue(lambda: 1000.0)
+    threading.Timer(0.1, queue.enqueue, ("late",), {"group_id": "g"}).start()
+
+    assert [m.body for m in queue.receive(1, wait_seconds=5, visibility=10)] == ["late"]
+
+
+def test_sqs_batches_chunk_at_ten_and_report_failures():
+    class FailingSQS(InMemorySQS):
+        sizes = []
+
+        def send_message_batch(self, *, QueueUrl, Entries):
+            self.sizes.append(len(Entries))
+            if any(e["Id"] == "12" for e in Entries):
+                raise RuntimeError("throttled")
+            return super().send_message_batch(QueueUrl=QueueUrl, Entries=Entries)
+
+    sqs = FailingSQS()
+    results = SqsQueue("local", client=sqs).enqueue_batch(
+        [{"id": str(i), "body": "x", "group_id": "g"} for i in range(25)])
+
+    assert sqs.sizes == [10, 10, 5]
+    assert [r["id"] for r in results if "error" in r] == [str(i) for i in range(10, 20)]
+    assert len(sqs) == 15
+
+
+def test_redis_trims_jobs_older_than_ttl_and_deduplicates():
+    now = [1000.0]
+    queue = RedisStreamQueue(FakeRedis(lambda: now[0]), ttl=300, clock=lambda: now[0])
+    first = queue.enqueue("stale", dedup_id="d-1")
+
+    assert first and queue.enqueue("stale", dedup_id="d-1") == first
+    now[0] += 301
+    queue.enqueue("fresh")
+    assert [m.body for m in queue.receive(10, wait_seconds=0, visibility=10)] == ["fresh"]
+
+
+def test_redis_failed_xadd_leaves_no_dedup_key():
+    redis = FakeRedis(lambda: 1000.0)
+    queue = RedisStreamQueue(redis, clock=lambda: 1000.0)
+    real_xadd = redis.xadd
+
+    def down(*a, **kw):
+        raise ConnectionError("redis down")
+
+    redis.xadd = down
+    with pytest.raises(ConnectionError):
+        queue.enqueue("job", dedup_id="d-1")
+    redis.xadd = real_xadd
+
+    message_id = queue.enqueue("job", dedup_id="d-1")
+    assert message_id and [m.message_id for m in queue.receive(10, visibility=10)] == [message_id]
+
+
+def test_queue_from_env(monkeypatch):
+    monkeypatch.setattr(backends, "_default_queue", None)
+    monkeypatch.delenv("QUEUE_REDIS_URL", raising=False)
+    monkeypatch.delenv("REDIS_URL", raising=False)
+
+    assert queue_from_env("memory") is queue_from_env("memory")
+    assert queue_from_env("sqs", "https://q").queue_url == "https://q"
+    with pytest.raises(ValueError):
+        queue_from_env("redis")
+    with pytest.raises(ValueError):
+        queue_from_env("kafka")
+
+# ---------------------------------------------------------------------------
+#  Router -> worker through a configured backend
+# ---------------------------------------------------------------------------
+def test_router_and_worker_share_the_configured_queue(monkeypatch):
+    queue = InProcessQueue()
+    monkeypatch.setattr(handler, "QUEUE_BACKEND", "memory")
+    monkeypatch.setattr(handler, "QUEUE_URL", None)
+    monkeypatch.setattr(handler, "_queue", queue)
+    headers = {"authorization": f"Bearer {jt.make_token(iss=ISS, aud=AUD)}"}
+
+    single = handler.lambda_handler({"headers": headers, "body": json.dumps({"prompt": "one", "idle": 5})}, None)
+    batch = handler.lambda_handler({"routeKey": "POST /infer/batch", "headers": headers,
+                                    "body": json.dumps({"prompts": ["two", "three"], "idle": 5})}, None)
+    assert single["statusCode"] == batch["statusCode"] == 202
+    assert len(json.loads(batch["body"])["queued"]) == 2
+
+    outputs = []
+    stats = Consumer(queue, "memory", JobHandler(), wait_seconds=0.1,
+                     on_result=lambda job, res: outputs.append(res["output"])).run(until_empty=True)
+
+    assert sorted(outputs) == ["echo: one", "echo: three", "echo: two"]
+    assert stats["deleted"] == 3 and len(queue) == 0
@@ -0,0 +1,180 @@
+import json
+import threading
+
+import pytest
+
+import tinyllama.router.handler as handler
+import tinyllama.utils.jwt_tools as jt
+from tinyllama.router import admission
+from tinyllama.router.admission import AdmissionConfig, AdmissionController, QueueDepthProbe
+
+ISS = "https://cognito-idp.eu-central-1.amazonaws.com/eu-central-1_TEST"
+AUD = "local-test-client-id"
+
+
+class DepthSQS:
+    """SQS stand-in with a settable ApproximateNumberOfMessages."""
+
+    def __init__(self, depth):
+        self.depth = depth
+        self.probes = 0
+        self.sent = []
+
+    def get_queue_attributes(self, *, QueueUrl, AttributeNames):
+        assert AttributeNames == ["ApproximateNumberOfMessages"]
+        self.probes += 1
+        return {"Attributes": {"ApproximateNumberOfMessages": str(self.depth)}}
+
+    def send_message(self, **kwargs):
+        self.sent.append(kwargs)
+        return {"MessageId": "m-1"}
+
+    def send_message_batch(self, *, QueueUrl, Entries):
+        self.sent.extend(Entries)
+        return {"Successful": [{"Id": e["Id"], "MessageId": f"m-{e['Id']}"} for e in Entries]}
+
+
+@pytest.fixture
+def router(monkeypatch):
+    def make(depth, **cfg):
+        sqs = DepthSQS(depth)
+        config = AdmissionConfig(**{"soft_limit": 10, "hard_limit": 50, "drain_per_sec": 2.0, **cfg})
+        monkeypatch.setattr(handler, "_sqs", sqs)
+        monkeypatch.setattr(handler, "QUEUE_URL", "https://dummy-queue-url")
+        monkeypatch.setattr(handler, "_admission", AdmissionController(
+            QueueDepthProbe(handler._queue_depth), config=lambda: config))
+        return sqs
+    return make
+
+
+def _event(batch=False):
+    token = jt.make_token(iss=ISS, aud=AUD)
+    event = {"headers": {"authorization": f"Bearer {token}"}}
+    if batch:
+        event["routeKey"] = "POST /infer/batch"
+        event["body"] = json.dumps({"idle": 5, "prompts": ["a", "b"]})
+    else:
+        event["body"] = json.dumps({"prompt": "hi", "idle": 5})
+    return event
+
+
+def test_below_soft_limit_admits_everything(router):
+    sqs = router(depth=3)
+
+    assert handler.lambda_handler(_event(), None)["statusCode"] == 202
+    assert handler.lambda_handler(_event(batch=True), None)["statusCode"] == 202
+    assert sqs.probes == 1                      # second request served from the probe cache
+
+
+def test_soft_limit_sheds_batches_with_429(router):
+    sqs = router(depth=20)
+
+    single = handler.lambda_handler(_event(), None)
+    batch = handler.lambda_handler(_event(batch=True), None)
+
+    assert single["statusCode"] == 202
+    assert batch["statusCode"] == 429
+    assert batch["headers"]["Retry-After"] == "6"        # (20 - 10 + 1) / 2 → 6 s
+    assert len(sqs.sent) == 1
+
+
+def test_hard_limit_rejects_with_503(router):
+    sqs = router(depth=80)
+
+    resp = handler.lambda_handler(_event(), None)
+
+    assert resp["statusCode"] == 503
+    assert json.loads(resp["body"]) == {"error": "queue_full", "retry_after": 16}
+    assert sqs.sent == []
+
+
+def test_retry_after_is_clamped(router):
+    router(depth=10_000, max_retry_after=120)
+
+    resp = handler.lambda_handler(_event(), None)
+
+    assert resp["headers"]["Retry-After"] == "120"
+
+
+def test_probe_is_rate_limited_and_fails_open():
+    now = [0.0]
+    calls = []
+
+    def fetch():
+        calls.append(now[0])
+        raise RuntimeError("throttled")
+
+    probe = QueueDepthProbe(fetch, ttl=5, clock=lambda: now[0])
+    for _ in range(10):
+        assert probe.depth() is None
+    now[0] = 6
+    probe.depth()
+
+    assert calls == [0.0, 6]
+    assert admission.decide(None, AdmissionConfig())[0] == admission.ADMIT
+
+
+def test_thresholds_come_from_ssm_with_env_defaults():
+    params = {"admission_soft_limit": "7", "admission_drain_per_sec": "0.5"}
+
+    def get(name):
+        return params[name]                     # KeyError for the rest → defaults
+
+    cfg = admission.load_config(get)
+
+    assert (cfg.soft_limit, cfg.hard_limit, cfg.drain_per_sec) == (7, 500, 0.5)
+
+
+def test_expired_config_reloads_in_the_background():
+    now = [0.0]
+    release = threading.Event()
+    loads = []
+
+    def loader():
+        loads.append(now[0])
+        if len(loads) > 1:
+            release.wait(5)
+        return AdmissionConfig(soft_limit=len(loads))
+
+    cached = admission._CachedConfig(loader, ttl=60, clock=lambda: now[0])
+    assert cached.get().soft_limit == 1
+    now[0] = 61
+    for _ in range(5):                          # served stale, one reload in flight
+        assert cached.get().soft_limit == 1
+    release.set()
+    for _ in range(100):
+        if cached.get().soft_limit == 2:
+            break
+        threading.Event().wait(0.01)
+
+    assert cached.get().soft_limit == 2
+    assert loads == [0.0, 61]
+
+
+def test_missing_parameters_are_not_refetched_every_reload():
+    now = [0.0]
+    calls = []
+
+    def get(name):
+        calls.append(name)
+        if name != "admission_soft_limit":
+            raise KeyError(name)
+        return "7"
+
+    lookup = admission._MissingAware(get, ttl=600, clock=lambda: now[0])
+    for now[0] in (0.0, 60.0, 120.0):
+        assert admission.load_config(lookup).soft_limit == 7
+
+    assert calls.count("admission_soft_limit") == 3
+    assert calls.count("admission_hard_limit") == 1
+    now[0] = 600.0
+    admission.load_config(lookup)
+    assert calls.count("admission_hard_limit") == 2
+
+
+def test_zero_limits_disable_the_probe():
+    probe = QueueDepthProbe(lambda: 1 / 0)
+    ctl = AdmissionController(probe, config=lambda: AdmissionConfig(soft_limit=0, hard_limit=0))
+
+    assert ctl.check()[0] == admission.ADMIT
+    assert probe.probes == 0
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+import tinyllama.router.handler as handler
+import tinyllama.utils.jwt_tools as jt
+
+ISS = "https://cognito-idp.eu-central-1.amazonaws.com/eu-central-1_TEST"
+AUD = "local-test-client-id"
+
+
+class FakeSQS:
+    """Local SQS stand-in: records batches, can fail selected entry ids."""
+
+    def __init__(self, fail_ids=()):
+        self.batches = []
+        self.fail_ids = set(fail_ids)
+
+    def send_message_batch(self, *, QueueUrl, Entries):
+        assert len(Entries) <= 10
+        self.batches.append(Entries)
+        ok = [e for e in Entries if e["Id"] not in self.fail_ids]
+        bad = [e for e in Entries if e["Id"] in self.fail_ids]
+        return {
+            "Successful": [{"Id": e["Id"], "MessageId": f"m-{e['Id']}"} for e in ok],
+            "Failed": [{"Id": e["Id"], "Code": "InternalError", "SenderFault": False,
+                        "Message": "boom"} for e in bad],
+        }
+
+
+@pytest.fixture
+def sqs(monkeypatch):
+    fake = FakeSQS()
+    monkeypatch.setattr(handler, "_sqs", fake)
+    monkeypatch.setattr(handler, "QUEUE_URL", "https://dummy-queue-url")
+    return fake
+
+
+def _event(body, token=None):
+    token = token or jt.make_token(iss=ISS, aud=AUD)
+    return {
+        "routeKey": "POST /infer/batch",
+        "headers": {"authorization": f"Bearer {token}"},
+        "body": json.dumps(body),
+    }
+
+
+def test_batch_chunks_of_ten_and_verifies_once(sqs, monkeypatch):
+    verified = []
+    real_verify = handler.verify_jwt
+    monkeypatch.setattr(handler, "verify_jwt", lambda t: verified.append(t) or real_verify(t))
+
+    resp = handler.lambda_handler(_event({"idle": 5, "prompts": [f"p{i}" for i in range(23)]}))
+    body = json.loads(resp["body"])
+
+    assert resp["statusCode"] == 202
+    assert [len(b) for b in sqs.batches] == [10, 10, 3]
+    assert len(verified) == 1
+    assert [q["messageId"] for q in body["queued"]] == [f"m-{i}" for i in range(23)]
+    request_ids = {json.loads(e["MessageBody"])["request_id"] for b in sqs.batches for e in b}
+    assert len(request_ids) == 23                      # FIFO content dedup must not merge items
+
+
+def test_batch_reports_partial_failures(sqs):
+    sqs.fail_ids = {"1"}
+    resp = handler.lambda_handler(_event({"idle": 5, "prompts": ["ok", "sqs-fails", "", {"prompt": "x", "idle": 3}]}))
+    body = json.loads(resp["body"])
+
+    assert resp["statusCode"] == 202
+    assert body["status"] == "partial"
+    assert [q["index"] for q in body["queued"]] == [0, 3]
+    assert [(f["index"], f["error"]) for f in body["failed"]] == [
+        (1, "enqueue_failed"), (2, "schema_invalid")]
+
+
+def test_batch_items_carry_generation_params_and_cache_opt_out(sqs):
+    resp = handler.lambda_handler(_event({
+        "idle": 5, "temperature": 0.2, "cache": False,
+        "prompts": ["a", {"prompt": "b", "temperature": 0.9, "max_tokens": 16, "cache": True}],
+    }))
+    bodies = [json.loads(e["MessageBody"]) for b in sqs.batches for e in b]
+
+    assert resp["statusCode"] == 202
+    assert (bodies[0]["temperature"], bodies[0]["cache"]) == (0.2, False)
+    assert (bodies[1]["temperature"], bodies[1]["max_tokens"]) == (0.9, 16)
+    assert "cache" not in bodies[1]
+
+
+def test_batch_rejects_oversized_request(sqs, monkeypatch):
+    monkeypatch.setattr(handler, "MAX_BATCH_PROMPTS", 3)
+    resp = handler.lambda_handler(_event({"idle": 5, "prompts": ["a"] * 4}))
+
+    assert resp["statusCode"] == 400
+    assert sqs.batches == []
+
+
+def test_batch_requires_valid_token(sqs):
+    resp = handler.lambda_handler(_event({"idle": 5, "prompts": ["a"]}, token="abc.def.ghi"))
+
+    assert resp["statusCode"] in (401, 403)
+    assert sqs.batches == []
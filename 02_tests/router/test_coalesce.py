@@ -0,0 +1,236 @@
+import json
+
+import pytest
+
+import tinyllama.router.handler as handler
+import tinyllama.utils.jwt_tools as jt
+from tinyllama.router.coalesce import DynamoDbCoalescer, InMemoryCoalescer
+from tinyllama.utils import envelope, metrics
+from tinyllama.utils.envelope import JobVerifier
+from tinyllama.utils.promptkey import normalize_prompt, request_key
+from tinyllama.utils.results import FileResultStore
+from tinyllama.worker.consumer import Consumer
+from tinyllama.worker.inference import JobHandler, ResultWriter
+from tinyllama.worker.local_sqs import InMemorySQS
+
+ISS = "https://cognito-idp.eu-central-1.amazonaws.com/eu-central-1_TEST"
+AUD = "local-test-client-id"
+KEY = "0123456789abcdef0123456789abcdef"
+
+
+class Ctx:
+    def __init__(self, request_id):
+        self.aws_request_id = request_id
+
+
+class CountingSQS:
+    def __init__(self, fail=False):
+        self.sent = []
+        self.fail = fail
+
+    def send_message(self, **kwargs):
+        if self.fail:
+            raise RuntimeError("sqs down")
+        self.sent.append(kwargs)
+        return {"MessageId": f"m-{len(self.sent)}"}
+
+
+class _ConditionFailed(Exception):
+    response = {"Error": {"Code": "ConditionalCheckFailedException"}}
+
+
+class FakeDynamoDB:
+    """The put / get / update(ADD) / conditional delete calls the coalescer makes."""
+
+    def __init__(self):
+        self.items = {}
+
+    def put_item(self, *, TableName, Item, ConditionExpression, ExpressionAttributeValues):
+        old = self.items.get(Item["pk"]["S"])
+        if old is not None and float(old["expires_at"]["N"]) > float(ExpressionAttributeValues[":now"]["N"]):
+            raise _ConditionFailed()
+        self.items[Item["pk"]["S"]] = dict(Item)
+
+    def get_item(self, *, TableName, Key, ConsistentRead=False):
+        item = self.items.get(Key["pk"]["S"])
+        return {"Item": dict(item)} if item else {}
+
+    def update_item(self, *, TableName, Key, UpdateExpression, ExpressionAttributeValues):
+        item = self.items.setdefault(Key["pk"]["S"], {"pk": Key["pk"], "subs": {"SS": []}})
+        item["subs"] = {"SS": sorted(set(item["subs"]["SS"]) | set(ExpressionAttributeValues[":sub"]["SS"]))}
+        item["expires_at"] = ExpressionAttributeValues[":exp"]
+
+    def delete_item(self, *, TableName, Key, ConditionExpression, ExpressionAttributeValues):
+        item = self.items.get(Key["pk"]["S"])
+        if item is None or item["leader"] != ExpressionAttributeValues[":rid"]:
+            raise _ConditionFailed()
+        del self.items[Key["pk"]["S"]]
+
+
+@pytest.fixture(params=["memory", "dynamodb"])
+def make_store(request):
+    def make(window=10, clock=lambda: 1000.0):
+        if request.param == "memory":
+            return InMemoryCoalescer(window=window, clock=clock)
+        return DynamoDbCoalescer("tlfif-test-coalesce", client=FakeDynamoDB(), window=window, clock=clock)
+    return make
+
+
+def test_repeat_within_window_attaches_to_leader(make_store):
+    now = [1000.0]
+    store = make_store(clock=lambda: now[0])
+
+    assert store.join("k", "r-1", "alice") is None
+    now[0] += 5
+    assert store.join("k", "r-2", "bob") == "r-1"
+    assert store.is_reader("r-1", "bob") and not store.is_reader("r-1", "carol")
+    now[0] += 6
+    assert store.join("k", "r-3", "carol") is None          # window closed: new leader
+
+
+def test_release_lets_the_next_request_lead(make_store):
+    store = make_store()
+    store.join("k", "r-1", "alice")
+
+    store.release("k", "r-2")                               # not the leader: no-op
+    assert store.join("k", "r-3", "bob") == "r-1"
+    store.release("k", "r-1")
+    assert store.join("k", "r-4", "bob") is None
+
+
+def test_key_normalises_whitespace_but_not_case_or_params():
+    assert normalize_prompt("  What is\n\tTinyLlama?  ") == "What is TinyLlama?"
+    assert request_key("What  is it?") == request_key(" What is it?\n")
+    assert request_key("what is it?") != request_key("What is it?")
+    assert request_key("hi", {"temperature": 0.2}) != request_key("hi", {"temperature": 0.9})
+    assert request_key("hi", model="a") != request_key("hi", model="b")
+
+# ---------------------------------------------------------------------------
+#  Router
+# ---------------------------------------------------------------------------
+@pytest.fixture
+def coalescer(monkeypatch):
+    store = InMemoryCoalescer(window=10)
+    monkeypatch.setattr(handler, "_coalescer", store)
+    monkeypatch.setattr(handler, "QUEUE_URL", "https://dummy-queue-url")
+    return store
+
+
+@pytest.fixture
+def records():
+    records = []
+    previous = metrics.set_sink(records.append)
+    yield records
+    metrics.set_sink(previous)
+
+
+def _post(prompt, request_id, **extra):
+    token = jt.make_token(iss=ISS, aud=AUD)
+    return handler.lambda_handler({"headers": {"authorization": f"Bearer {token}"},
+                                   "body": json.dumps({"prompt": prompt, "idle": 5, **extra})},
+                                  Ctx(request_id))
+
+
+def test_router_enqueues_once_and_reports_work_saved(coalescer, records, monkeypatch):
+    sqs = CountingSQS()
+    monkeypatch.setattr(handler, "_sqs", sqs)
+
+    first = _post("Summarise the README", "r-1")
+    second = _post("Summarise  the README\n", "r-2")
+
+    assert first["statusCode"] == second["statusCode"] == 202
+    assert json.loads(second["body"]) == {"status": "queued", "requestId": "r-1", "coalesced": True}
+    assert len(sqs.sent) == 1
+    assert records[-1]["coalesced"] == 1 and records[-1]["coalesced_prompt_tokens"] > 0
+    assert "enqueue_ms" not in records[-1]
+
+
+def test_different_generation_params_are_not_merged(coalescer, monkeypatch):
+    sqs = CountingSQS()
+    monkeypatch.setattr(handler, "_sqs", sqs)
+
+    _post("hi", "r-1", temperature=0.2)
+    _post("hi", "r-2", temperature=0.9)
+
+    assert len(sqs.sent) == 2
+
+
+def test_failed_enqueue_does_not_leave_a_leader(coalescer, monkeypatch):
+    monkeypatch.setattr(handler, "_sqs", CountingSQS(fail=True))
+    assert _post("hi", "r-1")["statusCode"] == 502
+
+    sqs = CountingSQS()
+    monkeypatch.setattr(handler, "_sqs", sqs)
+    assert json.loads(_post("hi", "r-2")["body"])["requestId"] == "r-2"
+    assert len(sqs.sent) == 1
+
+
+def test_store_outage_fails_open(coalescer, monkeypatch):
+    sqs = CountingSQS()
+    monkeypatch.setattr(handler, "_sqs", sqs)
+    monkeypatch.setattr(coalescer, "join", lambda *a: (_ for _ in ()).throw(RuntimeError("down")))
+
+    _post("hi", "r-1")
+    _post("hi", "r-2")
+
+    assert len(sqs.sent) == 2
+
+
+def test_disabled_by_default(monkeypatch):
+    sqs = CountingSQS()
+    monkeypatch.setattr(handler, "_sqs", sqs)
+    monkeypatch.setattr(handler, "QUEUE_URL", "https://dummy-queue-url")
+
+    _post("hi", "r-1")
+    _post("hi", "r-2")
+
+    assert handler._coalescer is False and len(sqs.sent) == 2
+
+
+def test_every_user_reads_the_single_result(coalescer, tmp_path, monkeypatch):
+    store = FileResultStore(str(tmp_path))
+    sqs = InMemorySQS()
+    monkeypatch.setattr(handler, "_result_store", store)
+    monkeypatch.setattr(handler, "_sqs", sqs)
+    monkeypatch.setattr(handler, "QUEUE_URL", "local")
+    monkeypatch.setattr(envelope, "signing_key", lambda: KEY)
+    token = jt.make_token(iss=ISS, aud=AUD)
+    users = ["alice", "bob", "carol"]
+
+    for n, user in enumerate(users):
+        monkeypatch.setattr(handler, "verify_jwt", lambda t, user=user: {"sub": user, "exp": 2_000_000_000})
+        _post("canned smoke-test prompt", f"r-{n}")
+    stats = Consumer(sqs, "local", JobHandler(), wait_seconds=0.1, on_result=ResultWriter(store),
+                     verifier=JobVerifier(lambda: envelope._key_map(KEY))).run(until_empty=True)
+
+    assert stats["processed"] == 1
+    for user in users + ["mallory"]:
+        monkeypatch.setattr(handler, "verify_jwt", lambda t, user=user: {"sub": user, "exp": 2_000_000_000})
+        resp = handler.lambda_handler({"rawPath": "/jobs/r-0", "requestContext": {"http": {"method": "GET"}},
+                                       "headers": {"authorization": f"Bearer {token}"},
+                                       "queryStringParameters": {"wait": "0"}}, None)
+        served = resp["statusCode"] == 200
+        assert served == (user != "mallory")
+        if served:
+            assert json.loads(resp["body"])["output"] == "echo: canned smoke-test prompt"
+
+
+class RacingDynamoDB:
+    """Every put loses the condition race and every read finds the item gone."""
+
+    def __init__(self):
+        self.puts = 0
+
+    def put_item(self, **kwargs):
+        self.puts += 1
+        raise _ConditionFailed()
+
+    def get_item(self, **kwargs):
+        return {}
+
+
+def test_join_gives_up_after_one_retry():
+    client = RacingDynamoDB()
+    with pytest.raises(RuntimeError):
+        DynamoDbCoalescer("t", client=client, window=10).join("k", "r-1", "alice")
+    assert client.puts == 2                 # not until RecursionError
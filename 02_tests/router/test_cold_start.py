@@ -0,0 +1,32 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[2] / "01_src"
+
+PROBE = """
+import json, sys
+import tinyllama.router.handler as h
+print(json.dumps({
+    "boto3": "boto3" in sys.modules,
+    "jwt_tools": "tinyllama.utils.jwt_tools" in sys.modules,
+    "sqs": h._sqs is not None,
+    "init_ms": h.INIT_MS,
+}))
+"""
+
+
+def test_handler_import_is_lazy():
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    env.pop("AWS_DEFAULT_REGION", None)          # no AWS config needed to import
+    env.pop("AWS_REGION", None)
+    out = subprocess.run([sys.executable, "-c", PROBE], env=env,
+                         capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+
+    assert result["boto3"] is False
+    assert result["jwt_tools"] is False
+    assert result["sqs"] is False
+    assert result["init_ms"] > 0
@@ -0,0 +1,109 @@
+import json
+from collections import deque
+
+import pytest
+
+import tinyllama.router.handler as handler
+import tinyllama.utils.jwt_tools as jt
+from tinyllama.router import grouping
+
+ISS = "https://cognito-idp.eu-central-1.amazonaws.com/eu-central-1_TEST"
+AUD = "local-test-client-id"
+
+
+class FifoQueue:
+    """
+    Local job-queue.fifo stand-in: messages of a group are delivered in
+    order, and a group with a message in flight delivers nothing else.
+    """
+
+    def __init__(self):
+        self.messages = deque()
+        self.in_flight_groups = set()
+
+    def send_message_batch(self, *, QueueUrl, Entries):
+        for e in Entries:
+            self.messages.append((e["MessageGroupId"], json.loads(e["MessageBody"])))
+        return {"Successful": [{"Id": e["Id"], "MessageId": f"m-{e['Id']}"} for e in Entries]}
+
+    def receive(self):
+        blocked = set(self.in_flight_groups)
+        for i, (group, body) in enumerate(self.messages):
+            if group not in blocked:
+                del self.messages[i]
+                self.in_flight_groups.add(group)
+                return group, body
+            blocked.add(group)                  # keep per-group order
+        return None
+
+    def delete(self, group):
+        self.in_flight_groups.discard(group)
+
+
+def simulate(queue, workers, job_ticks=1):
+    """Run *workers* slots in lock-step ticks; return (ticks, peak concurrency)."""
+    running, ticks, peak = [], 0, 0
+    while queue.messages or running:
+        while len(running) < workers:
+            got = queue.receive()
+            if got is None:
+                break
+            running.append([got[0], job_ticks])
+        peak = max(peak, len(running))
+        ticks += 1
+        for job in running:
+            job[1] -= 1
+        for job in [j for j in running if j[1] == 0]:
+            running.remove(job)
+            queue.delete(job[0])
+    return ticks, peak
+
+
+def _enqueue(monkeypatch, strategy, prompts=20, shards=4):
+    fifo = FifoQueue()
+    monkeypatch.setattr(handler, "_sqs", fifo)
+    monkeypatch.setattr(handler, "QUEUE_URL", "https://dummy-queue-url")
+    monkeypatch.setattr(handler, "GROUP_STRATEGY", strategy)
+    monkeypatch.setattr(handler, "GROUP_SHARDS", shards)
+    monkeypatch.setattr(handler, "_rate_limiter", False)
+    token = jt.make_token(iss=ISS, aud=AUD)
+    resp = handler.lambda_handler({
+        "routeKey": "POST /infer/batch",
+        "headers": {"authorization": f"Bearer {token}"},
+        "body": json.dumps({"idle": 5, "prompts": [f"p{i}" for i in range(prompts)]}),
+    })
+    assert resp["statusCode"] == 202
+    return fifo
+
+
+def test_strategy_is_recorded_in_message(monkeypatch):
+    fifo = _enqueue(monkeypatch, grouping.SHARD, prompts=3)
+
+    groups = {g for g, _ in fifo.messages}
+    assert all(body["group_strategy"] == "shard" for _, body in fifo.messages)
+    assert all(g.startswith("test-user#") for g in groups)
+
+
+def test_group_id_strategies():
+    assert grouping.group_id("user", "alice", "r-1") == "alice"
+    assert grouping.group_id("request", "alice", "r-1") == "r-1"
+    shard = grouping.group_id("shard", "alice", "r-1", shards=4)
+    assert shard == grouping.group_id("shard", "alice", "r-1", shards=4)
+    assert shard in {f"alice#{i}" for i in range(4)}
+    with pytest.raises(ValueError):
+        grouping.group_id("round-robin", "alice", "r-1")
+
+
+def test_worker_concurrency_by_strategy(monkeypatch):
+    results = {}
+    for strategy in grouping.STRATEGIES:
+        fifo = _enqueue(monkeypatch, strategy, prompts=20, shards=4)
+        results[strategy] = simulate(fifo, workers=8)
+
+    (user_ticks, user_peak) = results["user"]
+    (shard_ticks, shard_peak) = results["shard"]
+    (req_ticks, req_peak) = results["request"]
+
+    assert (user_ticks, user_peak) == (20, 1)           # strictly sequential
+    assert 1 < shard_peak <= 4 and shard_ticks < user_ticks
+    assert (req_ticks, req_peak) == (3, 8)              # bounded only by the worker
@@ -41,6 +41,8 @@ def _patch_ssm(monkeypatch):
             return "test-pool"
         if name == "COGNITO_CLIENT_ID":
             return AUD
+        if name == "job_hmac_key":
+            return "local-test-job-envelope-hmac-key"
         raise KeyError(name)
     monkeypatch.setattr(_ssm, "get_id", _fake_get_id, raising=True)
 
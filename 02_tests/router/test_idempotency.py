@@ -0,0 +1,229 @@
+import json
+
+import pytest
+
+import tinyllama.router.handler as handler
+import tinyllama.utils.jwt_tools as jt
+from tinyllama.router.idempotency import (
+    DynamoDbIdempotencyStore, InMemoryIdempotencyStore, fingerprint,
+)
+
+ISS = "https://cognito-idp.eu-central-1.amazonaws.com/eu-central-1_TEST"
+AUD = "local-test-client-id"
+
+
+class Ctx:
+    def __init__(self, request_id):
+        self.aws_request_id = request_id
+
+
+class CountingSQS:
+    def __init__(self, fail=False):
+        self.sent = []
+        self.fail = fail
+
+    def send_message(self, **kwargs):
+        if self.fail:
+            raise RuntimeError("sqs down")
+        self.sent.append(kwargs)
+        return {"MessageId": f"m-{len(self.sent)}"}
+
+
+class _ConditionFailed(Exception):
+    response = {"Error": {"Code": "ConditionalCheckFailedException"}}
+
+
+class FakeDynamoDB:
+    """Local stand-in for the low-level DynamoDB client calls the store uses."""
+
+    def __init__(self):
+        self.items = {}
+
+    def put_item(self, *, TableName, Item, ConditionExpression, ExpressionAttributeValues):
+        assert ConditionExpression == "attribute_not_exists(pk) OR expires_at < :now"
+        old = self.items.get(Item["pk"]["S"])
+        now = int(ExpressionAttributeValues[":now"]["N"])
+        if old is not None and int(old["expires_at"]["N"]) >= now:
+            raise _ConditionFailed()
+        self.items[Item["pk"]["S"]] = dict(Item)
+
+    def get_item(self, *, TableName, Key, ConsistentRead):
+        item = self.items.get(Key["pk"]["S"])
+        return {"Item": dict(item)} if item else {}
+
+    def update_item(self, *, TableName, Key, UpdateExpression,
+                    ExpressionAttributeNames, ExpressionAttributeValues):
+        item = self.items.setdefault(Key["pk"]["S"], {"pk": Key["pk"]})     # UpdateItem upserts
+        item["state"] = ExpressionAttributeValues[":done"]
+        item["response"] = ExpressionAttributeValues[":resp"]
+        item["fingerprint"] = ExpressionAttributeValues[":fp"]
+        item["expires_at"] = ExpressionAttributeValues[":exp"]
+
+    def delete_item(self, *, TableName, Key):
+        self.items.pop(Key["pk"]["S"], None)
+
+
+@pytest.fixture(params=["memory", "dynamodb"])
+def store(request, monkeypatch):
+    if request.param == "memory":
+        s = InMemoryIdempotencyStore()
+    else:
+        s = DynamoDbIdempotencyStore("tlfif-test-idempotency", client=FakeDynamoDB())
+    monkeypatch.setattr(handler, "_idem_store", s)
+    monkeypatch.setattr(handler, "QUEUE_URL", "https://dummy-queue-url")
+    return s
+
+
+@pytest.fixture
+def sqs(monkeypatch):
+    fake = CountingSQS()
+    monkeypatch.setattr(handler, "_sqs", fake)
+    return fake
+
+
+def _event(token, key="key-1", prompt="hi"):
+    headers = {"authorization": f"Bearer {token}"}
+    if key is not None:
+        headers["Idempotency-Key"] = key
+    return {"headers": headers, "body": json.dumps({"prompt": prompt, "idle": 5})}
+
+
+def test_retry_replays_first_response_without_enqueue(store, sqs):
+    token = jt.make_token(iss=ISS, aud=AUD)
+
+    first = handler.lambda_handler(_event(token), Ctx("attempt-1"))
+    retry = handler.lambda_handler(_event(token), Ctx("attempt-2"))
+
+    assert first["statusCode"] == retry["statusCode"] == 202
+    assert retry["body"] == first["body"]
+    assert retry["headers"]["Idempotent-Replayed"] == "true"
+    assert len(sqs.sent) == 1
+    assert len(sqs.sent[0]["MessageDeduplicationId"]) == 64
+
+
+def test_keys_are_scoped_per_user(store, sqs, monkeypatch):
+    users = iter(["alice", "bob"])
+    monkeypatch.setattr(handler, "verify_jwt", lambda token: {"sub": next(users), "exp": 2_000_000_000})
+    token = jt.make_token(iss=ISS, aud=AUD)
+
+    handler.lambda_handler(_event(token), Ctx("a"))
+    handler.lambda_handler(_event(token), Ctx("b"))
+
+    assert len(sqs.sent) == 2
+
+
+def test_same_key_different_body_is_rejected(store, sqs):
+    token = jt.make_token(iss=ISS, aud=AUD)
+    handler.lambda_handler(_event(token, prompt="one"), Ctx("a"))
+
+    resp = handler.lambda_handler(_event(token, prompt="two"), Ctx("b"))
+
+    assert resp["statusCode"] == 422
+    assert len(sqs.sent) == 1
+
+
+def test_pending_key_returns_conflict(store, sqs):
+    token = jt.make_token(iss=ISS, aud=AUD)
+    claims = handler.verify_jwt(token)
+    event = _event(token)
+    store.claim(claims["sub"], "key-1", fingerprint("", event["body"]))
+
+    resp = handler.lambda_handler(event, Ctx("b"))
+
+    assert resp["statusCode"] == 409
+    assert resp["headers"]["Retry-After"] == "1"
+    assert sqs.sent == []
+
+
+def test_failed_enqueue_releases_key(store, monkeypatch):
+    token = jt.make_token(iss=ISS, aud=AUD)
+    monkeypatch.setattr(handler, "_sqs", CountingSQS(fail=True))
+    assert handler.lambda_handler(_event(token), Ctx("a"))["statusCode"] == 502
+
+    ok = CountingSQS()
+    monkeypatch.setattr(handler, "_sqs", ok)
+    assert handler.lambda_handler(_event(token), Ctx("b"))["statusCode"] == 202
+    assert len(ok.sent) == 1
+
+
+def test_without_key_every_request_is_enqueued(store, sqs):
+    token = jt.make_token(iss=ISS, aud=AUD)
+    handler.lambda_handler(_event(token, key=None), Ctx("a"))
+    handler.lambda_handler(_event(token, key=None), Ctx("b"))
+
+    assert len(sqs.sent) == 2
+    assert "MessageDeduplicationId" not in sqs.sent[0]
+
+
+def test_invalid_key_is_400(store, sqs):
+    token = jt.make_token(iss=ISS, aud=AUD)
+    resp = handler.lambda_handler(_event(token, key="x" * 300), Ctx("a"))
+
+    assert resp["statusCode"] == 400
+    assert sqs.sent == []
+
+
+def test_store_outage_fails_open(monkeypatch, sqs):
+    class Broken:
+        def claim(self, *a):
+            raise RuntimeError("dynamodb unavailable")
+
+    monkeypatch.setattr(handler, "_idem_store", Broken())
+    monkeypatch.setattr(handler, "QUEUE_URL", "https://dummy-queue-url")
+    token = jt.make_token(iss=ISS, aud=AUD)
+
+    resp = handler.lambda_handler(_event(token), Ctx("a"))
+
+    assert resp["statusCode"] == 202
+    assert "MessageDeduplicationId" in sqs.sent[0]
+
+
+def test_expired_pending_claim_can_be_reclaimed():
+    now = [1000.0]
+    store = DynamoDbIdempotencyStore("t", client=FakeDynamoDB(), pending_ttl=30, clock=lambda: now[0])
+
+    assert store.claim("u", "k", "fp") is None
+    assert store.claim("u", "k", "fp")["state"] == "pending"
+    now[0] += 31
+    assert store.claim("u", "k", "fp") is None
+
+
+def test_response_survives_eviction_of_its_pending_claim(sqs, monkeypatch):
+    store = InMemoryIdempotencyStore(maxsize=1)
+    monkeypatch.setattr(handler, "_idem_store", store)
+    monkeypatch.setattr(handler, "QUEUE_URL", "https://dummy-queue-url")
+    real_send = sqs.send_message
+
+    def send_and_evict(**kwargs):
+        store.claim("someone-else", "other-key", "fp")          # LRU drops our pending entry
+        return real_send(**kwargs)
+
+    monkeypatch.setattr(sqs, "send_message", send_and_evict)
+    token = jt.make_token(iss=ISS, aud=AUD)
+    first = handler.lambda_handler(_event(token), Ctx("req-1"))
+    retry = handler.lambda_handler(_event(token), Ctx("req-2"))
+
+    assert first["statusCode"] == retry["statusCode"] == 202
+    assert retry["headers"]["Idempotent-Replayed"] == "true"
+    assert len(store) == 1 and len(sqs.sent) == 1
+
+
+class RacingDynamoDB:
+    """Every put loses the condition race and every read finds the item gone."""
+
+    def __init__(self):
+        self.puts = 0
+
+    def put_item(self, **kwargs):
+        self.puts += 1
+        raise _ConditionFailed()
+
+    def get_item(self, **kwargs):
+        return {}
+
+
+def test_claim_gives_up_after_one_retry():
+    client = RacingDynamoDB()
+    with pytest.raises(RuntimeError):
+        DynamoDbIdempotencyStore("t", client=client).claim("alice", "k", "fp")
+    assert client.puts == 2                 # not until RecursionError
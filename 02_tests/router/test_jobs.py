@@ -0,0 +1,191 @@
+import json
+import threading
+import time
+
+import pytest
+
+import tinyllama.router.handler as handler
+import tinyllama.utils.jwt_tools as jt
+from tinyllama.utils import results
+from tinyllama.utils.envelope import JobVerifier
+from tinyllama.utils.results import FileResultStore
+from tinyllama.worker.consumer import Consumer
+from tinyllama.worker.inference import JobHandler, ResultWriter
+from tinyllama.worker.local_sqs import InMemorySQS
+
+ISS = "https://cognito-idp.eu-central-1.amazonaws.com/eu-central-1_TEST"
+AUD = "local-test-client-id"
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    store = FileResultStore(str(tmp_path))
+    monkeypatch.setattr(handler, "_result_store", store)
+    return store
+
+
+def _get(request_id, wait=None, token=None):
+    token = token or jt.make_token(iss=ISS, aud=AUD)
+    event = {
+        "rawPath": f"/jobs/{request_id}",
+        "requestContext": {"http": {"method": "GET"}},
+        "headers": {"authorization": f"Bearer {token}"},
+    }
+    if wait is not None:
+        event["queryStringParameters"] = {"wait": str(wait)}
+    return handler.lambda_handler(event, None)
+
+
+def test_finished_job_is_returned(store):
+    store.put("r-1", results.record("r-1", "test-user", output="hello"))
+
+    resp = _get("r-1")
+
+    body = json.loads(resp["body"])
+    assert resp["statusCode"] == 200
+    assert body["status"] == "done" and body["output"] == "hello" and "sub" not in body
+
+
+def test_long_poll_returns_as_soon_as_the_result_lands(store):
+    threading.Timer(0.3, store.put, ("r-2", results.record("r-2", "test-user", output="late"))).start()
+    started = time.monotonic()
+
+    resp = _get("r-2", wait=10)
+
+    assert resp["statusCode"] == 200 and json.loads(resp["body"])["output"] == "late"
+    assert time.monotonic() - started < 2
+
+
+def test_pending_after_the_wait_window(store):
+    started = time.monotonic()
+    resp = _get("r-3", wait=1)
+
+    assert resp["statusCode"] == 202 and json.loads(resp["body"])["status"] == "pending"
+    assert 1 <= time.monotonic() - started < 3
+
+
+def test_wait_is_capped(store, monkeypatch):
+    monkeypatch.setattr(handler, "JOB_POLL_MAX_SECONDS", 0)
+
+    assert _get("r-4", wait=600)["statusCode"] == 202
+
+
+def test_other_users_result_is_not_disclosed(store):
+    store.put("r-5", results.record("r-5", "someone-else", output="secret"))
+
+    resp = _get("r-5", wait=0)
+
+    assert resp["statusCode"] == 202 and "secret" not in resp["body"]
+
+
+def test_result_without_owner_is_not_disclosed(store):
+    store.put("r-7", results.record("r-7", None, output="secret"))
+
+    resp = _get("r-7", wait=0)
+
+    assert resp["statusCode"] == 202 and "secret" not in resp["body"]
+
+
+def _job_sqs(monkeypatch, token):
+    sqs = InMemorySQS()
+    monkeypatch.setattr(handler, "_sqs", sqs)
+    monkeypatch.setattr(handler, "QUEUE_URL", "local")
+    resp = handler.lambda_handler({"headers": {"authorization": f"Bearer {token}"},
+                                   "body": json.dumps({"prompt": "ping", "idle": 5})}, None)
+    return sqs, json.loads(resp["body"])["requestId"]
+
+
+def test_job_failing_its_last_delivery_records_the_error(store, monkeypatch):
+    token = jt.make_token(iss=ISS, aud=AUD)
+    sqs, request_id = _job_sqs(monkeypatch, token)
+
+    def broken(job):
+        raise RuntimeError("model crashed")
+
+    writer = ResultWriter(store)
+    consumer = Consumer(sqs, "local", broken, wait_seconds=0.1, failure_visibility=0, max_receives=2,
+                        verifier=JobVerifier(), on_result=writer, on_failure=writer.failed)
+    runner = threading.Thread(target=consumer.run)
+    runner.start()
+    result = _get(request_id, wait=5, token=token)
+    consumer.stop()
+    runner.join(5)
+
+    body = json.loads(result["body"])
+    assert result["statusCode"] == 200 and body["status"] == "failed" and body["error"] == "model crashed"
+    assert consumer.stats["failed"] >= 2
+
+
+def test_failed_result_write_keeps_the_message(store, monkeypatch):
+    token = jt.make_token(iss=ISS, aud=AUD)
+    sqs, request_id = _job_sqs(monkeypatch, token)
+    writes = []
+
+    def flaky_writer(job, result):
+        writes.append(job.receive_count)
+        if len(writes) == 1:
+            raise OSError("s3 down")
+        ResultWriter(store)(job, result)
+
+    stats = Consumer(sqs, "local", JobHandler(), wait_seconds=0.1, failure_visibility=0,
+                     verifier=JobVerifier(), on_result=flaky_writer).run(until_empty=True)
+
+    assert writes == [1, 2] and stats["result_failed"] == 1 and len(sqs) == 0
+    assert json.loads(_get(request_id, wait=0, token=token)["body"])["output"] == "echo: ping"
+
+
+def test_invalid_id_and_missing_store(store, monkeypatch):
+    assert _get("..", wait=0)["statusCode"] == 400
+    monkeypatch.setattr(handler, "_result_store", False)
+    assert _get("r-6", wait=0)["statusCode"] == 500
+
+
+def test_missing_token_is_rejected(store):
+    event = {"rawPath": "/jobs/r-1", "requestContext": {"http": {"method": "GET"}}, "headers": {}}
+
+    assert handler.lambda_handler(event, None)["statusCode"] == 401
+
+
+def test_enqueue_consume_and_fetch_end_to_end(store, monkeypatch):
+    sqs = InMemorySQS()
+    monkeypatch.setattr(handler, "_sqs", sqs)
+    monkeypatch.setattr(handler, "QUEUE_URL", "local")
+    token = jt.make_token(iss=ISS, aud=AUD)
+    resp = handler.lambda_handler({"headers": {"authorization": f"Bearer {token}"},
+                                   "body": json.dumps({"prompt": "ping", "idle": 5})}, None)
+    request_id = json.loads(resp["body"])["requestId"]
+
+    Consumer(sqs, "local", JobHandler(), wait_seconds=0.1, verifier=JobVerifier(),
+             on_result=ResultWriter(store)).run(until_empty=True)
+    result = _get(request_id, wait=1, token=token)
+
+    assert result["statusCode"] == 200 and json.loads(result["body"])["output"] == "echo: ping"
+
+
+def test_digest_mode_needs_an_unverified_worker(store, monkeypatch):
+    monkeypatch.setattr(handler, "MESSAGE_TOKEN_MODE", "digest")
+    token = jt.make_token(iss=ISS, aud=AUD)
+
+    sqs, request_id = _job_sqs(monkeypatch, token)
+    stats = Consumer(sqs, "local", JobHandler(), wait_seconds=0.1, verifier=JobVerifier(),
+                     on_result=ResultWriter(store)).run(until_empty=True)
+    assert stats["rejected"] == 1 and _get(request_id, wait=0, token=token)["statusCode"] == 202
+
+    sqs, request_id = _job_sqs(monkeypatch, token)
+    Consumer(sqs, "local", JobHandler(), wait_seconds=0.1,              # --no-verify
+             on_result=ResultWriter(store)).run(until_empty=True)
+    result = _get(request_id, wait=0, token=token)                      # owner from claims.sub
+    assert result["statusCode"] == 200 and json.loads(result["body"])["output"] == "echo: ping"
+
+
+def test_unknown_token_mode_is_not_enqueued(monkeypatch):
+    monkeypatch.setattr(handler, "MESSAGE_TOKEN_MODE", "token")
+    sqs = InMemorySQS()
+    monkeypatch.setattr(handler, "_sqs", sqs)
+    monkeypatch.setattr(handler, "QUEUE_URL", "local")
+    token = jt.make_token(iss=ISS, aud=AUD)
+
+    resp = handler.lambda_handler({"headers": {"authorization": f"Bearer {token}"},
+                                   "body": json.dumps({"prompt": "ping", "idle": 5})}, None)
+
+    assert resp["statusCode"] == 502 and len(sqs) == 0
@@ -0,0 +1,175 @@
+import json
+
+import pytest
+
+import tinyllama.router.handler as handler
+import tinyllama.utils.jwt_tools as jt
+from tinyllama.router.ratelimit import (
+    CounterRateLimiter, DynamoDbCounterStore, InMemoryCounterStore, InMemoryRateLimiter,
+    RedisCounterStore,
+)
+from tinyllama.utils import metrics
+
+ISS = "https://cognito-idp.eu-central-1.amazonaws.com/eu-central-1_TEST"
+AUD = "local-test-client-id"
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class CountingSQS:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, **kwargs):
+        self.sent.append(kwargs)
+        return {"MessageId": f"m-{len(self.sent)}"}
+
+
+class FakeDynamoDB:
+    """Local stand-in for UpdateItem ADD / GetItem on the counter table."""
+
+    def __init__(self):
+        self.items = {}
+
+    def update_item(self, *, TableName, Key, UpdateExpression,
+                    ExpressionAttributeValues, ReturnValues):
+        assert UpdateExpression.startswith("ADD n :amount")
+        item = self.items.setdefault(Key["pk"]["S"], {"n": {"N": "0"}})
+        item["n"] = {"N": str(int(item["n"]["N"]) + int(ExpressionAttributeValues[":amount"]["N"]))}
+        item.setdefault("expires_at", ExpressionAttributeValues[":exp"])
+        return {"Attributes": {"n": item["n"]}}
+
+    def get_item(self, *, TableName, Key):
+        item = self.items.get(Key["pk"]["S"])
+        return {"Item": item} if item else {}
+
+
+class FakeRedis:
+    """Local stand-in for the INCRBY/PEXPIRE script and GET."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.kv = {}                                # key -> (value, expires_at or None)
+
+    def register_script(self, source):
+        assert "INCRBY" in source
+
+        def incr(keys, args):
+            value, expires = self._live(keys[0])
+            if expires is None:
+                expires = self.clock() + int(args[1]) / 1000
+            self.kv[keys[0]] = (value + int(args[0]), expires)
+            return self.kv[keys[0]][0]
+        return incr
+
+    def get(self, key):
+        value, expires = self._live(key)
+        return str(value).encode() if expires is not None else None
+
+    def _live(self, key):
+        value, expires = self.kv.get(key, (0, None))
+        return (value, expires) if expires is not None and expires > self.clock() else (0, None)
+
+
+def test_token_bucket_burst_then_refill():
+    clock = Clock()
+    limiter = InMemoryRateLimiter(rate_per_sec=1.0, burst=3, clock=clock)
+
+    assert [limiter.acquire("u")[0] for _ in range(4)] == [True, True, True, False]
+    allowed, wait = limiter.acquire("u")
+    assert not allowed and wait == pytest.approx(1.0)
+
+    clock.now += 2
+    assert [limiter.acquire("u")[0] for _ in range(3)] == [True, True, False]
+    assert limiter.acquire("other")[0]          # buckets are per key
+    assert limiter.stats()["rejected"] == 3
+
+
+def test_lru_bounds_tracked_users():
+    limiter = InMemoryRateLimiter(rate_per_sec=1.0, burst=1, maxsize=2, clock=Clock())
+    for user in ("a", "b", "c"):
+        limiter.acquire(user)
+
+    assert limiter.stats()["keys"] == 2
+
+
+def test_batch_cost_is_capped_at_burst():
+    limiter = InMemoryRateLimiter(rate_per_sec=1.0, burst=5, clock=Clock())
+
+    assert limiter.acquire("u", cost=50)[0]
+    assert not limiter.acquire("u")[0]
+
+
+@pytest.mark.parametrize("store_factory", [
+    lambda clock: InMemoryCounterStore(clock=clock),
+    lambda clock: DynamoDbCounterStore("tlfif-test-ratelimit", client=FakeDynamoDB(), clock=clock),
+    lambda clock: RedisCounterStore(FakeRedis(clock)),
+])
+def test_shared_limiter_is_shared_between_containers(store_factory):
+    clock = Clock(0.0)
+    store = store_factory(clock)
+    container_a = CounterRateLimiter(store, rate_per_sec=1.0, burst=4, clock=clock)
+    container_b = CounterRateLimiter(store, rate_per_sec=1.0, burst=4, clock=clock)
+
+    results = [c.acquire("u")[0] for c in (container_a, container_b) * 3]
+
+    assert results.count(True) == 4
+    # a full window later the previous window no longer counts
+    clock.now += 8
+    assert container_a.acquire("u")[0]
+
+
+def test_shared_limiter_refunds_rejected_tokens():
+    clock = Clock(0.0)
+    store = InMemoryCounterStore(clock=clock)
+    limiter = CounterRateLimiter(store, rate_per_sec=1.0, burst=2, clock=clock)
+    for _ in range(5):
+        limiter.acquire("u")
+
+    assert store.get("rl#u#0") == 2
+
+
+@pytest.fixture
+def router(monkeypatch):
+    sqs = CountingSQS()
+    records = []
+    monkeypatch.setattr(handler, "_sqs", sqs)
+    monkeypatch.setattr(handler, "QUEUE_URL", "https://dummy-queue-url")
+    monkeypatch.setattr(handler, "_rate_limiter", InMemoryRateLimiter(1 / 60, 2, clock=Clock()))
+    previous = metrics.set_sink(records.append)
+    yield sqs, records
+    metrics.set_sink(previous)
+
+
+def test_router_sheds_before_send_message_and_counts_rejections(router):
+    sqs, records = router
+    token = jt.make_token(iss=ISS, aud=AUD)
+    event = {"headers": {"authorization": f"Bearer {token}"},
+             "body": json.dumps({"prompt": "hi", "idle": 5})}
+
+    statuses = [handler.lambda_handler(event, None)["statusCode"] for _ in range(3)]
+
+    assert statuses == [202, 202, 429]
+    assert len(sqs.sent) == 2
+    assert [r.get("rate_limited", 0) for r in records] == [0, 0, 1]
+    last = records[-1]["_aws"]["CloudWatchMetrics"][0]["Metrics"]
+    assert {"Name": "rate_limited", "Unit": "Count"} in last
+
+
+def test_router_429_carries_retry_after(router):
+    token = jt.make_token(iss=ISS, aud=AUD)
+    event = {"headers": {"authorization": f"Bearer {token}"},
+             "body": json.dumps({"prompt": "hi", "idle": 5})}
+    for _ in range(2):
+        handler.lambda_handler(event, None)
+
+    resp = handler.lambda_handler(event, None)
+
+    assert resp["headers"]["Retry-After"] == "60"
+    assert json.loads(resp["body"]) == {"error": "rate_limited", "retry_after": 60}
@@ -0,0 +1,145 @@
+import json
+
+import pytest
+
+import tinyllama.router.handler as handler
+import tinyllama.utils.jwt_tools as jt
+from tinyllama.utils import metrics
+from tinyllama.queue.backends import SqsQueue
+from tinyllama.utils.cache import MemoryCacheBackend, ResponseCache, SqliteCacheBackend
+from tinyllama.worker import __main__ as worker_main
+from tinyllama.worker.consumer import Consumer
+from tinyllama.worker.inference import JobHandler
+from tinyllama.worker.local_sqs import InMemorySQS
+
+ISS = "https://cognito-idp.eu-central-1.amazonaws.com/eu-central-1_TEST"
+AUD = "local-test-client-id"
+
+
+class CountingSQS:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, **kwargs):
+        self.sent.append(kwargs)
+        return {"MessageId": f"m-{len(self.sent)}"}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ResponseCache(MemoryCacheBackend())
+    monkeypatch.setattr(handler, "_response_cache", cache)
+    monkeypatch.setattr(handler, "QUEUE_URL", "https://dummy-queue-url")
+    return cache
+
+
+@pytest.fixture
+def sqs(monkeypatch):
+    fake = CountingSQS()
+    monkeypatch.setattr(handler, "_sqs", fake)
+    return fake
+
+
+@pytest.fixture
+def records():
+    records = []
+    previous = metrics.set_sink(records.append)
+    yield records
+    metrics.set_sink(previous)
+
+
+def _post(prompt, **extra):
+    token = jt.make_token(iss=ISS, aud=AUD)
+    return handler.lambda_handler({"headers": {"authorization": f"Bearer {token}"},
+                                   "body": json.dumps({"prompt": prompt, "idle": 5, **extra})}, None)
+
+
+def test_hit_is_answered_without_enqueue(cache, sqs, records):
+    cache.store("ping", {}, "pong")
+
+    resp = _post("ping")
+
+    assert resp["statusCode"] == 200
+    assert json.loads(resp["body"]) == {"status": "done", "output": "pong", "cached": True}
+    assert sqs.sent == []
+    assert records[-1]["cache_hit"] == 1 and records[-1]["cache_bytes_saved"] == 4
+
+
+def test_miss_is_enqueued_and_counted(cache, sqs, records):
+    assert _post("ping")["statusCode"] == 202
+    assert len(sqs.sent) == 1 and records[-1]["cache_miss"] == 1
+
+
+def test_opt_out_skips_the_cache_and_travels_to_the_worker(cache, sqs):
+    cache.store("ping", {}, "pong")
+
+    resp = _post("ping", cache=False)
+
+    assert resp["statusCode"] == 202 and cache.stats["hits"] == 0
+    assert json.loads(sqs.sent[0]["MessageBody"])["cache"] is False
+
+
+def test_cache_outage_fails_open(cache, sqs, monkeypatch):
+    monkeypatch.setattr(cache, "lookup", lambda *a: (_ for _ in ()).throw(RuntimeError("down")))
+
+    assert _post("ping")["statusCode"] == 202 and len(sqs.sent) == 1
+
+
+def test_worker_fills_the_cache_the_router_reads(tmp_path, monkeypatch):
+    # one SQLite file shared by "router" and "worker", as on a single host
+    path = str(tmp_path / "responses.db")
+    sqs = InMemorySQS()
+    monkeypatch.setattr(handler, "_sqs", sqs)
+    monkeypatch.setattr(handler, "QUEUE_URL", "local")
+    router_cache = ResponseCache(SqliteCacheBackend(path))
+    monkeypatch.setattr(handler, "_response_cache", router_cache)
+    worker_cache = ResponseCache(SqliteCacheBackend(path))
+
+    assert _post("What is TinyLlama?")["statusCode"] == 202
+    Consumer(sqs, "local", JobHandler(cache=worker_cache), wait_seconds=0.1).run(until_empty=True)
+    resp = _post("What is TinyLlama?")
+
+    assert resp["statusCode"] == 200 and json.loads(resp["body"])["output"] == "echo: What is TinyLlama?"
+    assert worker_cache.stats["stores"] == 1
+    assert router_cache.stats == {"hits": 1, "misses": 1, "stores": 0,
+                                  "bytes_saved": len("echo: What is TinyLlama?")}
+
+
+def test_worker_entry_point_fills_the_cache_for_a_real_model(tmp_path, monkeypatch):
+    # python -m tinyllama.worker with a named model and RESPONSE_CACHE_URL -> router cache hit
+    path = str(tmp_path / "responses.db")
+    sqs = InMemorySQS()
+    monkeypatch.setattr(handler, "_sqs", sqs)
+    monkeypatch.setattr(handler, "QUEUE_URL", "local")
+    monkeypatch.setattr(handler, "_response_cache", ResponseCache(SqliteCacheBackend(path)))
+    monkeypatch.setenv("RESPONSE_CACHE_URL", f"sqlite:{path}")
+
+    class DrainingConsumer(Consumer):
+        def run(self, until_empty=False):
+            return super().run(until_empty=True)
+
+    monkeypatch.setattr(worker_main, "queue_from_env", lambda backend, url: SqsQueue(url, client=sqs))
+    monkeypatch.setattr(worker_main, "Consumer", DrainingConsumer)
+    monkeypatch.setattr(worker_main.signal, "signal", lambda *a: None)
+
+    assert _post("What is TinyLlama?")["statusCode"] == 202
+    worker_main.main(["--queue-url", "local", "--generate", "tinyllama.worker.inference:fake_generate",
+                      "--max-batch", "1", "--wait-seconds", "0", "--idle-minutes", "60"])
+    resp = _post("What is TinyLlama?")
+
+    assert resp["statusCode"] == 200
+    assert json.loads(resp["body"]) == {"status": "done", "output": "echo: What is TinyLlama?", "cached": True}
+
+
+def test_worker_serves_repeats_from_cache():
+    calls = []
+    handle = JobHandler(generate=lambda p: calls.append(p) or f"out:{p}", cache=ResponseCache(MemoryCacheBackend()))
+
+    class Job:
+        def __init__(self, body):
+            self.body, self.prompt, self.request_id, self.sub = body, body["prompt"], "r", None
+
+    outputs = [handle(Job({"prompt": "hi"}))["output"], handle(Job({"prompt": " hi "}))["output"],
+               handle(Job({"prompt": "hi", "cache": False}))["output"]]
+
+    assert outputs == ["out:hi"] * 3 and len(calls) == 2
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+import tinyllama.router.handler as handler
+import tinyllama.utils.jwt_tools as jt
+from tinyllama.utils import metrics
+
+ISS = "https://cognito-idp.eu-central-1.amazonaws.com/eu-central-1_TEST"
+AUD = "local-test-client-id"
+
+
+@pytest.fixture
+def sink():
+    records = []
+    previous = metrics.set_sink(records.append)
+    yield records
+    metrics.set_sink(previous)
+
+
+def _event():
+    token = jt.make_token(iss=ISS, aud=AUD)
+    return {"headers": {"authorization": f"Bearer {token}"},
+            "body": json.dumps({"prompt": "hi", "idle": 5})}
+
+
+def test_one_emf_record_per_invocation_with_stages(sink, monkeypatch):
+    monkeypatch.setattr(handler, "QUEUE_URL", "https://dummy-queue-url")
+    resp = handler.lambda_handler(_event(), None)
+
+    assert resp["statusCode"] == 202
+    (rec,) = sink
+    cw = rec["_aws"]["CloudWatchMetrics"][0]
+    assert cw["Namespace"] == handler.METRICS_NAMESPACE
+    assert cw["Dimensions"] == [["Route"]]
+    names = {m["Name"] for m in cw["Metrics"]}
+    assert {"parse_ms", "verify_ms", "enqueue_ms", "total_ms"} <= names
+    assert all(m["Unit"] == "Milliseconds" for m in cw["Metrics"])
+    assert rec["statusCode"] == 202 and rec["Route"] == "infer"
+    assert rec["total_ms"] >= rec["verify_ms"]
+
+
+def test_jwks_fetch_is_timed_inside_verify(sink, monkeypatch):
+    from tinyllama.utils import auth
+    from tinyllama.utils.jwks import JwksManager
+
+    monkeypatch.setattr(handler, "QUEUE_URL", "https://dummy-queue-url")
+    monkeypatch.setattr(auth, "_jwks_manager", JwksManager(auth._timed_load_jwks))
+    auth.clear_claims_cache()
+    handler.lambda_handler(_event(), None)
+
+    assert "jwks_fetch_ms" in sink[-1]
+
+
+def test_file_sink_writes_plain_json_lines(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    metrics.FileSink(str(path))(metrics.emf_record(
+        "NS", {"verify_ms": 1.5}, dimensions={"Route": "infer"}, properties={"statusCode": 202}))
+
+    line = json.loads(path.read_text())
+    assert line == {"namespace": "NS", "dimensions": {"Route": "infer"},
+                    "metrics": {"verify_ms": 1.5}, "properties": {"statusCode": 202}}
+
+
+def test_emit_swallows_sink_errors():
+    def broken(_record):
+        raise RuntimeError("sink down")
+
+    previous = metrics.set_sink(broken)
+    try:
+        metrics.emit("NS", {"x_ms": 1.0})
+    finally:
+        metrics.set_sink(previous)
@@ -0,0 +1,73 @@
+import pytest
+from jose import JWTError
+
+import tinyllama.utils.auth as auth
+import tinyllama.utils.jwt_tools as jt
+
+ISS = "https://cognito-idp.eu-central-1.amazonaws.com/eu-central-1_TEST"
+AUD = "local-test-client-id"
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    auth.clear_claims_cache()
+    yield
+    auth.clear_claims_cache()
+
+
+def _count_decodes(monkeypatch):
+    calls = []
+    real_decode = auth.jwt.decode
+
+    def _decode(*args, **kwargs):
+        calls.append(1)
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(auth.jwt, "decode", _decode)
+    return calls
+
+
+def test_repeat_token_skips_signature_check(monkeypatch):
+    calls = _count_decodes(monkeypatch)
+    token = jt.make_token(iss=ISS, aud=AUD)
+
+    first = auth.verify_jwt(token)
+    second = auth.verify_jwt(token)
+
+    assert first == second
+    assert len(calls) == 1
+    stats = auth.claims_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+
+
+def test_tampered_token_never_hits(monkeypatch):
+    token = jt.make_token(iss=ISS, aud=AUD)
+    auth.verify_jwt(token)
+
+    head, payload, sig = token.split(".")
+    bad = ".".join([head, payload, sig[:10] + ("A" if sig[10] != "A" else "B") + sig[11:]])
+    with pytest.raises(JWTError):
+        auth.verify_jwt(bad)
+    assert auth.claims_cache_stats()["hits"] == 0
+
+
+def test_entry_expires_at_exp():
+    cache = auth._ClaimsCache(maxsize=4)
+    cache.put("k", {"sub": "u", "exp": 1000})
+
+    assert cache.get("k", now=999) == {"sub": "u", "exp": 1000}
+    assert cache.get("k", now=1000) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_lru_eviction_respects_cap():
+    cache = auth._ClaimsCache(maxsize=2)
+    cache.put("a", {"exp": 10**10})
+    cache.put("b", {"exp": 10**10})
+    cache.get("a")                      # "b" becomes least recently used
+    cache.put("c", {"exp": 10**10})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["size"] == 2
@@ -0,0 +1,31 @@
+from jose.backends.base import Key
+
+import tinyllama.utils.auth as auth
+import tinyllama.utils.jwt_tools as jt
+from tinyllama.utils.jwks import JwksManager
+
+ISS = "https://cognito-idp.eu-central-1.amazonaws.com/eu-central-1_TEST"
+AUD = "local-test-client-id"
+
+
+def test_keys_constructed_once_per_jwks_load(monkeypatch):
+    # distinct tokens -> no claims-cache hits; minted first, signing constructs keys too
+    tokens = [jt.make_token(iss=ISS, aud=AUD, exp_delta=d) for d in (300, 301, 302)]
+    built = []
+    real_construct = auth.jwt.jws.jwk.construct
+
+    def _construct(*args, **kwargs):
+        built.append(1)
+        return real_construct(*args, **kwargs)
+
+    monkeypatch.setattr(auth.jwt.jws.jwk, "construct", _construct)
+    monkeypatch.setattr(auth, "_jwks_manager", JwksManager(lambda: auth._load_jwks()))
+    auth.clear_claims_cache()
+
+    for token in tokens:
+        auth.verify_jwt(token)
+
+    manager = auth._jwks_manager
+    assert len(built) == len(manager.jwks)
+    assert manager.stats()["fetches"] == 1
+    assert all(isinstance(manager.get_key(kid), Key) for kid in manager.jwks)
@@ -0,0 +1,102 @@
+import pytest
+
+from tinyllama.utils.cache import (
+    MemoryCacheBackend, RedisCacheBackend, ResponseCache, SqliteCacheBackend, cache_enabled,
+)
+
+
+class FakeRedis:
+    """get / set(ex=) with expiry on an injectable clock."""
+
+    def __init__(self, clock):
+        self.data = {}
+        self.clock = clock
+
+    def set(self, key, value, ex=None):
+        self.data[key] = (value.encode(), self.clock() + ex)
+
+    def get(self, key):
+        value, expires_at = self.data.get(key, (None, 0))
+        return value if expires_at > self.clock() else None
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def make_backend(request, tmp_path):
+    def make(ttl=60, max_entries=100, max_bytes=10_000, clock=lambda: 1000.0):
+        if request.param == "memory":
+            return MemoryCacheBackend(ttl, max_entries, max_bytes, clock)
+        if request.param == "sqlite":
+            return SqliteCacheBackend(str(tmp_path / "cache.db"), ttl, max_entries, max_bytes, clock)
+        return RedisCacheBackend(FakeRedis(clock), ttl)
+    return make
+
+
+def test_round_trip_and_ttl(make_backend):
+    now = [1000.0]
+    backend = make_backend(ttl=60, clock=lambda: now[0])
+
+    backend.set("k", "Grüße")
+    assert backend.get("k") == "Grüße" and backend.get("other") is None
+    now[0] += 61
+    assert backend.get("k") is None
+
+
+@pytest.mark.parametrize("backend_cls", [MemoryCacheBackend, SqliteCacheBackend])
+def test_least_recently_used_entries_go_first(backend_cls, tmp_path):
+    now = [1000.0]
+    args = (str(tmp_path / "c.db"),) if backend_cls is SqliteCacheBackend else ()
+    backend = backend_cls(*args, ttl=60, max_entries=2, max_bytes=10_000, clock=lambda: now[0])
+
+    for key in ("a", "b"):
+        backend.set(key, key)
+        now[0] += 1
+    backend.get("a")                                    # a is now more recent than b
+    now[0] += 1
+    backend.set("c", "c")
+
+    assert [backend.get(k) for k in "abc"] == ["a", None, "c"]
+    assert len(backend) == 2
+
+
+@pytest.mark.parametrize("backend_cls", [MemoryCacheBackend, SqliteCacheBackend])
+def test_byte_budget_is_enforced(backend_cls, tmp_path):
+    now = [1000.0]
+    args = (str(tmp_path / "c.db"),) if backend_cls is SqliteCacheBackend else ()
+    backend = backend_cls(*args, ttl=60, max_entries=100, max_bytes=25, clock=lambda: now[0])
+
+    for key in ("a", "b", "c"):
+        backend.set(key, key * 10)
+        now[0] += 1
+
+    assert backend.get("a") is None and backend.get("b") == "b" * 10 and backend.get("c") == "c" * 10
+
+
+def test_sqlite_cache_survives_reopen(tmp_path):
+    path = str(tmp_path / "cache.db")
+    SqliteCacheBackend(path).set("k", "v")
+
+    assert SqliteCacheBackend(path).get("k") == "v"
+
+
+def test_stats_count_hits_and_bytes_saved():
+    cache = ResponseCache(MemoryCacheBackend())
+
+    assert cache.lookup("What is TinyLlama?") is None
+    cache.store("What is TinyLlama?", {}, "A small model.")
+    assert cache.lookup("  What is   TinyLlama? ") == "A small model."
+    assert cache.lookup("What is TinyLlama?", {"temperature": 0.9}) is None
+
+    assert cache.stats == {"hits": 1, "misses": 2, "stores": 1, "bytes_saved": 14}
+    assert cache.hit_ratio == pytest.approx(1 / 3)
+
+
+def test_model_is_part_of_the_key():
+    backend = MemoryCacheBackend()
+    ResponseCache(backend, model="tinyllama-1.1b").store("hi", {}, "old")
+
+    assert ResponseCache(backend, model="tinyllama-1.1b-v2").lookup("hi") is None
+
+
+def test_opt_out_flag():
+    assert cache_enabled({"prompt": "hi"}) and cache_enabled({"cache": True})
+    assert not cache_enabled({"cache": False})
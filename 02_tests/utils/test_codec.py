@@ -0,0 +1,146 @@
+import io
+import json
+import random
+import string
+
+import pytest
+
+import tinyllama.router.handler as handler
+import tinyllama.utils.jwt_tools as jt
+from tinyllama.utils.codec import CodecError, MessageCodec, is_claim_check
+
+ISS = "https://cognito-idp.eu-central-1.amazonaws.com/eu-central-1_TEST"
+AUD = "local-test-client-id"
+
+
+class FakeS3:
+    """Local S3 stand-in: put_object / get_object on an in-memory dict."""
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, *, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = bytes(Body)
+        return {"ETag": '"fake"'}
+
+    def get_object(self, *, Bucket, Key):
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+
+def _text(n, seed=0):
+    rnd = random.Random(seed)
+    words = ["".join(rnd.choices(string.ascii_lowercase, k=rnd.randint(2, 9))) for _ in range(300)]
+    out, size = [], 0
+    while size < n:
+        out.append(rnd.choice(words))
+        size += len(out[-1]) + 1
+    return " ".join(out)[:n]
+
+
+def test_small_payload_stays_plain_json():
+    codec = MessageCodec()
+    payload = {"prompt": "hi", "idle": 5, "request_id": "r-1"}
+
+    body = codec.encode(payload)
+
+    assert json.loads(body) == payload            # legacy consumers still work
+    assert codec.decode(body) == payload
+
+
+def test_large_payload_is_compressed_inline():
+    codec = MessageCodec(compress_min_bytes=512)
+    payload = {"prompt": _text(6 * 1024), "request_id": "r-1"}
+
+    body = codec.encode(payload)
+
+    assert json.loads(body)["enc"] == "zlib"
+    assert len(body) < len(json.dumps(payload))
+    assert codec.decode(body) == payload
+
+
+def test_payload_above_threshold_goes_to_s3():
+    s3 = FakeS3()
+    codec = MessageCodec(offload_bytes=4 * 1024, bucket="claims", s3=s3)
+    payload = {"prompt": _text(200 * 1024), "request_id": "r-1"}
+
+    body = codec.encode(payload)
+
+    assert is_claim_check(body)
+    assert len(body) < 300
+    assert len(s3.objects) == 1
+    assert MessageCodec(s3=s3).decode(body) == payload    # consumer-side decoder
+
+
+def test_tampered_claim_check_is_rejected():
+    s3 = FakeS3()
+    codec = MessageCodec(offload_bytes=1024, bucket="claims", s3=s3)
+    body = codec.encode({"prompt": _text(50 * 1024)})
+    key = next(iter(s3.objects))
+    s3.objects[key] = s3.objects[key][:-1] + b"x"
+
+    with pytest.raises(CodecError):
+        codec.decode(body)
+
+
+@pytest.mark.parametrize("body", [
+    '["a", "list"]',
+    '"a string"',
+    '{"_tlc": 1, "enc": "zlib", "data": "not base64!"}',
+    '{"_tlc": 1, "enc": "zlib", "data": "bm90IHpsaWI="}',
+    '{"_tlc": 1, "enc": "zlib"}',
+    '{"_tlc": 1, "data": "eJyrrgUAAXUA+Q=="}',
+    '{"_tlc": 1, "enc": "zlib", "s3": {"key": "k"}}',
+    '{"_tlc": 1, "enc": "none", "data": "WzFd"}',
+])
+def test_malformed_bodies_raise_codec_error(body):
+    with pytest.raises(CodecError):
+        MessageCodec(s3=FakeS3()).decode(body)
+
+
+def test_claim_check_transport_errors_stay_retryable():
+    class DownS3(FakeS3):
+        def get_object(self, *, Bucket, Key):
+            raise ConnectionError("s3 unreachable")
+
+    codec = MessageCodec(offload_bytes=1024, bucket="claims", s3=FakeS3())
+    body = codec.encode({"prompt": _text(50 * 1024)})
+
+    with pytest.raises(ConnectionError):
+        MessageCodec(s3=DownS3()).decode(body)
+
+
+def test_oversized_payload_without_bucket_fails():
+    codec = MessageCodec(compression="none", offload_bytes=1024)
+
+    with pytest.raises(CodecError):
+        codec.encode({"prompt": "x" * (300 * 1024)})
+
+
+def test_zstd_round_trip_when_available():
+    pytest.importorskip("zstandard")
+    codec = MessageCodec(compression="zstd", compress_min_bytes=0)
+    payload = {"prompt": _text(8 * 1024)}
+
+    assert codec.decode(codec.encode(payload)) == payload
+
+
+def test_router_replaces_token_with_claims_digest(monkeypatch):
+    sent = []
+
+    class SQS:
+        def send_message(self, **kwargs):
+            sent.append(kwargs)
+            return {"MessageId": "m-1"}
+
+    monkeypatch.setattr(handler, "_sqs", SQS())
+    monkeypatch.setattr(handler, "QUEUE_URL", "https://dummy-queue-url")
+    monkeypatch.setattr(handler, "MESSAGE_TOKEN_MODE", "digest")
+    token = jt.make_token(iss=ISS, aud=AUD)
+    handler.lambda_handler({"headers": {"authorization": f"Bearer {token}"},
+                            "body": json.dumps({"prompt": "hi", "idle": 5})}, None)
+
+    body = sent[0]["MessageBody"]
+    message = MessageCodec().decode(body)
+    assert token not in body and "token" not in message
+    assert message["claims"]["sub"] == "test-user"
+    assert len(message["claims"]["tdig"]) == 22
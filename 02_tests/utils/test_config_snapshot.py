@@ -0,0 +1,79 @@
+import importlib.util
+import json
+import zipfile
+from pathlib import Path
+
+import pytest
+
+import tools
+
+SSM_FILE = Path(__file__).resolve().parents[2] / "01_src" / "tinyllama" / "utils" / "ssm.py"
+
+
+class CountingSSM:
+    def __init__(self, params):
+        self.params = params
+        self.calls = 0
+
+    def get_parameter(self, Name, WithDecryption=False):
+        self.calls += 1
+        return {"Parameter": {"Name": Name, "Value": self.params[Name]}}
+
+    def get_parameters_by_path(self, Path, Recursive, WithDecryption, NextToken=None):
+        self.calls += 1
+        return {"Parameters": [{"Name": n, "Value": v}
+                               for n, v in self.params.items() if n.startswith(Path)]}
+
+
+@pytest.fixture
+def ssm_mod(monkeypatch):
+    spec = importlib.util.spec_from_file_location("ssm_snapshot_under_test", SSM_FILE)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    monkeypatch.setenv("TLFIF_ENV", "dev")
+    return mod
+
+
+def test_baked_values_need_zero_ssm_calls(ssm_mod, monkeypatch):
+    monkeypatch.setenv("TL_CONFIG_SNAPSHOT", json.dumps(
+        {"version": "abc123", "env": "dev", "values": {"cognito_client_id": "baked"}}))
+    fake = CountingSSM({"/tinyllama/dev/cognito_client_id": "live"})
+    ssm_mod._SSM = fake
+
+    assert ssm_mod.get_id("cognito_client_id") == "baked"
+    assert fake.calls == 0
+    assert ssm_mod.snapshot_info() == {"version": "abc123", "env": "dev", "names": 1}
+
+
+def test_snapshot_for_other_env_falls_back_to_live(ssm_mod, monkeypatch, tmp_path):
+    snap = tmp_path / "snap.json"
+    snap.write_text(json.dumps({"version": "v", "env": "prod", "values": {"x": "baked"}}))
+    monkeypatch.setenv("TL_CONFIG_SNAPSHOT", str(snap))
+    ssm_mod._SSM = CountingSSM({"/tinyllama/dev/x": "live"})
+
+    assert ssm_mod.get_id("x") == "live"
+
+
+def test_lambda_package_bundles_snapshot(ssm_mod, monkeypatch, tmp_path):
+    ssm_mod._SSM = CountingSSM({f"/tinyllama/dev/{n}": f"{n}-value" for n in tools.BAKED_SSM_NAMES})
+    monkeypatch.setattr(tools, "bake_config", lambda env=None: ssm_mod.build_snapshot(
+        tools.BAKED_SSM_NAMES, env=env, version="test-version"))
+    monkeypatch.setattr(tools, "ZIP_OUT", tmp_path / "router.zip")
+
+    tools.lambda_package(bake=True, env="dev")
+
+    with zipfile.ZipFile(tmp_path / "router.zip") as zf:
+        names = zf.namelist()
+        snapshot = json.loads(zf.read(tools.SNAPSHOT_ARC))
+    assert "tinyllama/utils/jwt_tools.py" not in names
+    assert snapshot["version"] == "test-version"
+    assert snapshot["values"]["cognito_client_id"] == "cognito_client_id-value"
+
+
+def test_auth_prefers_terraform_injected_env(monkeypatch):
+    import tinyllama.utils.auth as auth
+
+    monkeypatch.setenv("COGNITO_ISSUER", "https://cognito-idp.eu-central-1.amazonaws.com/pool-from-tf/")
+    monkeypatch.setenv("COGNITO_AUD", "aud-from-tf")
+    assert auth.COGNITO_ISSUER == "https://cognito-idp.eu-central-1.amazonaws.com/pool-from-tf"
+    assert auth.COGNITO_CLIENT_ID == "aud-from-tf"
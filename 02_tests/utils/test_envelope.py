@@ -0,0 +1,151 @@
+import json
+
+import pytest
+
+import tinyllama.router.handler as handler
+import tinyllama.utils.jwt_tools as jt
+from tinyllama.utils import envelope
+from tinyllama.utils.codec import MessageCodec
+from tinyllama.utils.envelope import EnvelopeError, JobVerifier
+
+ISS = "https://cognito-idp.eu-central-1.amazonaws.com/eu-central-1_TEST"
+AUD = "local-test-client-id"
+KEY = "0123456789abcdef0123456789abcdef"
+OLD_KEY = "fedcba9876543210fedcba9876543210"
+NOW = 1_800_000_000
+
+
+def _message(key=KEY, prompt="hello", rid="r-1", exp=NOW + 60):
+    return {"job": envelope.sign("alice", exp, rid, prompt, key, grace=0, now=NOW),
+            "prompt": prompt, "request_id": rid}
+
+
+def test_round_trip_returns_verified_claims():
+    claims = envelope.verify_job(_message(), KEY, now=NOW)
+
+    assert claims["sub"] == "alice" and claims["rid"] == "r-1"
+    assert claims["kid"] == envelope.key_id(KEY)
+
+
+@pytest.mark.parametrize("tamper, error", [
+    (lambda m: m.update(prompt="other"), "prompt mismatch"),
+    (lambda m: m.update(request_id="r-2"), "request_id mismatch"),
+    (lambda m: m.update(job=m["job"][:-2] + "AA"), "bad envelope signature"),
+    (lambda m: m.update(job="v1.garbage"), "malformed envelope"),
+    (lambda m: m.pop("job"), "no job envelope"),
+])
+def test_tampering_is_rejected(tamper, error):
+    message = _message()
+    tamper(message)
+
+    with pytest.raises(EnvelopeError, match=error):
+        envelope.verify_job(message, KEY, now=NOW)
+
+
+def test_expired_envelope_is_rejected():
+    with pytest.raises(EnvelopeError, match="expired"):
+        envelope.verify_job(_message(exp=NOW + 60), KEY, now=NOW + 61)
+
+
+def test_grace_extends_token_expiry_for_queued_jobs():
+    job = envelope.sign("alice", NOW, "r-1", "p", KEY, grace=900, now=NOW)
+
+    assert envelope.verify(job, KEY, now=NOW + 899)["exp"] == NOW + 900
+
+
+def test_verifier_reloads_keys_on_rotation():
+    loads = []
+    current = [OLD_KEY]
+
+    def loader():
+        loads.append(1)
+        return {envelope.key_id(k): k.encode() for k in current}
+
+    clock = [0.0]
+    verifier = JobVerifier(loader, min_reload=30, clock=lambda: clock[0])
+    assert verifier.verify(_message(key=OLD_KEY), now=NOW)["sub"] == "alice"
+
+    current[:] = [KEY, OLD_KEY]                     # router switched to the new key
+    clock[0] = 31
+    assert verifier.verify(_message(key=KEY), now=NOW)["sub"] == "alice"
+    assert len(loads) == 2
+
+
+def test_short_keys_are_refused():
+    with pytest.raises(EnvelopeError):
+        envelope.sign("alice", NOW, "r-1", "p", "short", now=NOW)
+
+
+def test_router_sends_signed_envelope_instead_of_token(monkeypatch):
+    sent = []
+
+    class SQS:
+        def send_message(self, **kwargs):
+            sent.append(kwargs)
+            return {"MessageId": "m-1"}
+
+    monkeypatch.setattr(handler, "_sqs", SQS())
+    monkeypatch.setattr(handler, "QUEUE_URL", "https://dummy-queue-url")
+    monkeypatch.setattr(envelope, "signing_key", lambda: KEY)
+    token = jt.make_token(iss=ISS, aud=AUD)
+
+    resp = handler.lambda_handler({"headers": {"authorization": f"Bearer {token}"},
+                                   "body": json.dumps({"prompt": "hi", "idle": 5})}, None)
+
+    assert resp["statusCode"] == 202
+    body = sent[0]["MessageBody"]
+    message = MessageCodec().decode(body)
+    assert token not in body and "token" not in message
+    assert envelope.verify_job(message, KEY)["sub"] == "test-user"
+
+
+def test_router_refuses_to_enqueue_without_key(monkeypatch):
+    sent = []
+
+    class SQS:
+        def send_message(self, **kwargs):
+            sent.append(kwargs)
+            return {"MessageId": "m-1"}
+
+        def send_message_batch(self, **kwargs):
+            sent.append(kwargs)
+            return {"Successful": []}
+
+    def missing():
+        raise KeyError("job_hmac_key")
+
+    monkeypatch.setattr(handler, "_sqs", SQS())
+    monkeypatch.setattr(handler, "QUEUE_URL", "https://dummy-queue-url")
+    monkeypatch.setattr(envelope, "signing_key", missing)
+    headers = {"authorization": f"Bearer {jt.make_token(iss=ISS, aud=AUD)}"}
+
+    single = handler.lambda_handler({"headers": headers,
+                                     "body": json.dumps({"prompt": "hi", "idle": 5})}, None)
+    batch = handler.lambda_handler({"routeKey": "POST /infer/batch", "headers": headers,
+                                    "body": json.dumps({"prompts": ["a", "b"], "idle": 5})}, None)
+
+    assert single["statusCode"] == batch["statusCode"] == 503
+    assert json.loads(single["body"])["error"] == "signing_key_unavailable"
+    assert sent == []
+
+
+def test_digest_mode_sends_claims_digest(monkeypatch):
+    sent = []
+
+    class SQS:
+        def send_message(self, **kwargs):
+            sent.append(kwargs)
+            return {"MessageId": "m-1"}
+
+    monkeypatch.setattr(handler, "_sqs", SQS())
+    monkeypatch.setattr(handler, "QUEUE_URL", "https://dummy-queue-url")
+    monkeypatch.setattr(handler, "MESSAGE_TOKEN_MODE", "digest")
+    token = jt.make_token(iss=ISS, aud=AUD)
+
+    handler.lambda_handler({"headers": {"authorization": f"Bearer {token}"},
+                            "body": json.dumps({"prompt": "hi", "idle": 5})}, None)
+
+    message = MessageCodec().decode(sent[0]["MessageBody"])
+    assert "job" not in message and message["claims"]["sub"] == "test-user"
+    with pytest.raises(EnvelopeError):
+        envelope.verify_job(message, KEY)
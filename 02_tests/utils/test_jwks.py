@@ -0,0 +1,158 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from tinyllama.utils.jwks import JwksManager, fetch_jwks
+
+JWKS_FILE = Path(__file__).resolve().parents[1] / "api" / "data" / "mock_jwks.json"
+KID = "test-key"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def jwks_server():
+    """Local HTTP stand-in for Cognito's /.well-known/jwks.json."""
+    body = JWKS_FILE.read_bytes()
+    state = {"hits": 0, "delay": 0.0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state["hits"] += 1
+            time.sleep(state["delay"])
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state["url"] = f"http://127.0.0.1:{server.server_port}/.well-known/jwks.json"
+    yield state
+    server.shutdown()
+
+
+def _manager(url, clock, **kw):
+    return JwksManager(lambda: fetch_jwks(url), clock=clock, **kw)
+
+
+def test_local_jwks_path_wins_over_url():
+    jwks = fetch_jwks("http://127.0.0.1:9/unreachable", JWKS_FILE)
+    assert KID in jwks
+
+
+def test_unknown_kid_burst_fetches_once(jwks_server):
+    clock = FakeClock()
+    mgr = _manager(jwks_server["url"], clock, min_refresh_interval=30, negative_ttl=60)
+
+    assert mgr.get_key(KID) is not None
+    for i in range(50):
+        assert mgr.get_key(f"garbage-{i % 3}") is None
+
+    assert jwks_server["hits"] == 1
+    assert mgr.stats()["negative_hits"] == 47
+
+    clock.now += 31                       # min interval elapsed, negatives still live
+    assert mgr.get_key("garbage-0") is None
+    assert mgr.get_key("garbage-new") is None
+    assert jwks_server["hits"] == 2
+
+
+def test_concurrent_callers_share_one_fetch(jwks_server):
+    jwks_server["delay"] = 0.2
+    mgr = _manager(jwks_server["url"], FakeClock())
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(mgr.get_key(KID)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(results) == 8 and all(r is not None for r in results)
+    assert jwks_server["hits"] == 1
+
+
+def test_stale_keys_served_while_revalidating(jwks_server):
+    clock = FakeClock()
+    mgr = _manager(jwks_server["url"], clock, ttl=60)
+    first = mgr.get_key(KID)
+
+    jwks_server["delay"] = 0.2
+    clock.now += 61
+    started = time.perf_counter()
+    assert mgr.get_key(KID) is first                 # stale, returned immediately
+    assert time.perf_counter() - started < 0.1
+
+    deadline = time.time() + 2
+    while mgr.stats()["fetches"] < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert jwks_server["hits"] == 2
+
+
+def test_fetch_error_keeps_serving_cached_keys():
+    clock = FakeClock()
+    calls = {"n": 0}
+
+    def loader():
+        calls["n"] += 1
+        if calls["n"] > 1:
+            raise OSError("cognito down")
+        return fetch_jwks("", JWKS_FILE)
+
+    mgr = JwksManager(loader, clock=clock, ttl=10)
+    key = mgr.get_key(KID)
+    clock.now += 11
+    mgr.refresh()
+
+    assert mgr.get_key(KID) is key
+    assert mgr.stats()["fetch_errors"] >= 1
+
+
+def test_negative_cache_is_bounded_and_pruned():
+    clock = FakeClock()
+    mgr = JwksManager(lambda: fetch_jwks("", JWKS_FILE), clock=clock, negative_ttl=60, negative_max=10)
+    for i in range(100):
+        mgr.get_key(f"random-{i}")
+
+    assert mgr.stats()["negative_kids"] == 10
+
+    clock.now += 61
+    mgr.get_key("one-more")
+    assert mgr.stats()["negative_kids"] == 1
+
+
+def test_failed_stale_refresh_is_throttled():
+    clock = FakeClock()
+    calls = {"n": 0}
+
+    def loader():
+        calls["n"] += 1
+        if calls["n"] > 1:
+            raise OSError("cognito down")
+        return fetch_jwks("", JWKS_FILE)
+
+    mgr = JwksManager(loader, clock=clock, ttl=10, min_refresh_interval=30)
+    mgr.get_key(KID)
+    clock.now += 31
+    for _ in range(20):
+        assert mgr.get_key(KID) is not None
+        deadline = time.time() + 1
+        while mgr.stats()["fetch_errors"] < 1 and time.time() < deadline:
+            time.sleep(0.01)
+
+    assert calls["n"] == 2                  # one background attempt, not one per request
@@ -0,0 +1,75 @@
+import json
+import logging
+
+import tinyllama.router.handler as handler
+import tinyllama.utils.jwt_tools as jt
+from tinyllama.utils import log as tlog
+
+ISS = "https://cognito-idp.eu-central-1.amazonaws.com/eu-central-1_TEST"
+AUD = "local-test-client-id"
+
+
+def _records(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()
+            if line.startswith("{")]
+
+
+def test_redact_masks_keys_jwts_and_bearer():
+    token = jt.make_token()
+    out = tlog.redact({
+        "token": token,
+        "headers": {"Authorization": f"Bearer {token}"},
+        "msg": f"got {token} from client",
+        "note": "Bearer abc123",
+        "sub": "user-1",
+    })
+
+    assert out["token"] == tlog.REDACTED
+    assert out["headers"]["Authorization"] == tlog.REDACTED
+    assert token not in out["msg"]
+    assert out["note"] == f"Bearer {tlog.REDACTED}"
+    assert out["sub"] == "user-1"
+
+
+def test_disabled_level_never_evaluates_fields(capsys, monkeypatch):
+    logger = tlog.get_logger("tests.level")
+    monkeypatch.setattr(logging.getLogger("tinyllama"), "level", logging.INFO)
+    calls = []
+
+    logger.debug("expensive", value=lambda: calls.append(1))
+    logger.info("cheap", value=lambda: "evaluated")
+
+    assert calls == []
+    (rec,) = _records(capsys)
+    assert rec["msg"] == "cheap" and rec["value"] == "evaluated"
+    assert rec["logger"] == "tinyllama.tests.level"
+
+
+def test_debug_sampling(capsys, monkeypatch):
+    monkeypatch.setattr(logging.getLogger("tinyllama"), "level", logging.DEBUG)
+    logger = tlog.get_logger("tests.sample")
+
+    logger.debug_sample = 0.0
+    for _ in range(20):
+        logger.debug("dropped")
+    logger.debug_sample = 1.0
+    logger.debug("kept")
+
+    assert [r["msg"] for r in _records(capsys)] == ["kept"]
+
+
+def test_router_logs_json_without_leaking_token(capsys, monkeypatch):
+    monkeypatch.setattr(logging.getLogger("tinyllama"), "level", logging.DEBUG)
+    monkeypatch.setattr(handler, "QUEUE_URL", "https://dummy-queue-url")
+    token = jt.make_token(iss=ISS, aud=AUD)
+    event = {"headers": {"authorization": f"Bearer {token}"},
+             "body": json.dumps({"prompt": "hi", "idle": 5})}
+
+    resp = handler.lambda_handler(event, None)
+
+    out = capsys.readouterr().out
+    assert token not in out
+    records = [json.loads(line) for line in out.splitlines() if line.startswith("{")]
+    final = [r for r in records if r.get("msg") == "response"]
+    assert final and final[-1]["statusCode"] == resp["statusCode"] == 202
+    assert final[-1]["request_id"] == "test-request"
@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+from tinyllama.utils.pubsub import InProcessPubSub, RedisStreamPubSub, stream_channel
+
+
+class FakeRedis:
+    """xadd / xread / expire over plain lists; block waits on a condition."""
+
+    def __init__(self):
+        self.streams = {}
+        self.expiry = {}
+        self._cond = threading.Condition()
+
+    def xadd(self, key, fields, maxlen=None, approximate=True):
+        with self._cond:
+            entries = self.streams.setdefault(key, [])
+            entry_id = f"1-{len(entries) + 1}"
+            entries.append((entry_id, {k.encode(): v.encode() for k, v in fields.items()}))
+            if maxlen is not None:
+                del entries[:-maxlen]
+            self._cond.notify_all()
+            return entry_id
+
+    def expire(self, key, seconds):
+        self.expiry[key] = seconds
+
+    def xread(self, streams, count=None, block=None):
+        def seq(entry_id):
+            return int(entry_id.split("-")[1])
+
+        def newer():
+            return [(key, [e for e in self.streams.get(key, []) if seq(e[0]) > seq(last)][:count])
+                    for key, last in streams.items()]
+
+        with self._cond:
+            self._cond.wait_for(lambda: any(e for _, e in newer()), None if block is None else block / 1000)
+            return [(k, e) for k, e in newer() if e]
+
+
+@pytest.fixture(params=["inprocess", "redis"])
+def bus(request):
+    return InProcessPubSub() if request.param == "inprocess" else RedisStreamPubSub(FakeRedis())
+
+
+def test_late_subscriber_replays_from_the_start(bus):
+    channel = stream_channel("r-1")
+    bus.publish(channel, {"type": "token", "text": "Hel"})
+    bus.publish(channel, {"type": "token", "text": "lo"})
+
+    sub = bus.subscribe(channel)
+
+    assert [sub.get(timeout=1)["text"], sub.get(timeout=1)["text"]] == ["Hel", "lo"]
+    assert sub.get(timeout=0.05) is None
+
+
+def test_blocked_subscriber_wakes_on_publish(bus):
+    channel = stream_channel("r-2")
+    sub = bus.subscribe(channel)
+    threading.Timer(0.1, bus.publish, (channel, {"type": "done", "output": "x"})).start()
+
+    assert sub.get(timeout=5) == {"type": "done", "output": "x"}
+
+
+def test_channels_are_separate(bus):
+    bus.publish(stream_channel("a"), {"type": "token", "text": "a"})
+
+    assert bus.subscribe(stream_channel("b")).get(timeout=0.05) is None
+
+
+def test_idle_in_process_channels_expire():
+    now = [0.0]
+    bus = InProcessPubSub(ttl=10, clock=lambda: now[0])
+    bus.publish("old", {"type": "done"})
+    now[0] = 11
+    bus.publish("new", {"type": "done"})
+
+    assert bus.subscribe("old").get(timeout=0) is None
+
+
+def test_redis_stream_is_trimmed_and_expires():
+    client = FakeRedis()
+    bus = RedisStreamPubSub(client, ttl=60, maxlen=2)
+    for i in range(5):
+        bus.publish("c", {"type": "token", "text": str(i)})
+
+    assert len(client.streams["tl:c"]) == 2 and client.expiry["tl:c"] == 60
@@ -0,0 +1,116 @@
+import io
+import json
+
+import pytest
+
+from tinyllama.utils import results
+from tinyllama.utils.results import DynamoDbResultStore, FileResultStore, S3ResultStore
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, *, Bucket, Key, Body, ContentType=None):
+        self.objects[(Bucket, Key)] = Body
+
+    def get_object(self, *, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            err = Exception("NoSuchKey")
+            err.response = {"Error": {"Code": "NoSuchKey"}}
+            raise err
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+
+class FakeDynamoDB:
+    def __init__(self):
+        self.items = {}
+
+    def put_item(self, *, TableName, Item):
+        self.items[Item["pk"]["S"]] = Item
+
+    def get_item(self, *, TableName, Key):
+        item = self.items.get(Key["pk"]["S"])
+        return {"Item": item} if item else {}
+
+
+@pytest.fixture(params=["file", "s3", "dynamodb"])
+def store(request, tmp_path):
+    if request.param == "file":
+        return FileResultStore(str(tmp_path))
+    if request.param == "s3":
+        return S3ResultStore("results-bucket", client=FakeS3())
+    return DynamoDbResultStore("results", client=FakeDynamoDB())
+
+
+def test_round_trip(store):
+    rec = results.record("r-1", "alice", output="hello")
+
+    assert store.get("r-1") is None
+    store.put("r-1", rec)
+    assert store.get("r-1") == rec
+
+
+def test_failed_record_carries_error():
+    rec = results.record("r-1", "alice", error="CUDA out of memory")
+
+    assert rec["status"] == results.FAILED and "output" not in rec
+
+
+@pytest.mark.parametrize("bad", ["../etc/passwd", "a/b", "", "x" * 200, ".."])
+def test_path_like_ids_are_refused(tmp_path, bad):
+    with pytest.raises(ValueError):
+        FileResultStore(str(tmp_path)).put(bad, {})
+
+
+def test_dynamodb_ignores_expired_items():
+    now = [1000.0]
+    store = DynamoDbResultStore("results", client=FakeDynamoDB(), ttl=60, clock=lambda: now[0])
+    store.put("r-1", results.record("r-1", "alice", output="x"))
+
+    now[0] = 1061
+    assert store.get("r-1") is None
+
+
+def test_wait_for_backs_off_until_the_result_appears():
+    now, sleeps = [0.0], []
+    answers = iter([None] * 6 + [{"status": "done"}])
+
+    class Store:
+        def get(self, request_id):
+            return next(answers)
+
+    def sleep(s):
+        sleeps.append(s)
+        now[0] += s
+
+    rec = results.wait_for(Store(), "r-1", timeout=20, clock=lambda: now[0], sleep=sleep)
+
+    assert rec == {"status": "done"}
+    assert sleeps == [0.05, 0.1, 0.2, 0.4, 0.8, 1.0]
+
+
+def test_wait_for_gives_up_at_the_deadline():
+    now = [0.0]
+
+    class Store:
+        calls = 0
+
+        def get(self, request_id):
+            Store.calls += 1
+
+    def sleep(s):
+        now[0] += s
+
+    assert results.wait_for(Store(), "r-1", timeout=5, clock=lambda: now[0], sleep=sleep) is None
+    assert now[0] == 5 and Store.calls <= 12
+
+
+def test_store_from_env(monkeypatch, tmp_path):
+    monkeypatch.delenv("RESULT_BUCKET", raising=False)
+    monkeypatch.delenv("RESULT_TABLE", raising=False)
+    monkeypatch.setenv("RESULT_DIR", str(tmp_path))
+
+    assert isinstance(results.store_from_env(), FileResultStore)
+    monkeypatch.setenv("RESULT_BUCKET", "b")
+    assert isinstance(results.store_from_env(), S3ResultStore)
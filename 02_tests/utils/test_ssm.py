@@ -0,0 +1,149 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+SSM_FILE = Path(__file__).resolve().parents[2] / "01_src" / "tinyllama" / "utils" / "ssm.py"
+
+
+class FakeSSM:
+    """In-memory stand-in for the boto3 SSM client (10 results per page, like AWS)."""
+
+    def __init__(self, params, allow_by_path=True):
+        self.params = dict(params)
+        self.allow_by_path = allow_by_path
+        self.calls = {"get_parameter": 0, "get_parameters_by_path": 0}
+
+    def get_parameter(self, Name, WithDecryption=False):
+        self.calls["get_parameter"] += 1
+        return {"Parameter": {"Name": Name, "Value": self.params[Name]}}
+
+    def get_parameters_by_path(self, Path, Recursive, WithDecryption, NextToken=None):
+        self.calls["get_parameters_by_path"] += 1
+        if not self.allow_by_path:
+            raise RuntimeError("AccessDenied")
+        names = sorted(n for n in self.params if n.startswith(Path))
+        start = int(NextToken or 0)
+        page = names[start:start + 10]
+        resp = {"Parameters": [{"Name": n, "Value": self.params[n]} for n in page]}
+        if start + 10 < len(names):
+            resp["NextToken"] = str(start + 10)
+        return resp
+
+
+@pytest.fixture
+def ssm_mod(monkeypatch):
+    """Fresh copy of tinyllama.utils.ssm (the package one is patched by conftest)."""
+    spec = importlib.util.spec_from_file_location("ssm_under_test", SSM_FILE)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    monkeypatch.setenv("TLFIF_ENV", "dev")
+    return mod
+
+
+def _params(n, env="dev"):
+    return {f"/tinyllama/{env}/p{i:02d}": f"v{i}" for i in range(n)}
+
+
+def test_prefetch_pages_through_whole_tree(ssm_mod):
+    fake = FakeSSM({**_params(25), **_params(3, env="prod")})
+    ssm_mod._SSM = fake
+
+    assert ssm_mod.prefetch() == 25
+    assert fake.calls["get_parameters_by_path"] == 3
+    for i in range(25):
+        assert ssm_mod.get_id(f"p{i:02d}") == f"v{i}"
+    assert fake.calls["get_parameter"] == 0
+
+
+def test_first_miss_prefetches_then_falls_back_per_name(ssm_mod):
+    fake = FakeSSM(_params(4))
+    ssm_mod._SSM = fake
+
+    assert ssm_mod.get_id("p01") == "v1"
+    assert ssm_mod.get_id("p02") == "v2"
+    assert fake.calls == {"get_parameter": 0, "get_parameters_by_path": 1}
+
+    fake.params["/tinyllama/dev/late"] = "added-after-prefetch"
+    assert ssm_mod.get_id("late") == "added-after-prefetch"
+    assert fake.calls["get_parameter"] == 1
+
+
+def test_missing_by_path_permission_degrades_to_get_parameter(ssm_mod):
+    fake = FakeSSM(_params(2), allow_by_path=False)
+    ssm_mod._SSM = fake
+
+    assert ssm_mod.get_id("p00") == "v0"
+    assert ssm_mod.get_id("p01") == "v1"
+    assert fake.calls == {"get_parameter": 2, "get_parameters_by_path": 1}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _join_refreshes(mod):
+    for worker in list(mod._INFLIGHT.values()):
+        worker.join(2)
+
+
+def test_cache_is_keyed_by_env(ssm_mod, monkeypatch):
+    ssm_mod._SSM = FakeSSM({"/tinyllama/dev/pool": "dev-pool", "/tinyllama/prod/pool": "prod-pool"})
+
+    assert ssm_mod.get_id("pool") == "dev-pool"
+    monkeypatch.setenv("TLFIF_ENV", "prod")
+    assert ssm_mod.get_id("pool") == "prod-pool"
+
+
+def test_refresh_ahead_serves_cached_value_and_picks_up_rotation(ssm_mod):
+    clock = FakeClock()
+    ssm_mod._clock = clock
+    ssm_mod.TTL_SECONDS, ssm_mod.REFRESH_AHEAD = 100, 0.8
+    fake = FakeSSM({"/tinyllama/dev/key": "old"})
+    ssm_mod._SSM = fake
+
+    assert ssm_mod.get_id("key") == "old"
+    fake.params["/tinyllama/dev/key"] = "rotated"
+
+    clock.now = 85                                   # inside refresh-ahead window
+    assert ssm_mod.get_id("key") == "old"            # no blocking
+    _join_refreshes(ssm_mod)
+    assert ssm_mod.get_id("key") == "rotated"
+
+    stats = ssm_mod.cache_stats()
+    assert stats["refreshes"] == 1 and stats["refresh_errors"] == 0
+    assert stats["hits"] == 2 and stats["misses"] == 1
+
+
+def test_expired_entry_is_fetched_synchronously(ssm_mod):
+    clock = FakeClock()
+    ssm_mod._clock = clock
+    ssm_mod.TTL_SECONDS = 100
+    fake = FakeSSM({"/tinyllama/dev/key": "old"})
+    ssm_mod._SSM = fake
+
+    ssm_mod.get_id("key")
+    fake.params["/tinyllama/dev/key"] = "new"
+    clock.now = 150
+    assert ssm_mod.get_id("key") == "new"
+    assert fake.calls["get_parameter"] == 1
+
+
+def test_invalidate_scopes(ssm_mod, monkeypatch):
+    fake = FakeSSM({**_params(2), **_params(2, env="prod")})
+    ssm_mod._SSM = fake
+    ssm_mod.get_id("p00")
+    monkeypatch.setenv("TLFIF_ENV", "prod")
+    ssm_mod.get_id("p00")
+    assert ssm_mod.cache_stats()["size"] == 4
+
+    ssm_mod.invalidate("p01", env="prod")
+    assert ssm_mod.cache_stats()["size"] == 3
+    ssm_mod.invalidate(env="dev")
+    assert ssm_mod.cache_stats()["size"] == 1
+    ssm_mod.invalidate()
+    assert ssm_mod.cache_stats()["size"] == 0
@@ -0,0 +1,97 @@
+import json
+import threading
+import time
+
+import pytest
+
+from tinyllama.worker.batching import BatchScheduler, bucket_for
+from tinyllama.worker.consumer import Consumer
+from tinyllama.worker.inference import FakeBatchBackend, JobHandler
+from tinyllama.worker.local_sqs import InMemorySQS
+
+
+def test_full_batch_is_dispatched_without_waiting():
+    backend = FakeBatchBackend()
+    scheduler = BatchScheduler(backend, max_batch=4, max_wait=5.0)
+    started = time.monotonic()
+
+    futures = [scheduler.submit(f"p{i}") for i in range(4)]
+
+    assert [f.result(timeout=1) for f in futures] == [f"echo: p{i}" for i in range(4)]
+    assert time.monotonic() - started < 1
+    assert backend.batches == [4]
+    scheduler.close()
+
+
+def test_partial_batch_waits_for_max_wait():
+    backend = FakeBatchBackend()
+    scheduler = BatchScheduler(backend, max_batch=8, max_wait=0.1)
+    started = time.monotonic()
+
+    futures = [scheduler.submit(f"p{i}") for i in range(3)]
+    for f in futures:
+        f.result(timeout=2)
+
+    assert 0.1 <= time.monotonic() - started < 1
+    assert backend.batches == [3]
+    scheduler.close()
+
+
+def test_batches_group_prompts_of_similar_length():
+    seen = []
+
+    def generate(prompts):
+        seen.append(sorted(bucket_for(len(p) // 4 + 1) for p in prompts))
+        return prompts
+
+    scheduler = BatchScheduler(generate, max_batch=4, max_wait=0.05)
+    prompts = ["short"] * 4 + ["x" * 2000] * 4
+    futures = [scheduler.submit(p) for p in prompts[::2] + prompts[1::2]]   # interleaved arrival
+    for f in futures:
+        f.result(timeout=2)
+    scheduler.close()
+
+    assert all(len(set(batch)) == 1 for batch in seen)
+    assert scheduler.padding_waste == 0.0
+
+
+def test_backend_error_fails_the_whole_batch():
+    def broken(prompts):
+        raise RuntimeError("CUDA out of memory")
+
+    scheduler = BatchScheduler(broken, max_batch=2, max_wait=0.01)
+    futures = [scheduler.submit("a"), scheduler.submit("b")]
+
+    for f in futures:
+        with pytest.raises(RuntimeError, match="out of memory"):
+            f.result(timeout=1)
+    assert scheduler.stats["errors"] == 1
+    scheduler.close()
+
+
+def test_close_flushes_queued_jobs():
+    scheduler = BatchScheduler(FakeBatchBackend(), max_batch=8, max_wait=60)
+    future = scheduler.submit("late")
+
+    scheduler.close()
+
+    assert future.result(timeout=0) == "echo: late"
+    with pytest.raises(RuntimeError):
+        scheduler.submit("after close")
+
+
+def test_consumer_jobs_are_batched():
+    sqs = InMemorySQS()
+    for i in range(16):
+        sqs.send_message(MessageBody=json.dumps({"prompt": f"p{i}", "request_id": f"r{i}"}),
+                         MessageGroupId=f"g{i}")
+    backend = FakeBatchBackend(base_ms=20)
+    scheduler = BatchScheduler(backend, max_batch=8, max_wait=0.02)
+    outputs = []
+
+    Consumer(sqs, "local", JobHandler(scheduler), concurrency=8, wait_seconds=0.2,
+             on_result=lambda job, res: outputs.append(res)).run(until_empty=True)
+    scheduler.close()
+
+    assert sorted(o["output"] for o in outputs) == sorted(f"echo: p{i}" for i in range(16))
+    assert sum(backend.batches) == 16 and len(backend.batches) < 16
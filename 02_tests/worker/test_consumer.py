@@ -0,0 +1,187 @@
+import json
+import threading
+import time
+
+import pytest
+
+import tinyllama.router.handler as handler
+import tinyllama.utils.jwt_tools as jt
+from tinyllama.utils import envelope
+from tinyllama.utils.envelope import JobVerifier
+from tinyllama.worker.consumer import Consumer
+from tinyllama.worker.inference import JobHandler
+from tinyllama.worker.local_sqs import InMemorySQS
+
+ISS = "https://cognito-idp.eu-central-1.amazonaws.com/eu-central-1_TEST"
+AUD = "local-test-client-id"
+KEY = "0123456789abcdef0123456789abcdef"
+URL = "local"
+
+
+def _fill(sqs, n, groups=4):
+    for i in range(n):
+        sqs.send_message(MessageBody=json.dumps({"prompt": f"p{i}", "request_id": f"r{i}"}),
+                         MessageGroupId=f"g{i % groups}")
+
+
+def _consumer(sqs, handle, **kw):
+    kw.setdefault("wait_seconds", 0.2)
+    return Consumer(sqs, URL, handle, **kw)
+
+
+def test_consumes_router_messages_with_verified_envelope(monkeypatch):
+    sqs = InMemorySQS()
+    monkeypatch.setattr(handler, "_sqs", sqs)
+    monkeypatch.setattr(handler, "QUEUE_URL", URL)
+    monkeypatch.setattr(envelope, "signing_key", lambda: KEY)
+    token = jt.make_token(iss=ISS, aud=AUD)
+    for prompt in ("one", "two"):
+        handler.lambda_handler({"headers": {"authorization": f"Bearer {token}"},
+                                "body": json.dumps({"prompt": prompt, "idle": 5})}, None)
+
+    results = []
+    consumer = _consumer(sqs, JobHandler(), verifier=JobVerifier(lambda: envelope._key_map(KEY)),
+                         on_result=lambda job, res: results.append((job.claims["sub"], res["output"])))
+    stats = consumer.run(until_empty=True)
+
+    assert results == [("test-user", "echo: one"), ("test-user", "echo: two")]   # one group: in order
+    assert stats["deleted"] == 2 and len(sqs) == 0
+
+
+def test_forged_messages_are_dropped_not_retried():
+    sqs = InMemorySQS()
+    sqs.send_message(MessageBody=json.dumps({"prompt": "x", "request_id": "r", "job": "v1.a.b"}),
+                     MessageGroupId="g")
+    handled = []
+
+    stats = _consumer(sqs, handled.append, verifier=JobVerifier(lambda: envelope._key_map(KEY))) \
+        .run(until_empty=True)
+
+    assert handled == [] and stats["rejected"] == 1 and len(sqs) == 0
+
+
+def test_expired_envelope_is_dropped_with_a_failed_result():
+    sqs = InMemorySQS()
+    job = envelope.sign("alice", 1000, "r-old", "hi", KEY, grace=0)
+    sqs.send_message(MessageBody=json.dumps({"prompt": "hi", "request_id": "r-old", "job": job}),
+                     MessageGroupId="g")
+    handled, failures = [], []
+
+    stats = _consumer(sqs, handled.append, verifier=JobVerifier(lambda: envelope._key_map(KEY)),
+                      on_failure=lambda job, error: failures.append((job.request_id, job.sub, error))) \
+        .run(until_empty=True)
+
+    assert handled == [] and stats["rejected"] == 1 and len(sqs) == 0
+    assert failures == [("r-old", "alice", "envelope_expired")]
+
+
+def test_key_outage_retries_instead_of_dropping():
+    sqs = InMemorySQS()
+    job = envelope.sign("alice", 2_000_000_000, "r-1", "hi", KEY)
+    sqs.send_message(MessageBody=json.dumps({"prompt": "hi", "request_id": "r-1", "job": job}),
+                     MessageGroupId="g")
+    loads = []
+
+    def flaky_loader():
+        loads.append(1)
+        if len(loads) == 1:
+            raise RuntimeError("ssm throttled")
+        return envelope._key_map(KEY)
+
+    handled = []
+    stats = _consumer(sqs, handled.append, failure_visibility=0,
+                      verifier=JobVerifier(flaky_loader)).run(until_empty=True)
+
+    assert [j.receive_count for j in handled] == [2]
+    assert stats["deferred"] == 1 and stats["rejected"] == 0 and len(sqs) == 0
+
+
+def test_receives_at_most_ten_and_deletes_in_batches():
+    sqs = InMemorySQS()
+    _fill(sqs, 30, groups=30)
+    batches = []
+    original = sqs.delete_message_batch
+
+    def delete_batch(**kw):
+        batches.append(len(kw["Entries"]))
+        return original(**kw)
+
+    sqs.delete_message_batch = delete_batch
+    stats = _consumer(sqs, lambda job: None, concurrency=16).run(until_empty=True)
+
+    assert stats["processed"] == 30 and len(sqs) == 0
+    assert max(batches) <= 10 and len(batches) < 30
+    assert sqs.calls.get("delete_message", 0) == 0
+
+
+def test_concurrency_limit_is_honoured():
+    sqs = InMemorySQS()
+    _fill(sqs, 20, groups=20)
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def handle(job):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+
+    _consumer(sqs, handle, concurrency=3).run(until_empty=True)
+
+    assert peak[0] == 3
+
+
+def test_long_job_visibility_is_extended():
+    sqs = InMemorySQS(visibility_timeout=1)
+    _fill(sqs, 1)
+    calls = []
+
+    def slow(job):
+        calls.append(job.message_id)
+        time.sleep(2.5)
+
+    stats = _consumer(sqs, slow, visibility_timeout=1, concurrency=2).run(until_empty=True)
+
+    assert len(calls) == 1                          # never redelivered mid-job
+    assert stats["extended"] >= 2 and len(sqs) == 0
+
+
+def test_failed_job_becomes_visible_again():
+    sqs = InMemorySQS()
+    _fill(sqs, 1)
+    attempts = []
+
+    def flaky(job):
+        attempts.append(job.receive_count)
+        if len(attempts) == 1:
+            raise RuntimeError("gpu fell over")
+
+    stats = _consumer(sqs, flaky, failure_visibility=0).run(until_empty=True)
+
+    assert attempts == [1, 2]
+    assert stats["failed"] == 1 and stats["processed"] == 1 and len(sqs) == 0
+
+
+def test_stop_drains_in_flight_jobs():
+    sqs = InMemorySQS()
+    _fill(sqs, 50, groups=50)
+    started = threading.Event()
+
+    def handle(job):
+        started.set()
+        time.sleep(0.1)
+
+    consumer = _consumer(sqs, handle, concurrency=4)
+    runner = threading.Thread(target=consumer.run)
+    runner.start()
+    assert started.wait(2)
+    consumer.stop()
+    runner.join(5)
+
+    assert not runner.is_alive()
+    stats = consumer.stats
+    assert stats["processed"] == stats["deleted"] > 0
+    assert len(sqs) == 50 - stats["processed"]
+    assert int(sqs.get_queue_attributes()["Attributes"]["ApproximateNumberOfMessagesNotVisible"]) \
+        == stats["received"] - stats["processed"]
@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+from tinyllama.utils import metrics
+from tinyllama.worker.consumer import Consumer
+from tinyllama.worker.idle import Ec2StopAction, IdleController, LocalStopStub
+from tinyllama.worker.local_sqs import InMemorySQS
+
+
+@pytest.fixture
+def emitted():
+    records = []
+    previous = metrics.set_sink(records.append)
+    yield records
+    metrics.set_sink(previous)
+
+
+def _controller(now, initial=5):
+    stub = LocalStopStub()
+    return IdleController(stub, initial_idle_minutes=initial, clock=lambda: now[0]), stub
+
+
+def test_stops_after_initial_window_without_jobs(emitted):
+    now = [0.0]
+    idle, stub = _controller(now)
+
+    now[0] = 299
+    assert not idle.check()
+    now[0] = 300
+    assert idle.check() and len(stub.calls) == 1
+    assert idle.check() and len(stub.calls) == 1          # only once
+    assert [r["AutoStops"] for r in emitted] == [1]
+
+
+def test_completed_job_moves_deadline_to_its_idle_window():
+    now = [0.0]
+    idle, stub = _controller(now)
+    now[0] = 200
+    idle.job_started()
+    idle.job_finished(10)
+
+    now[0] = 799
+    assert not idle.check()
+    now[0] = 800
+    assert idle.check() and stub.calls
+
+
+def test_longest_requested_window_wins():
+    now = [0.0]
+    idle, stub = _controller(now, initial=1)
+    idle.job_started()
+    idle.job_finished(30)
+    now[0] = 60
+    idle.job_started()
+    idle.job_finished(1)                       # shorter request must not cut the 30 min short
+
+    now[0] = 1799
+    assert not idle.check()
+    now[0] = 1800
+    assert idle.check()
+
+
+def test_never_stops_while_a_job_runs():
+    now = [0.0]
+    idle, stub = _controller(now, initial=1)
+    idle.job_started()
+
+    now[0] = 3600
+    assert not idle.check() and not stub.calls
+    idle.job_finished(2)
+    now[0] = 3600 + 119
+    assert not idle.check()
+    now[0] = 3600 + 120
+    assert idle.check()
+
+
+def test_failing_stop_action_still_counts_as_stopped(emitted):
+    now = [0.0]
+
+    def broken():
+        raise RuntimeError("UnauthorizedOperation")
+
+    idle = IdleController(broken, initial_idle_minutes=0, clock=lambda: now[0])
+
+    assert idle.check()
+    assert emitted[0]["AutoStops"] == 1
+
+
+def test_consumer_reports_jobs_to_the_controller():
+    now = [0.0]
+    idle, stub = _controller(now, initial=0)
+    sqs = InMemorySQS()
+    sqs.send_message(MessageBody=json.dumps({"prompt": "hi", "idle": 7, "request_id": "r"}),
+                     MessageGroupId="g")
+
+    Consumer(sqs, "local", lambda job: None, wait_seconds=0.1, idle=idle).run(until_empty=True)
+
+    assert idle.remaining() == 7 * 60 and not idle.check()
+
+
+def test_ec2_action_stops_this_instance():
+    calls = []
+
+    class EC2:
+        def stop_instances(self, **kw):
+            calls.append(kw)
+
+    Ec2StopAction("i-0123456789abcdef0", client=EC2())()
+
+    assert calls == [{"InstanceIds": ["i-0123456789abcdef0"]}]
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from tinyllama.worker import __main__ as worker_main
+from tinyllama.worker.inference import fake_generate
+
+
+def test_real_queue_needs_a_model(monkeypatch):
+    monkeypatch.delenv("WORKER_GENERATE", raising=False)
+
+    with pytest.raises(SystemExit) as exc:
+        worker_main.main(["--queue-backend", "memory"])
+    assert exc.value.code == 2
+
+
+@pytest.mark.parametrize("argv", [
+    ["--generate", "tinyllama.worker.inference:fake_generate"],                       # batching on by default
+    ["--generate", "tinyllama.worker.inference:fake_generate", "--max-batch", "1", "--stream"],
+    ["--generate", "tinyllama.worker.inference:no_such_model", "--max-batch", "1"],
+])
+def test_incomplete_model_is_refused(argv):
+    with pytest.raises(SystemExit) as exc:
+        worker_main.main(["--queue-backend", "memory", *argv])
+    assert exc.value.code == 2
+
+
+def test_model_is_loaded_by_name():
+    assert worker_main._load("tinyllama.worker.inference:fake_generate") is fake_generate
+    with pytest.raises(ValueError):
+        worker_main._load("tinyllama.worker.inference")
+
+
+def test_local_run_uses_the_echo_backend_without_a_cache(monkeypatch, capsys):
+    monkeypatch.setenv("RESPONSE_CACHE_URL", "memory")
+    monkeypatch.setattr(worker_main.signal, "signal", lambda *a: None)     # keep pytest's handlers
+
+    assert worker_main.main(["--local", "3", "--max-batch", "1", "--idle-minutes", "60"]) == 0
+
+    stats = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert stats["processed"] == 3 and "cache" not in stats
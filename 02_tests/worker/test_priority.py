@@ -0,0 +1,160 @@
+import json
+import threading
+import time
+
+import pytest
+
+import tinyllama.router.handler as handler
+import tinyllama.utils.jwt_tools as jt
+from tinyllama.worker.consumer import Consumer
+from tinyllama.worker.local_sqs import InMemorySQS
+from tinyllama.worker.priority import PriorityScheduler
+
+ISS = "https://cognito-idp.eu-central-1.amazonaws.com/eu-central-1_TEST"
+AUD = "local-test-client-id"
+
+
+def _scheduler(now, **kw):
+    return PriorityScheduler(clock=lambda: now[0], **kw)
+
+
+def test_short_job_overtakes_long_one():
+    now = [0.0]
+    s = _scheduler(now)
+    s.push("long", work=1500)
+    now[0] = 0.1
+    s.push("short", work=5)
+
+    assert [s.pop(), s.pop()] == ["short", "long"]
+    assert s.stats["overtaken"] == 1
+
+
+def test_priority_outranks_equal_work_and_fifo_breaks_ties():
+    now = [0.0]
+    s = _scheduler(now)
+    for name, prio in [("a", 5), ("b", 5), ("urgent", 9), ("background", 0)]:
+        s.push(name, work=100, priority=prio)
+
+    assert [s.pop() for _ in range(4)] == ["urgent", "a", "b", "background"]
+
+
+def test_aging_bounds_wait_of_a_long_job():
+    now = [0.0]
+    s = _scheduler(now, aging_tokens_per_sec=200)
+    s.push("long", work=1500)
+    served_at = None
+    for tick in range(1, 200):                  # a short job arrives and runs every 0.1 s
+        now[0] = tick * 0.1
+        s.push(f"short{tick}", work=5)
+        if s.pop() == "long":
+            served_at = now[0]
+            break
+
+    assert served_at is not None and served_at <= (1500 - 5) / 200 + 0.1
+
+
+def test_pop_returns_none_when_closed_and_drain_empties():
+    s = PriorityScheduler()
+    s.push("x", work=1)
+
+    assert s.drain() == ["x"] and len(s) == 0
+    assert s.pop(timeout=0.01) is None
+    s.close()
+    assert s.pop() is None
+    with pytest.raises(RuntimeError):
+        s.push("y")
+
+
+def test_consumer_runs_short_prompts_before_a_long_one():
+    sqs = InMemorySQS()
+    prompts = ["warm", "x" * 6000] + [f"short {i}" for i in range(5)]
+    for i, prompt in enumerate(prompts):
+        sqs.send_message(MessageBody=json.dumps({"prompt": prompt, "request_id": f"r{i}"}),
+                         MessageGroupId=f"g{i}")
+    order = []
+
+    def handle(job):
+        order.append(job.request_id)
+        time.sleep(0.1 if job.request_id == "r0" else 0)
+
+    stats = Consumer(sqs, "local", handle, concurrency=1, wait_seconds=0.2,
+                     scheduler=PriorityScheduler()).run(until_empty=True)
+
+    assert order[-1] == "r1"
+    assert stats["processed"] == 7 and len(sqs) == 0
+
+
+def test_stop_releases_prefetched_jobs():
+    sqs = InMemorySQS()
+    for i in range(20):
+        sqs.send_message(MessageBody=json.dumps({"prompt": "p", "request_id": f"r{i}"}),
+                         MessageGroupId=f"g{i}")
+    started = threading.Event()
+
+    def handle(job):
+        started.set()
+        time.sleep(0.2)
+
+    consumer = Consumer(sqs, "local", handle, concurrency=1, prefetch=10, wait_seconds=0.2,
+                        scheduler=PriorityScheduler())
+    runner = threading.Thread(target=consumer.run)
+    runner.start()
+    assert started.wait(2)
+    consumer.stop()
+    runner.join(5)
+
+    visible = int(sqs.get_queue_attributes()["Attributes"]["ApproximateNumberOfMessages"])
+    assert visible == 20 - consumer.stats["processed"]
+
+
+# ---------------------------------------------------------------------------
+#  Router: priority field
+# ---------------------------------------------------------------------------
+class _SQS:
+    def __init__(self):
+        self.bodies = []
+
+    def send_message(self, **kw):
+        self.bodies.append(json.loads(kw["MessageBody"]))
+        return {"MessageId": "m-1"}
+
+    def send_message_batch(self, *, QueueUrl, Entries):
+        self.bodies.extend(json.loads(e["MessageBody"]) for e in Entries)
+        return {"Successful": [{"Id": e["Id"], "MessageId": "m"} for e in Entries]}
+
+
+def _post(monkeypatch, body, path="/infer"):
+    sqs = _SQS()
+    monkeypatch.setattr(handler, "_sqs", sqs)
+    monkeypatch.setattr(handler, "QUEUE_URL", "https://dummy-queue-url")
+    token = jt.make_token(iss=ISS, aud=AUD)
+    resp = handler.lambda_handler({"rawPath": path, "headers": {"authorization": f"Bearer {token}"},
+                                   "body": json.dumps(body)}, None)
+    return resp, sqs.bodies
+
+
+def test_router_forwards_valid_priority(monkeypatch):
+    resp, bodies = _post(monkeypatch, {"prompt": "hi", "idle": 5, "priority": 9})
+
+    assert resp["statusCode"] == 202 and bodies[0]["priority"] == 9
+
+
+def test_router_omits_priority_when_not_sent(monkeypatch):
+    resp, bodies = _post(monkeypatch, {"prompt": "hi", "idle": 5})
+
+    assert resp["statusCode"] == 202 and "priority" not in bodies[0]
+
+
+@pytest.mark.parametrize("priority", [10, -1, "high", True, 2.5])
+def test_router_rejects_invalid_priority(monkeypatch, priority):
+    resp, bodies = _post(monkeypatch, {"prompt": "hi", "idle": 5, "priority": priority})
+
+    assert resp["statusCode"] == 400 and bodies == []
+
+
+def test_batch_items_carry_their_own_or_the_shared_priority(monkeypatch):
+    resp, bodies = _post(monkeypatch, {"idle": 5, "priority": 2, "prompts": [
+        "a", {"prompt": "b", "priority": 8}, {"prompt": "c", "priority": 42}]}, path="/infer/batch")
+
+    assert [b["priority"] for b in bodies] == [2, 8]
+    assert json.loads(resp["body"])["failed"][0]["index"] == 2
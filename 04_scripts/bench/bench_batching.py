@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Benchmark: dynamic batching throughput and latency vs max-wait.
+
+Jobs arrive as a Poisson stream at --rate per second with mixed prompt
+lengths and go through BatchScheduler into the CPU stand-in backend
+(FakeBatchBackend: fixed cost per batch plus per-token cost of the longest
+prompt). max-wait 0 with max-batch 1 is the unbatched baseline.
+
+Run from the repo root:
+    python 04_scripts/bench/bench_batching.py [--rate 200] [--jobs 600] [--max-batch 8]
+"""
+from __future__ import annotations
+import argparse
+import random
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT / "01_src"))
+
+from tinyllama.worker.batching import BatchScheduler  # noqa: E402
+from tinyllama.worker.inference import FakeBatchBackend  # noqa: E402
+
+WAITS_MS = [0, 2, 5, 10, 20, 50]
+
+
+def _prompts(n: int, seed: int = 0) -> list:
+    rnd = random.Random(seed)
+    # mostly short chat prompts, some long ones up to MAX_PROMPT_BYTES
+    return ["x" * (rnd.randint(20, 400) if rnd.random() < 0.8 else rnd.randint(1000, 6000))
+            for _ in range(n)]
+
+
+def run(prompts, rate, max_batch, max_wait_ms, args):
+    backend = FakeBatchBackend(args.base_ms, args.ms_per_token, args.ms_per_item)
+    scheduler = BatchScheduler(backend, max_batch=max_batch, max_wait=max_wait_ms / 1000)
+    latencies, lock, done = [], threading.Lock(), threading.Event()
+    rnd = random.Random(1)
+
+    def finished(started):
+        def cb(_):
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                if len(latencies) == len(prompts):
+                    done.set()
+        return cb
+
+    t0 = time.perf_counter()
+    next_at = t0
+    for p in prompts:
+        next_at += rnd.expovariate(rate)
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        scheduler.submit(p).add_done_callback(finished(time.perf_counter()))
+    done.wait()
+    elapsed = time.perf_counter() - t0
+    scheduler.close()
+
+    ordered = sorted(latencies)
+    return {
+        "throughput": len(prompts) / elapsed,
+        "p50": ordered[len(ordered) // 2] * 1000,
+        "p95": ordered[int(len(ordered) * 0.95) - 1] * 1000,
+        "mean_batch": statistics.mean(backend.batches),
+        "waste": scheduler.padding_waste,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rate", type=float, default=200.0, help="arrivals per second")
+    ap.add_argument("--jobs", type=int, default=600)
+    ap.add_argument("--max-batch", type=int, default=8)
+    ap.add_argument("--base-ms", type=float, default=4.0, help="fixed cost per batch")
+    ap.add_argument("--ms-per-token", type=float, default=0.005, help="cost per token of the longest prompt")
+    ap.add_argument("--ms-per-item", type=float, default=0.2, help="marginal cost per prompt in a batch")
+    args = ap.parse_args()
+
+    prompts = _prompts(args.jobs)
+    print(f"{args.jobs} jobs at {args.rate:.0f}/s, backend {args.base_ms} ms/batch "
+          f"+ {args.ms_per_token} ms/token + {args.ms_per_item} ms/item\n")
+    print(f"{'max-batch':>9} {'max-wait ms':>11} {'jobs/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'batch':>6} {'padding':>8}")
+    rows = [(1, 0)] + [(args.max_batch, w) for w in WAITS_MS]
+    for max_batch, wait in rows:
+        r = run(prompts, args.rate, max_batch, wait, args)
+        print(f"{max_batch:>9} {wait:>11} {r['throughput']:>8.1f} {r['p50']:>8.1f} {r['p95']:>8.1f} "
+              f"{r['mean_batch']:>6.2f} {r['waste']:>7.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark: per-request RS256 verify cost.
+
+Compares the three ways a token has been checked in this repo:
+  raw-dict   – jwt.decode(token, <raw JWK dict>)      (old api/security.py)
+  construct  – jwt.decode(token, jwk.construct(...))  (old utils/auth.py)
+  prebuilt   – jwt.decode(token, <cached key object>) (current)
+plus what a queue consumer pays for the router's signed job envelope:
+  envelope   – envelope.verify_job(message, <hmac key>)
+
+Run from the repo root:
+    python 04_scripts/bench/bench_jwt_verify.py [--n 500]
+"""
+from __future__ import annotations
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT / "01_src"))
+
+from jose import jwk, jwt                                  # noqa: E402
+from tinyllama.utils import envelope                       # noqa: E402
+from tinyllama.utils.jwt_tools import JWKS_PATH, make_token  # noqa: E402
+
+ISS = "https://example.com/dev"
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--n", type=int, default=500, help="verifications per variant")
+    args = p.parse_args()
+
+    entry = json.loads(JWKS_PATH.read_text())["keys"][0]
+    prebuilt = jwk.construct(entry, "RS256")
+    token = make_token(iss=ISS)
+    opts = {"verify_aud": False}
+    hmac_keys = {envelope.key_id("bench-envelope-key-0123456789"): b"bench-envelope-key-0123456789"}
+    message = {"prompt": "hello", "request_id": "r-1"}
+    message["job"] = envelope.sign("bench", 4_000_000_000, "r-1", "hello", "bench-envelope-key-0123456789")
+
+    variants = {
+        "raw-dict":  lambda: jwt.decode(token, entry, algorithms=["RS256"], options=opts, issuer=ISS),
+        "construct": lambda: jwt.decode(token, jwk.construct(entry, "RS256"),
+                                        algorithms=["RS256"], options=opts, issuer=ISS),
+        "prebuilt":  lambda: jwt.decode(token, prebuilt, algorithms=["RS256"], options=opts, issuer=ISS),
+        "envelope":  lambda: envelope.verify_job(message, hmac_keys),
+    }
+
+    baseline = None
+    for name, fn in variants.items():
+        fn()                                                # warm-up
+        per_call = min(timeit.repeat(fn, number=args.n, repeat=3)) / args.n
+        baseline = baseline or per_call
+        print(f"{name:<10} {per_call * 1e6:9.1f} µs/verify   x{baseline / per_call:4.2f}")
+
+
+if __name__ == "__main__":
+    main()
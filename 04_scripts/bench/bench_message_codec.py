@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Benchmark: SQS message bytes before / after the router message codec.
+
+"before" is the old body: json.dumps({token, prompt, idle, request_id}).
+"after"  is what the router sends now: claims digest instead of the token,
+compressed with --compression, S3 claim-check above --offload-kb (the S3
+object is written to an in-process stand-in and counted separately).
+
+Run from the repo root:
+    python 04_scripts/bench/bench_message_codec.py [--compression zlib] [--offload-kb 64]
+"""
+from __future__ import annotations
+import argparse
+import io
+import json
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT / "01_src"))
+
+from tinyllama.utils.codec import MessageCodec  # noqa: E402
+
+SIZES = [200, 2 * 1024, 6 * 1024, 32 * 1024, 128 * 1024, 240 * 1024]
+
+
+class MemS3:
+    def __init__(self) -> None:
+        self.objects: dict = {}
+
+    def put_object(self, *, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = Body
+
+    def get_object(self, *, Bucket, Key):
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+
+def _text(n: int) -> str:
+    rnd = random.Random(n)
+    words = ["".join(rnd.choices(string.ascii_lowercase, k=rnd.randint(2, 9))) for _ in range(400)]
+    out, size = [], 0
+    while size < n:
+        w = rnd.choice(words)
+        out.append(w)
+        size += len(w) + 1
+    return " ".join(out)[:n]
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--compression", default="zlib", choices=["zlib", "zstd", "none"])
+    p.add_argument("--offload-kb", type=int, default=64)
+    args = p.parse_args()
+
+    token = "eyJ" + "A" * 1000                      # typical Cognito access token length
+    claims = {"sub": "0f1e2d3c-4b5a-6978-8796-a5b4c3d2e1f0", "exp": 1_900_000_000,
+              "tdig": "q1w2e3r4t5y6u7i8o9p0aa"}
+    s3 = MemS3()
+    codec = MessageCodec(compression=args.compression, offload_bytes=args.offload_kb * 1024,
+                         bucket="bench", s3=s3)
+
+    print(f"{'prompt':>9} {'before':>9} {'after':>9} {'s3':>9} {'ratio':>7} {'enc µs':>8}")
+    for n in SIZES:
+        prompt = _text(n)
+        before = json.dumps({"token": token, "prompt": prompt, "idle": 5, "request_id": "r" * 36})
+        message = {"claims": claims, "prompt": prompt, "idle": 5, "request_id": "r" * 36}
+        s3.objects.clear()
+        t0 = time.perf_counter()
+        after = codec.encode(message)
+        enc_us = (time.perf_counter() - t0) * 1e6
+        assert codec.decode(after) == message
+        offloaded = sum(len(v) for v in s3.objects.values())
+        print(f"{n:>9} {len(before):>9} {len(after):>9} {offloaded:>9} "
+              f"{len(before) / len(after):>6.1f}x {enc_us:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
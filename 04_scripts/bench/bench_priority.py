@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+Benchmark (simulation): job latency under FIFO vs shortest-job-first with
+priority and aging.
+
+Discrete-event simulation of one inference worker fed by Poisson arrivals
+with mixed prompt sizes (mostly one-liners, some prompts up to
+MAX_PROMPT_BYTES). Service time is --base-ms plus --ms-per-token per
+estimated token. Every policy runs the same arrival trace through
+PriorityScheduler on a simulated clock:
+
+  fifo       rank by arrival only
+  sjf        rank by estimated work, (almost) no aging
+  sjf+aging  the worker defaults (WORKER_AGING_TOKENS_PER_SEC)
+
+Run from the repo root:
+    python 04_scripts/bench/bench_priority.py [--load 0.85] [--jobs 20000]
+"""
+from __future__ import annotations
+import argparse
+import random
+import statistics
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT / "01_src"))
+
+from tinyllama.utils.schema import MAX_PROMPT_BYTES, PRIORITY_DEFAULT  # noqa: E402
+from tinyllama.worker.inference import estimate_tokens  # noqa: E402
+from tinyllama.worker.priority import (  # noqa: E402
+    WORKER_AGING_TOKENS_PER_SEC, WORKER_PRIORITY_TOKENS, PriorityScheduler,
+)
+
+
+def trace(n, load, args, seed=0):
+    """[(arrival_s, tokens, priority)] with mean utilisation *load*."""
+    rnd = random.Random(seed)
+    jobs = []
+    for _ in range(n):
+        chars = rnd.randint(20, 400) if rnd.random() < 0.8 else rnd.randint(1000, MAX_PROMPT_BYTES)
+        priority = 9 if rnd.random() < args.urgent else PRIORITY_DEFAULT
+        jobs.append((estimate_tokens("x" * chars), priority))
+    mean_service = statistics.mean(service_s(t, args) for t, _ in jobs)
+    rate = load / mean_service
+    t, out = 0.0, []
+    for tokens, priority in jobs:
+        t += rnd.expovariate(rate)
+        out.append((t, tokens, priority))
+    return out
+
+
+def service_s(tokens, args):
+    return (args.base_ms + tokens * args.ms_per_token) / 1000
+
+
+def simulate(jobs, scheduler, now, args, ranked=True):
+    """Single server; returns per-job latency (s) as [(tokens, priority, latency)]."""
+    done, i, busy_until = [], 0, 0.0
+    while i < len(jobs) or len(scheduler):
+        if len(scheduler) and (i == len(jobs) or busy_until <= jobs[i][0]):
+            now[0] = max(busy_until, now[0])
+            arrival, tokens, priority = scheduler.pop()
+            busy_until = now[0] + service_s(tokens, args)
+            done.append((tokens, priority, busy_until - arrival))
+        else:
+            now[0] = jobs[i][0]
+            if ranked:
+                scheduler.push(jobs[i], work=jobs[i][1], priority=jobs[i][2])
+            else:
+                scheduler.push(jobs[i])
+            i += 1
+    return done
+
+
+def summary(latencies):
+    ordered = sorted(latencies)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000
+    return statistics.mean(ordered) * 1000, pick(0.95), pick(0.99), ordered[-1] * 1000
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--jobs", type=int, default=20000)
+    ap.add_argument("--load", type=float, default=0.85, help="mean server utilisation")
+    ap.add_argument("--base-ms", type=float, default=50.0)
+    ap.add_argument("--ms-per-token", type=float, default=1.0)
+    ap.add_argument("--urgent", type=float, default=0.05, help="share of jobs sent with priority 9")
+    ap.add_argument("--aging", type=float, default=WORKER_AGING_TOKENS_PER_SEC)
+    args = ap.parse_args()
+
+    jobs = trace(args.jobs, args.load, args)
+    policies = {
+        "fifo": dict(priority_tokens=0, work=False, aging=1.0),
+        "sjf": dict(priority_tokens=WORKER_PRIORITY_TOKENS, work=True, aging=1e-9),
+        "sjf+aging": dict(priority_tokens=WORKER_PRIORITY_TOKENS, work=True, aging=args.aging),
+    }
+    print(f"{args.jobs} jobs, load {args.load:.0%}, service {args.base_ms} ms + "
+          f"{args.ms_per_token} ms/token, {args.urgent:.0%} urgent\n")
+    print(f"{'policy':<10} {'class':<7} {'mean ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>10}")
+    for name, p in policies.items():
+        now = [0.0]
+        scheduler = PriorityScheduler(p["priority_tokens"], p["aging"], clock=lambda: now[0])
+        done = simulate(jobs, scheduler, now, args, ranked=p["work"])
+        classes = {
+            "all": [l for _, _, l in done],
+            "short": [l for t, _, l in done if t <= 101],
+            "long": [l for t, _, l in done if t > 101],
+            "urgent": [l for _, pr, l in done if pr > PRIORITY_DEFAULT],
+        }
+        for cls, lat in classes.items():
+            mean, p95, p99, worst = summary(lat)
+            print(f"{name:<10} {cls:<7} {mean:>9.0f} {p95:>9.0f} {p99:>9.0f} {worst:>10.0f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+Benchmark: enqueue-to-dequeue latency and throughput per tinyllama.queue
+backend.
+
+One producer thread enqueues --messages bodies stamped with their send time
+(singly, or in enqueue_batch calls of --batch); --consumers threads receive
+up to 10 at a time, record send-to-receive latency and ack in one call per
+receive. Each backend runs twice:
+
+  burst   producer as fast as it can: throughput (received msgs/s)
+  paced   producer at --rate msgs/s: latency without a standing backlog
+
+Backends:
+  memory      InProcessQueue
+  sqs-local   SqsQueue over worker.local_sqs.InMemorySQS (FIFO group locking)
+  redis       RedisStreamQueue, with --redis-url (needs redis-py)
+  sqs         SqsQueue on a real queue, with --sqs-url (network round trips)
+
+Run from the repo root:
+    python 04_scripts/bench/bench_queue.py [--messages 5000] [--rate 500]
+    python 04_scripts/bench/bench_queue.py --redis-url redis://localhost:6379/0
+"""
+from __future__ import annotations
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT / "01_src"))
+
+from tinyllama.queue.backends import InProcessQueue, RedisStreamQueue, SqsQueue  # noqa: E402
+from tinyllama.worker.local_sqs import InMemorySQS  # noqa: E402
+
+
+def make_backends(args):
+    """[(name, factory, cleanup)]; each factory returns a fresh, empty queue."""
+    out = [
+        ("memory", InProcessQueue, None),
+        ("sqs-local", lambda: SqsQueue("local", client=InMemorySQS()), None),
+    ]
+    if args.redis_url:
+        import redis
+        client = redis.Redis.from_url(args.redis_url)
+
+        def redis_queue():
+            return RedisStreamQueue(client, name=f"bench-{uuid.uuid4().hex[:8]}")
+
+        out.append(("redis", redis_queue, lambda q: client.delete(q.key)))
+    if args.sqs_url:
+        out.append(("sqs", lambda: SqsQueue(args.sqs_url), None))
+    return out
+
+
+def run(queue, args, rate):
+    """Enqueue / receive / ack --messages bodies; (latencies_s, elapsed_s)."""
+    n = args.messages
+    latencies = []
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def consume():
+        while not done.is_set():
+            messages = queue.receive(10, wait_seconds=0.2, visibility=30)
+            now = time.perf_counter()
+            if not messages:
+                continue
+            queue.ack([m.receipt for m in messages])
+            with lock:
+                latencies.extend(now - json.loads(m.body)["t"] for m in messages)
+                if len(latencies) >= n:
+                    done.set()
+
+    consumers = [threading.Thread(target=consume, daemon=True) for _ in range(args.consumers)]
+    for t in consumers:
+        t.start()
+
+    start = time.perf_counter()
+    sent = 0
+    while sent < n:
+        size = min(args.batch, n - sent)
+        if rate:
+            delay = start + (sent + size) / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        stamp = json.dumps({"t": time.perf_counter()})
+        if size == 1:
+            queue.enqueue(stamp, group_id=f"g{sent % args.groups}")
+        else:
+            queue.enqueue_batch([{"id": str(i), "body": stamp, "group_id": f"g{(sent + i) % args.groups}"}
+                                 for i in range(size)])
+        sent += size
+    if not done.wait(args.timeout):
+        print(f"  timed out with {len(latencies)}/{n} received", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    done.set()
+    for t in consumers:
+        t.join()
+    return latencies, elapsed
+
+
+def summary(latencies):
+    ordered = sorted(latencies)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000
+    return pick(0.50), pick(0.95), pick(0.99), statistics.mean(ordered) * 1000
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--messages", type=int, default=5000)
+    ap.add_argument("--rate", type=float, default=500.0, help="paced run: messages per second")
+    ap.add_argument("--batch", type=int, default=1, help="enqueue_batch size; 1 sends singly")
+    ap.add_argument("--consumers", type=int, default=4)
+    ap.add_argument("--groups", type=int, default=64, help="distinct group ids (FIFO locking on sqs)")
+    ap.add_argument("--timeout", type=float, default=120.0)
+    ap.add_argument("--redis-url", default="")
+    ap.add_argument("--sqs-url", default="")
+    args = ap.parse_args()
+
+    print(f"{args.messages} messages, batch {args.batch}, {args.consumers} consumers, "
+          f"{args.groups} groups, paced at {args.rate:.0f}/s\n")
+    print(f"{'backend':<10} {'run':<6} {'msgs/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for name, factory, cleanup in make_backends(args):
+        for label, rate in (("burst", 0.0), ("paced", args.rate)):
+            queue = factory()
+            try:
+                latencies, elapsed = run(queue, args, rate)
+            finally:
+                if cleanup is not None:
+                    cleanup(queue)
+            if not latencies:
+                print(f"{name:<10} {label:<6} {'-':>9}")
+                continue
+            p50, p95, p99, mean = summary(latencies)
+            print(f"{name:<10} {label:<6} {len(latencies) / elapsed:>9.0f} "
+                  f"{p50:>8.2f} {p95:>8.2f} {p99:>8.2f} {mean:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""
+Benchmark: N sequential get_parameter calls vs. one bulk prefetch.
+
+Runs against an in-process fake SSM client that sleeps --latency-ms per
+API call, which is what dominates a real cold start.
+
+Run from the repo root:
+    python 04_scripts/bench/bench_ssm_prefetch.py [--n 12] [--latency-ms 25]
+"""
+from __future__ import annotations
+import argparse
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT / "01_src"))
+
+from tinyllama.utils import ssm  # noqa: E402
+
+
+class SlowFakeSSM:
+    def __init__(self, params: dict[str, str], latency_s: float) -> None:
+        self.params = params
+        self.latency_s = latency_s
+        self.calls = 0
+
+    def get_parameter(self, Name, WithDecryption=False):
+        self.calls += 1
+        time.sleep(self.latency_s)
+        return {"Parameter": {"Name": Name, "Value": self.params[Name]}}
+
+    def get_parameters_by_path(self, Path, Recursive, WithDecryption, NextToken=None):
+        self.calls += 1
+        time.sleep(self.latency_s)
+        names = sorted(n for n in self.params if n.startswith(Path))
+        start = int(NextToken or 0)
+        resp = {"Parameters": [{"Name": n, "Value": self.params[n]} for n in names[start:start + 10]]}
+        if start + 10 < len(names):
+            resp["NextToken"] = str(start + 10)
+        return resp
+
+
+def _run(label: str, fake: SlowFakeSSM, names: list[str], bulk: bool) -> float:
+    ssm.clear_cache()
+    ssm._SSM = fake
+    if not bulk:
+        ssm._PREFETCHED.add(ssm._env())          # force the old per-name behaviour
+    t0 = time.perf_counter()
+    for name in names:
+        ssm.get_id(name)
+    ms = (time.perf_counter() - t0) * 1000
+    print(f"{label:<12} {ms:8.1f} ms   {fake.calls:3d} SSM calls")
+    return ms
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--n", type=int, default=12, help="parameters resolved")
+    p.add_argument("--latency-ms", type=float, default=25.0, help="simulated per-call latency")
+    args = p.parse_args()
+
+    env = ssm._env()
+    params = {f"/tinyllama/{env}/param_{i:02d}": f"value-{i}" for i in range(args.n)}
+    names = [k.rsplit("/", 1)[1] for k in params]
+
+    seq = _run("sequential", SlowFakeSSM(params, args.latency_ms / 1000), names, bulk=False)
+    bulk = _run("prefetch", SlowFakeSSM(params, args.latency_ms / 1000), names, bulk=True)
+    print(f"speed-up    {seq / bulk:8.1f} x")
+
+
+if __name__ == "__main__":
+    main()
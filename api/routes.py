@@ -1,6 +1,17 @@
+import json
+import os
+import time
+
 from fastapi import FastAPI, Depends
+from fastapi.responses import StreamingResponse
+from tinyllama.utils.pubsub import TERMINAL, pubsub_from_env, stream_channel
 from .security import verify_jwt
 
+# SSE token stream: keep-alive comment every STREAM_KEEPALIVE_SECONDS (proxies
+# drop idle connections), give up after STREAM_MAX_SECONDS
+STREAM_KEEPALIVE_SECONDS = float(os.getenv("STREAM_KEEPALIVE_SECONDS", "15"))
+STREAM_MAX_SECONDS = float(os.getenv("STREAM_MAX_SECONDS", "300"))
+
 app = FastAPI(
     title="TinyLlama Edge API",
     version="0.0.0-draft",
@@ -15,3 +26,45 @@ async def ping():
 @app.post("/infer")
 def infer_stub(dep=Depends(verify_jwt)):
     return {"status": "ok"}
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _relay(request_id: str, user: str, bus):
+    """
+    Yield SSE frames for one job: token ... then done or error.
+    Nothing is relayed before a start message naming *user* as the owner;
+    a stream whose start is missing (never published, or trimmed away) is
+    refused rather than served to whoever asks.
+    """
+    subscription = bus.subscribe(stream_channel(request_id))
+    deadline = time.monotonic() + STREAM_MAX_SECONDS
+    seen_owner = False
+    try:
+        while time.monotonic() < deadline:
+            msg = subscription.get(timeout=min(STREAM_KEEPALIVE_SECONDS, deadline - time.monotonic()))
+            if msg is None:
+                yield ": keep-alive\n\n"
+                continue
+            if msg.get("type") == "start":
+                seen_owner = msg.get("sub") is not None and msg["sub"] == user
+            if not seen_owner:                  # unknown or other owner: not served
+                yield _sse("error", {"error": "forbidden"})
+                return
+            if msg.get("type") == "start":
+                continue
+            yield _sse(msg.get("type", "token"), msg)
+            if msg.get("type") in TERMINAL:
+                return
+        yield _sse("error", {"error": "timeout"})
+    finally:
+        subscription.close()
+
+@app.get("/infer/{request_id}/stream")
+def infer_stream(request_id: str, claims=Depends(verify_jwt)):
+    """Server-Sent Events relay of the worker's tokens for *request_id*."""
+    return StreamingResponse(
+        _relay(request_id, claims.get("sub"), pubsub_from_env()),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -3,8 +3,12 @@ from typing import Optional
 from fastapi import Header, HTTPException, status
 from jose import jwt, JWTError, ExpiredSignatureError
 import json, os, pathlib, requests
+from tinyllama.utils.jwks import JwksManager
+from tinyllama.utils.log import get_logger
 from .config import settings
 
+log = get_logger(__name__)
+
 # ─── Load JWKS ────────────────────────────────────────────────────────────────
 def _load_jwks() -> dict[str, dict]:
     local = os.getenv("LOCAL_JWKS_PATH")
@@ -14,23 +18,24 @@ def _load_jwks() -> dict[str, dict]:
 
     resp = requests.get(settings.jwks_url, timeout=5)
     resp.raise_for_status()
-    return {k["kid"]: k for k in resp.json()["keys"]}
+    jwks = {k["kid"]: k for k in resp.json()["keys"]}
+    log.info("jwks_loaded", kids=list(jwks))
+    return jwks
 
-_JWKS: dict[str, dict] = _load_jwks()
+# TTL + single-flight refresh + negative kid cache (see tinyllama.utils.jwks)
+_JWKS = JwksManager(lambda: _load_jwks())
+_JWKS.refresh()
 
-# ─── Decode helper (auto-reload once) ────────────────────────────────────────
+# ─── Decode helper (throttled auto-reload) ───────────────────────────────────
 def _decode_with_auto_reload(token: str, header: dict[str, str]):
-    kid = header["kid"]
-    key = _JWKS.get(kid)
-    if key is None:                 # refresh cache exactly once
-        _JWKS.update(_load_jwks())
-        key = _JWKS.get(kid)
+    key = _JWKS.get_key(header["kid"])
     if key is None:
+        log.warning("unknown_kid", kid=header["kid"])
         raise HTTPException(status.HTTP_403_FORBIDDEN, detail="Unknown kid")
 
     return jwt.decode(
         token,
-        key,                         # pass raw JWK dict, not jwk.construct()
+        key,                         # pre-built key object from the manager
         algorithms=["RS256"],
         audience=settings.client_id,
         options={"verify_iss": False},
@@ -47,9 +52,11 @@ def verify_jwt(authorization: Optional[str] = Header(None)):
             raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="Wrong auth scheme")
 
         header = jwt.get_unverified_header(token)
-        _decode_with_auto_reload(token, header)
+        return _decode_with_auto_reload(token, header)
 
     except ExpiredSignatureError:
+        log.warning("token_expired")
         raise HTTPException(status.HTTP_403_FORBIDDEN, detail="Token expired")
-    except JWTError:
+    except JWTError as exc:
+        log.warning("invalid_token", details=str(exc))
         raise HTTPException(status.HTTP_403_FORBIDDEN, detail="Invalid or expired token")
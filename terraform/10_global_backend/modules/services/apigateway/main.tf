@@ -49,6 +49,22 @@ resource "aws_apigatewayv2_route" "infer" {
 
 }
 
+resource "aws_apigatewayv2_route" "infer_batch" {
+  api_id    = aws_apigatewayv2_api.router.id
+  route_key = "POST /infer/batch"
+  target    = "integrations/${aws_apigatewayv2_integration.lambda_proxy.id}"
+  authorization_type = "JWT"
+  authorizer_id      = aws_apigatewayv2_authorizer.cognito.id
+}
+
+resource "aws_apigatewayv2_route" "jobs" {
+  api_id    = aws_apigatewayv2_api.router.id
+  route_key = "GET /jobs/{request_id}"
+  target    = "integrations/${aws_apigatewayv2_integration.lambda_proxy.id}"
+  authorization_type = "JWT"
+  authorizer_id      = aws_apigatewayv2_authorizer.cognito.id
+}
+
 resource "aws_apigatewayv2_route" "stop" {
   api_id    = aws_apigatewayv2_api.router.id
   route_key = "POST /stop"
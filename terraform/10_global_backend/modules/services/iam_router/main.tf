@@ -35,7 +35,7 @@ resource "aws_iam_role_policy_attachment" "basic" {
 data "aws_iam_policy_document" "ssm_read" {
   statement {
     sid       = "TLFIFReadSSM"
-    actions   = ["ssm:GetParameter", "ssm:GetParameters", "ssm:GetParameterHistory"]
+    actions   = ["ssm:GetParameter", "ssm:GetParameters", "ssm:GetParametersByPath", "ssm:GetParameterHistory"]
     resources = ["arn:aws:ssm:*:*:parameter/tinyllama/*"]
   }
 }
@@ -54,6 +54,7 @@ output "arn" {
 
 ###############################################################################
 # SQS  ·  allow Lambda to enqueue jobs (SendMessage to the single job queue)
+#         and read its depth for admission control (GetQueueAttributes)
 ###############################################################################
 
 # 1. Resolve the real queue ARN from SSM
@@ -65,7 +66,7 @@ data "aws_ssm_parameter" "job_queue_arn" {
 data "aws_iam_policy_document" "sqs_send" {
   statement {
     sid       = "TLFIFSendSQS"
-    actions   = ["sqs:SendMessage"]
+    actions   = ["sqs:SendMessage", "sqs:GetQueueAttributes"]
     resources = [data.aws_ssm_parameter.job_queue_arn.value]
   }
 }
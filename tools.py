@@ -5,14 +5,19 @@ Minimal, admin-free replacement for the old Makefile.
 Commands
 --------
 python tools.py lambda-package        # build router.zip
+python tools.py lambda-package --bake-config --env dev   # + SSM snapshot
 python tools.py tf-apply              # build + terraform init/apply
 python tools.py lambda-rollback --version 17
+python tools.py import-time --budget-ms 300   # cold-start import check
 """
 from __future__ import annotations
 import argparse
+import json
+import os
 import shutil
 import subprocess as sp
 import sys
+import time
 import zipfile
 from pathlib import Path
 
@@ -27,6 +32,19 @@ LOCAL_TF_BIN   = REPO_ROOT / "04_scripts" / "no_priv" / "tools" / "terraform"
 ROLLBACK_SH    = REPO_ROOT / "04_scripts" / "no_priv" / "rollback_router.sh"
 ZIP_SIZE_LIMIT = 5 * 1024 * 1024       # 5 MiB Lambda limit
 
+# Test-only helpers that must never ship in router.zip
+ZIP_EXCLUDE    = {"jwt_tools.py"}
+
+# SSM names resolved at build time into tinyllama/utils/config_snapshot.json
+# (the queue URL is not baked: Terraform injects it as JOB_QUEUE_URL)
+BAKED_SSM_NAMES = ("cognito_user_pool_id", "cognito_client_id")
+SNAPSHOT_ARC    = "tinyllama/utils/config_snapshot.json"
+
+# Cold-start import check: handler module + modules that must stay lazy
+ROUTER_MODULE         = "tinyllama.router.handler"
+IMPORT_BUDGET_MS      = float(os.getenv("IMPORT_BUDGET_MS", "300"))
+IMPORT_FORBIDDEN_MODS = ("boto3", "tinyllama.utils.jwt_tools")
+
 # --------------------------------------------------------------------------- #
 # Helpers
 # --------------------------------------------------------------------------- #
@@ -53,6 +71,8 @@ def add_tree(zf: zipfile.ZipFile, root: Path, arc_prefix: str) -> None:
             continue
         if "__pycache__" in f.parts or f.suffix == ".pyc":
             continue
+        if f.name in ZIP_EXCLUDE:
+            continue
         zf.write(f, Path(arc_prefix) / f.relative_to(root))
 
 def terraform_bin() -> str:
@@ -77,11 +97,28 @@ def terraform_bin() -> str:
 # --------------------------------------------------------------------------- #
 # Tasks
 # --------------------------------------------------------------------------- #
-def lambda_package() -> None:
+def build_version() -> str:
+    """Version stamp for baked config: short git SHA + UTC build time."""
+    try:
+        sha = sp.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                     capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, sp.CalledProcessError):
+        sha = "nogit"
+    return f"{sha}-{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}"
+
+def bake_config(env: str | None = None) -> dict:
+    """Resolve BAKED_SSM_NAMES from live SSM once, for bundling into the zip."""
+    if str(SRC_ROOT) not in sys.path:
+        sys.path.insert(0, str(SRC_ROOT))
+    from tinyllama.utils import ssm
+    return ssm.build_snapshot(BAKED_SSM_NAMES, env=env, version=build_version())
+
+def lambda_package(bake: bool = False, env: str | None = None) -> None:
     router_dir = SRC_ROOT / "tinyllama" / "router"
     utils_dir  = SRC_ROOT / "tinyllama" / "utils"
+    queue_dir  = SRC_ROOT / "tinyllama" / "queue"
 
-    for p in (router_dir, utils_dir):
+    for p in (router_dir, utils_dir, queue_dir):
         if not p.exists():
             safe_print(f"ERROR: required path missing – {p}")
             sys.exit(1)
@@ -90,6 +127,14 @@ def lambda_package() -> None:
         zf.writestr("tinyllama/__init__.py", "# package marker\n")
         add_tree(zf, router_dir, "tinyllama/router")
         add_tree(zf, utils_dir,  "tinyllama/utils")
+        add_tree(zf, queue_dir,  "tinyllama/queue")
+        if bake:
+            snapshot = bake_config(env)
+            zf.writestr(SNAPSHOT_ARC, json.dumps(snapshot, indent=2))
+            safe_print(
+                f"[INFO] baked {len(snapshot['values'])} SSM values for env "
+                f"'{snapshot['env']}' (version {snapshot['version']})"
+            )
 
     size = ZIP_OUT.stat().st_size
     if size > ZIP_SIZE_LIMIT:
@@ -99,9 +144,9 @@ def lambda_package() -> None:
 
     safe_print(f"OK   : created {ZIP_OUT}  {(size/1024):,.0f} KiB")
 
-def tf_apply(github_mode=False) -> None:
+def tf_apply(github_mode=False, bake: bool = False) -> None:
     tf = terraform_bin()          # resolve binary
-    lambda_package()              # always rebuild first
+    lambda_package(bake=bake)     # always rebuild first
 
     # ----- locate backend.auto.tfvars wherever it really is -------------
     backend_cfg = REPO_ROOT / "terraform" / "backend.auto.tfvars"
@@ -140,6 +185,41 @@ def lambda_rollback(version: str) -> None:
         sys.exit(proc.returncode)
     print(f"Rolled back tinyllama-router to version {version}")
 
+def import_time(module: str, budget_ms: float, runs: int = 3) -> None:
+    """
+    Import *module* in a fresh interpreter (best of *runs*) and fail when it
+    exceeds *budget_ms* or drags in a module that should load lazily.
+    """
+    probe = (
+        "import json, sys, time\n"
+        "t0 = time.perf_counter()\n"
+        f"import {module}\n"
+        "ms = (time.perf_counter() - t0) * 1000\n"
+        f"bad = [m for m in {IMPORT_FORBIDDEN_MODS!r} if m in sys.modules]\n"
+        "print(json.dumps({'ms': ms, 'forbidden': bad}))\n"
+    )
+    env = dict(os.environ, PYTHONPATH=str(SRC_ROOT))
+    best, forbidden = None, []
+    for _ in range(runs):
+        proc = sp.run([sys.executable, "-c", probe], env=env,
+                      capture_output=True, text=True)
+        if proc.returncode:
+            safe_print(proc.stderr)
+            safe_print(f"ERROR: importing {module} failed")
+            sys.exit(proc.returncode)
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        best = result["ms"] if best is None else min(best, result["ms"])
+        forbidden = result["forbidden"]
+
+    safe_print(f"[INFO] import {module}: {best:.1f} ms (budget {budget_ms:.0f} ms)")
+    if forbidden:
+        safe_print(f"ERROR: eager import of {', '.join(forbidden)} on the cold-start path")
+        sys.exit(1)
+    if best > budget_ms:
+        safe_print(f"ERROR: import time {best:.1f} ms exceeds budget {budget_ms:.0f} ms")
+        sys.exit(1)
+    safe_print("OK   : import time within budget")
+
 def update_env_public_with_api_url():
     import json
     import subprocess
@@ -176,7 +256,11 @@ def main() -> None:
     p = argparse.ArgumentParser(prog="tools.py")
     sp_ = p.add_subparsers(dest="cmd", required=True)
 
-    sp_.add_parser("lambda-package", help="build router.zip")
+    lp = sp_.add_parser("lambda-package", help="build router.zip")
+    lp.add_argument("--bake-config", action="store_true", dest="bake",
+                    help="resolve Cognito/queue IDs from SSM now and bundle them")
+    lp.add_argument("--env", default=None,
+                    help="SSM env to bake (default: $TLFIF_ENV or 'default')")
 
     tf_apply_sp = sp_.add_parser("tf-apply", help="zip + terraform init/apply")
     tf_apply_sp.add_argument(
@@ -185,21 +269,32 @@ def main() -> None:
         dest="github_mode",
         help="running in GitHub CI: skip updating .env_public"
     )
+    tf_apply_sp.add_argument("--bake-config", action="store_true", dest="bake",
+                             help="bundle an SSM config snapshot into router.zip")
 
     rb = sp_.add_parser("lambda-rollback")
     rb.add_argument("--version", required=True, help="Lambda numeric version")
 
+    it = sp_.add_parser("import-time", help="measure router cold-start import time")
+    it.add_argument("--module", default=ROUTER_MODULE, help="module to import")
+    it.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS,
+                    help="fail when the import takes longer (default: $IMPORT_BUDGET_MS or 300)")
+    it.add_argument("--runs", type=int, default=3, help="fresh interpreters to try (best wins)")
+
     args = p.parse_args()
     if args.cmd == "lambda-package":
-        lambda_package()
+        lambda_package(bake=args.bake, env=args.env)
 
     elif args.cmd == "tf-apply":
         # Pass through the --github flag
-        tf_apply(github_mode=args.github_mode)
+        tf_apply(github_mode=args.github_mode, bake=args.bake)
 
     elif args.cmd == "lambda-rollback":
         lambda_rollback(args.version)
 
+    elif args.cmd == "import-time":
+        import_time(args.module, args.budget_ms, args.runs)
+
 
 if __name__ == "__main__":
     main()